@@ -15,7 +15,8 @@ from core.misc import get_scons_path, get_scons_build_dir, \
 from core.customization import get_pythonlib_dir
 
 # Those functions really belong to the public API
-from numscons.starter import GetNumpyEnvironment, GetInitEnvironment
+from numscons.starter import GetNumpyEnvironment, GetInitEnvironment, \
+    NumpyPackages
 
 import checkers
 from checkers import *
@@ -46,5 +47,5 @@ def scons_get_mathlib(env):
             pass
     raise RuntimeError("FIXME: no mlib found ?")
 
-__all__ = ['GetNumpyEnvironment', 'GetInitEnvironment']
+__all__ = ['GetNumpyEnvironment', 'GetInitEnvironment', 'NumpyPackages']
 __all__ += checkers.__all__
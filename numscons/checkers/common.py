@@ -35,6 +35,28 @@ def restore(env, saved):
     kw = dict(zip(keys, [saved[k] for k in keys]))
     env.Replace(**kw)
 
+def get_overrides(env, opts, keys=None):
+    """Return the construction variables which save_and_set would set from
+    the option configuration, without modifying env."""
+    if keys is None:
+        keys = opts.keys()
+    saved = save_and_set(env, opts, keys)
+    try:
+        overrides = {}
+        for k in saved.keys():
+            overrides[k] = deepcopy(env[k])
+    finally:
+        restore(env, saved)
+    return overrides
+
+def try_batch(context, probes, builder='Program', first=True):
+    """Build a batch of independent probes from a configuration check.
+
+    See numscons.core.sconf_batch.TryBatch for the arguments and returned
+    values."""
+    from numscons.core.sconf_batch import TryBatch
+    return TryBatch(context.sconf, probes, builder, first)
+
 def get_initialized_perflib_config(env, name):
     """Return initialized configuration of the given name."""
     try:
@@ -5,12 +5,11 @@ from copy import \
         deepcopy
 from os.path import \
         join as pjoin, dirname as pdirname
-from ConfigParser \
-        import ConfigParser
 
 import numscons
 from numscons.core.utils import DefaultDict
 from numscons.core.misc import _CONFDIR
+from numscons.core.config_cache import read_config
 
 def _get_win32_config_files():
     # We import platform here as we only need it for windows and platform
@@ -74,9 +73,8 @@ def _read_section(section, env):
     configuration files detected by numscons.
 
     If no file has a section, return None"""
-    parser = ConfigParser()
     files = get_config_files(env)
-    r = parser.read(files)
+    parser, r = read_config(files)
     if len(r) < 1:
         raise IOError("No config file found (looked for %s)" % files)
 
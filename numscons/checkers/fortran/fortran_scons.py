@@ -9,7 +9,10 @@ from copy import deepcopy
 from numscons.core.utils import popen_wrapper
 from numscons.core.misc import built_with_mstools, built_with_mingw, \
                    built_with_gnu_f77, built_with_ifort
+from numscons.checkers.result_cache import get_check_store, check_key
+from numscons.checkers.common import try_batch
 from fortran import parse_f77link, check_link_verbose, gnu_to_scons_flags
+from symbols import object_symbols, find_mangling
 
 __all__ = ['CheckF77Clib', 'CheckF77Mangling']
 
@@ -84,7 +87,6 @@ def CheckF77Clib(context, autoadd = 1):
     if not context.env.has_key(fcompiler):
         raise Exception("F77 should be set before calling CheckF77Clib !")
 
-    fflags = 'LINKFLAGS'
     env = context.env
     config = context.sconf
     context.Message('Checking %s C compatibility runtime ...' % env[fcompiler])
@@ -103,29 +105,44 @@ def CheckF77Clib(context, autoadd = 1):
             context.Result('None needed')
         res = 1
     else:
-        # XXX: check how to get verbose output
-        verbose = ['-v']
-
-        # Convention old* variables MUST be restored in ANY CONDITION.
-        oldLINKFLAGS = env.has_key(fflags) and deepcopy(env[fflags]) or []
-
-        try:
-            context.env.Append(LINKFLAGS = verbose)
-            res, cnt = _build_empty_program(context, fcompiler)
-        finally:
-            env.Replace(LINKFLAGS = oldLINKFLAGS)
-
-        if res == 1:
-            final_flags = parse_f77link(cnt)
-            env['F77_LDFLAGS'] = final_flags
+        store = get_check_store(env)
+        key = check_key(env, 'F77Clib')
+        cached = store.get(key)
+        if cached is not None:
+            env['F77_LDFLAGS'] = cached
             context.Result(' '.join(env['F77_LDFLAGS']))
+            res = 1
         else:
-            context.Result('Failed !')
+            res = _check_f77_clib_imp(context, fcompiler)
+            if res == 1:
+                store.set(key, env['F77_LDFLAGS'])
 
     if autoadd:
         env.AppendUnique(LINKFLAGSEND =  env['F77_LDFLAGS'])
     return res
 
+def _check_f77_clib_imp(context, fcompiler):
+    env = context.env
+    # XXX: check how to get verbose output
+    verbose = ['-v']
+
+    # Convention old* variables MUST be restored in ANY CONDITION.
+    oldLINKFLAGS = env.has_key('LINKFLAGS') and deepcopy(env['LINKFLAGS']) or []
+
+    try:
+        context.env.Append(LINKFLAGS = verbose)
+        res, cnt = _build_empty_program(context, fcompiler)
+    finally:
+        env.Replace(LINKFLAGS = oldLINKFLAGS)
+
+    if res == 1:
+        final_flags = parse_f77link(cnt)
+        env['F77_LDFLAGS'] = final_flags
+        context.Result(' '.join(env['F77_LDFLAGS']))
+    else:
+        context.Result('Failed !')
+    return res
+
 # If need a dummy main
 def _CheckFDummyMain(context, fcomp):
     # Check whether the Fortran runtime needs a dummy main.
@@ -176,16 +193,21 @@ int %s() { return 0; }
         mains.append("main")
     mains.append("MAIN")
     mains.append("")
+    probes = []
     for m in mains:
         prog = fcn_tmpl % "dummy"
         if m:
             prog = fcn_tmpl % m + prog
-        result = context.TryLink(prog, '.c')
-        if result:
+        probes.append((prog, '.c', {}))
+
+    results = try_batch(context, probes)
+    for i in range(len(mains)):
+        if results[i]:
+            m = mains[i]
             if not m:
                 m = None
-            break
-    return result, m
+            return 1, m
+    return 0, None
 
 # XXX: refactor those by using function templates
 def CheckF77DummyMain(context):
@@ -269,7 +291,6 @@ def _check_f_mangling_imp(context, fc, m, ext):
     #   upper-case, underscore, double underscore: FOOBAR_, FOO_BAR__
     context.TryCompile(subr, ext)
     obj = context.lastTarget
-    env.Append(LIBS = env.StaticLibrary(obj))
 
     # Optimize order of tested code depending on platforms to speed up
     # configure checks
@@ -281,27 +302,42 @@ def _check_f_mangling_imp(context, fc, m, ext):
         under = ['_', '']
         doubleunder = ['', '_']
         casefcn = ["lower", "upper"]
-    gen = _RecursiveGenerator(under, doubleunder, casefcn)
-    while True:
-        try:
-            u, du, c = gen.next()
-            def make_mangler(u, du, c):
-                return lambda n: getattr(string, c)(n) +\
-                                 u + (n.find('_') != -1 and du or '')
-            mangler = make_mangler(u, du, c)
-            foobar = mangler("foobar")
-            foo_bar = mangler("foo_bar")
-            prog = prog_tmpl % (foobar, foo_bar, foobar, foo_bar)
-            if m:
-                prog = main_tmpl % m + prog
-            result = context.TryLink(prog, '.c')
-            if result:
-                break
-        except StopIteration:
-            result = mangler = u = du = c = None
-            break
+    variants = list(_RecursiveGenerator(under, doubleunder, casefcn))
+
+    # Look for the subroutines in the symbol table of the object first: this
+    # avoids trying to link every variant
+    if obj:
+        symbols = object_symbols(obj.get_abspath())
+        if symbols:
+            found = find_mangling(symbols, variants)
+            if found:
+                u, du, c = found
+                context.Log("Mangling %s found from the symbols of %s\n" \
+                            % (str(found), str(obj)))
+                return 1, _make_mangler(u, du, c), u, du, c
 
-    return result, mangler, u, du, c
+    env.Append(LIBS = env.StaticLibrary(obj))
+    probes = []
+    for u, du, c in variants:
+        mangler = _make_mangler(u, du, c)
+        foobar = mangler("foobar")
+        foo_bar = mangler("foo_bar")
+        prog = prog_tmpl % (foobar, foo_bar, foobar, foo_bar)
+        if m:
+            prog = main_tmpl % m + prog
+        probes.append((prog, '.c', {}))
+
+    results = try_batch(context, probes)
+    for i in range(len(variants)):
+        if results[i]:
+            u, du, c = variants[i]
+            return 1, _make_mangler(u, du, c), u, du, c
+
+    return None, None, None, None, None
+
+def _make_mangler(u, du, c):
+    return lambda n: getattr(string, c)(n) +\
+                     u + (n.find('_') != -1 and du or '')
 
 def _set_mangling_var(context, u, du, case, type = 'F77', autoadd=1, f2pycompat=1):
     env = context.env
@@ -340,6 +376,23 @@ def CheckF77Mangling(context, autoadd=1, f2pycompat=1):
     If sucessfull, env['F77_NAME_MANGLER'] is a function which given the C
     name, returns the F77 name as seen by the linker."""
     env = context.env
+
+    # The result depends on the dummy main if it was already set
+    if env.has_key('F77_DUMMY_MAIN'):
+        key = check_key(env, 'F77Mangling', env['F77_DUMMY_MAIN'])
+    else:
+        key = check_key(env, 'F77Mangling')
+    store = get_check_store(env)
+    cached = store.get(key)
+    if cached is not None:
+        m, u, du, c = cached
+        env['F77_DUMMY_MAIN'] = m
+        context.Message('Checking %s name mangling - ' % env['F77'])
+        context.Result("'%s', '%s', %s-case." % (u, du, c))
+        env['F77_NAME_MANGLER'] = _make_mangler(u, du, c)
+        _set_mangling_var(context, u, du, c, 'F77', autoadd, f2pycompat)
+        return 1
+
     if not env.has_key('F77_DUMMY_MAIN'):
         st = CheckF77DummyMain(context)
         if st == 0:
@@ -350,6 +403,7 @@ def CheckF77Mangling(context, autoadd=1, f2pycompat=1):
         context.Result("'%s', '%s', %s-case." % (u, du, c))
         env['F77_NAME_MANGLER'] = mangler
         _set_mangling_var(context, u, du, c, 'F77', autoadd, f2pycompat)
+        store.set(key, (env['F77_DUMMY_MAIN'], u, du, c))
     else:
         context.Result("all variants failed.")
     return res
@@ -0,0 +1,135 @@
+"""This module implements the detection of Fortran name mangling from the
+symbol table of a compiled object.
+
+The symbol table is read with nm if available, or with a simple ELF reader
+otherwise. This module does not depend on scons."""
+import struct
+
+from numscons.core.utils import popen_wrapper
+
+def mangle(name, u, du, case):
+    """Return the name name mangled with the given underscore, double
+    underscore and case convention."""
+    if case == 'upper':
+        n = name.upper()
+    else:
+        n = name.lower()
+    n += u
+    if name.find('_') != -1:
+        n += du
+    return n
+
+def parse_nm(output):
+    """Return the list of symbols defined in the output of nm."""
+    symbols = []
+    for line in output.splitlines():
+        fields = line.split()
+        # Undefined symbols have no address (and the 'U' type)
+        if len(fields) == 3 and not fields[1] in ['U', 'w', 'v']:
+            symbols.append(fields[2])
+    return symbols
+
+def nm_symbols(filename, nm = 'nm'):
+    """Return the list of symbols defined in the object filename, using the
+    nm program, or None if nm failed."""
+    try:
+        st, out = popen_wrapper([nm, filename], shell = False)
+    except OSError:
+        return None
+    if st:
+        return None
+    return parse_nm(out)
+
+# ELF constants
+_SHT_SYMTAB = 2
+_SHN_UNDEF = 0
+_STT_SECTION = 3
+_STT_FILE = 4
+
+def elf_symbols(filename):
+    """Return the list of symbols defined in the ELF object filename, or None
+    if filename cannot be read as an ELF object."""
+    try:
+        f = open(filename, 'rb')
+        try:
+            data = f.read()
+        finally:
+            f.close()
+    except IOError:
+        return None
+    if data[:4] != '\x7fELF':
+        return None
+
+    try:
+        return _elf_symbols(data)
+    except (struct.error, KeyError, IndexError):
+        return None
+
+def _elf_symbols(data):
+    endian = {1: '<', 2: '>'}[ord(data[5])]
+    elfclass = ord(data[4])
+    if elfclass == 1:
+        shoff, = struct.unpack(endian + 'I', data[0x20:0x24])
+        shentsize, shnum = struct.unpack(endian + 'HH', data[0x2E:0x32])
+        shdr_fmt = endian + 'IIIIIIIIII'
+        sym_fmt = endian + 'IIIBBH'
+        def sym_fields(s):
+            name, value, size, info, other, shndx = s
+            return name, info, shndx
+    elif elfclass == 2:
+        shoff, = struct.unpack(endian + 'Q', data[0x28:0x30])
+        shentsize, shnum = struct.unpack(endian + 'HH', data[0x3A:0x3E])
+        shdr_fmt = endian + 'IIQQQQIIQQ'
+        sym_fmt = endian + 'IBBHQQ'
+        def sym_fields(s):
+            name, info, other, shndx, value, size = s
+            return name, info, shndx
+    else:
+        raise KeyError(elfclass)
+
+    # Each section header is (name, type, flags, addr, offset, size, link,
+    # info, addralign, entsize)
+    sections = []
+    shsize = struct.calcsize(shdr_fmt)
+    for i in range(shnum):
+        start = shoff + i * shentsize
+        sections.append(struct.unpack(shdr_fmt, data[start:start+shsize]))
+
+    symbols = []
+    symsize = struct.calcsize(sym_fmt)
+    for sec in sections:
+        if sec[1] != _SHT_SYMTAB:
+            continue
+        strtab = sections[sec[6]]
+        strings = data[strtab[4]:strtab[4]+strtab[5]]
+        for start in range(sec[4], sec[4] + sec[5], symsize):
+            name, info, shndx = sym_fields(struct.unpack(sym_fmt,
+                                           data[start:start+symsize]))
+            if shndx == _SHN_UNDEF or (info & 0xf) in [_STT_SECTION, _STT_FILE]:
+                continue
+            name = strings[name:strings.index('\0', name)]
+            if name:
+                symbols.append(name)
+    return symbols
+
+def object_symbols(filename, nm = 'nm'):
+    """Return the list of symbols defined in the object filename, or None if
+    they could not be read."""
+    symbols = nm_symbols(filename, nm)
+    if symbols is None:
+        symbols = elf_symbols(filename)
+    return symbols
+
+def find_mangling(symbols, variants, prefixes = ['', '_']):
+    """Return the first (u, du, case) of variants such as the subroutines
+    foobar and foo_bar are in symbols, or None.
+
+    prefixes are the prefixes the platform may add to every C symbol (e.g.
+    '_' on Mac OS X)."""
+    symbols = dict([(s, None) for s in symbols])
+    for p in prefixes:
+        for u, du, c in variants:
+            if symbols.has_key(p + mangle('foobar', u, du, c)) and \
+               symbols.has_key(p + mangle('foo_bar', u, du, c)):
+                return u, du, c
+    return None
@@ -1,14 +1,47 @@
 from numscons.checkers.perflib_checkers import \
-        _check_perflib
+        _check_perflibs
 from numscons.checkers.common import \
         get_perflib_names, get_initialized_perflib_config, \
         save_and_set, restore, set_checker_result
 from numscons.checkers.testcode_snippets import \
         BLAS_TEST_CODE, LAPACK_TEST_CODE, CBLAS_TEST_CODE
 from numscons.checkers.fortran import CheckF77Mangling, CheckF77Clib
+from numscons.checkers.result_cache import get_check_store, check_key
 
 __all__ = ['CheckF77Lapack', 'CheckF77Blas', 'CheckCblas']
 
+def _perflibs_key(env, name):
+    # Configuration of every performance library candidate for the interface
+    # name, in the order they are tested
+    key = []
+    for perflib in get_perflib_names(env):
+        info = get_initialized_perflib_config(env, perflib)
+        if name in info.interfaces():
+            core = info._core.items()
+            core.sort()
+            interface = info._interfaces[name].items()
+            interface.sort()
+            key.append((perflib, info.disabled(), info.test_code, core,
+                        interface))
+    return tuple(key)
+
+def _select_perflib(context, name, key):
+    """Return (perflib, info, cached), where info is the config of the first
+    performance library perflib implementing the interface name which can be
+    used, and cached is True if the choice comes from the check results
+    store. perflib and info are None if no library can be used."""
+    cached = get_check_store(context.env).get(key)
+    if cached is not None:
+        return cached, get_initialized_perflib_config(context.env, cached), True
+
+    candidates = []
+    for perflib in get_perflib_names(context.env):
+        _info = get_initialized_perflib_config(context.env, perflib)
+        if  name in _info.interfaces():
+            candidates.append((perflib, _info))
+    perflib, info = _check_perflibs(context, candidates)
+    return perflib, info, False
+
 def _check_fortran(context, name, autoadd, test_code_tpl, func):
     # Generate test code using name mangler
     try:
@@ -27,12 +60,9 @@ def _check_fortran(context, name, autoadd, test_code_tpl, func):
         f77_ldflags = context.env['F77_LDFLAGS']
 
     # Detect which performance library to use
-    info = None
-    for perflib in get_perflib_names(context.env):
-        _info = get_initialized_perflib_config(context.env, perflib)
-        if  name in _info.interfaces() and _check_perflib(context, 0, _info):
-            info = _info
-            break
+    key = check_key(context.env, 'F77' + name, test_code, f77_ldflags,
+                    _perflibs_key(context.env, name))
+    perflib, info, cached = _select_perflib(context, name, key)
 
     context.Message("Checking for F77 %s ... " % name)
 
@@ -51,23 +81,26 @@ def _check_fortran(context, name, autoadd, test_code_tpl, func):
 
     saved = save_and_set(context.env, info._interfaces[name],
                 info._interfaces[name].keys())
-    ret = context.TryLink(test_code, extension='.c')
+    if cached:
+        ret = 1
+    else:
+        ret = context.TryLink(test_code, extension='.c')
     if not ret or not autoadd:
         restore(context.env, saved)
     if not ret:
         context.Result('no')
-    context.Result('yes - %s' % info.name)
+    else:
+        context.Result('yes - %s' % info.name)
+        if not cached:
+            get_check_store(context.env).set(key, perflib)
     set_checker_result(context.env, name, info)
     return ret
 
 def _check_c(context, name, autoadd, test_code):
     # Detect which performance library to use
-    info = None
-    for perflib in get_perflib_names(context.env):
-        _info = get_initialized_perflib_config(context.env, perflib)
-        if  name in _info.interfaces() and _check_perflib(context, 0, _info):
-            info = _info
-            break
+    key = check_key(context.env, name, test_code,
+                    _perflibs_key(context.env, name))
+    perflib, info, cached = _select_perflib(context, name, key)
 
     context.Message("Checking for %s ... " % name.upper())
 
@@ -81,12 +114,18 @@ def _check_c(context, name, autoadd, test_code):
 
     saved = save_and_set(context.env, info._interfaces[name],
                 info._interfaces[name].keys())
-    ret = context.TryLink(test_code, extension='.c')
+    if cached:
+        ret = 1
+    else:
+        ret = context.TryLink(test_code, extension='.c')
     if not ret or not autoadd:
         restore(context.env, saved)
     if not ret:
         context.Result('no')
-    context.Result('yes - %s' % info.name)
+    else:
+        context.Result('yes - %s' % info.name)
+        if not cached:
+            get_check_store(context.env).set(key, perflib)
     return ret
 
 def CheckF77Lapack(context, autoadd=1, check_version=0):
@@ -1,5 +1,6 @@
 from numscons.checkers.common import \
-    save_and_set, restore, get_initialized_perflib_config
+    save_and_set, restore, get_initialized_perflib_config, get_overrides, \
+    try_batch
 
 # Performance library checks
 def _check_perflib(context, autoadd, info):
@@ -17,6 +18,27 @@ def _check_perflib(context, autoadd, info):
     context.Result(ret)
     return ret
 
+def _check_perflibs(context, candidates):
+    """Return the first (name, info) of candidates which can be used, or
+    (None, None).
+
+    The candidates are checked as one batch of independent probes."""
+    enabled = [(name, info) for name, info in candidates if not info.disabled()]
+    probes = [(info.test_code, '.c', get_overrides(context.env, info._core))
+              for name, info in enabled]
+    results = dict(zip([name for name, info in enabled],
+                       try_batch(context, probes)))
+
+    for name, info in candidates:
+        context.Message("Checking for %s ... " % info.name)
+        if info.disabled():
+            context.Result('no - disabled from user environment')
+            continue
+        context.Result(results[name])
+        if results[name]:
+            return name, info
+    return None, None
+
 def CheckAtlas(context, autoadd=1, check_version=0):
     return _check_perflib(context, autoadd,
             get_initialized_perflib_config(context.env, 'Atlas'))
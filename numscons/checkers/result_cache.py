@@ -0,0 +1,121 @@
+"""This module implements a store for configuration checks results, shared by
+every package.
+
+Results are content-addressed: the key of a result is built from the
+compilers identity, the flags used by the checks, the performance libraries
+configuration and the test sources, so that a result is reused only if the
+check would have been run in the same conditions. Only positive results are
+stored."""
+import os
+import sys
+import cPickle
+from os.path import join as pjoin
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import new as md5
+
+from numscons.core.misc import get_scons_configres_dir, \
+    get_check_cache_dirname
+from numscons.core.compiler_detection import compiler_fingerprint
+
+# Variables which influence the result of a configuration check
+_FLAGS_VARS = ['CC', 'CFLAGS', 'CCFLAGS', 'CPPDEFINES', 'F77', 'F77FLAGS',
+               'FORTRANFLAGS', 'LINK', 'LINKFLAGS', 'LINKFLAGSEND', 'LIBS',
+               'LIBPATH', 'FRAMEWORKS']
+
+_TYPES_VARS = ['NUMPY_CC_TYPE', 'NUMPY_CC_VERSION', 'NUMPY_F77_TYPE',
+               'NUMPY_F77_VERSION']
+
+class CheckResultStore:
+    """Directory of check results, one file per key.
+
+    If force is True, results are never read from the store, but new results
+    are still written into it."""
+    def __init__(self, directory, force = False):
+        self.directory = directory
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+
+    def _filename(self, key):
+        return pjoin(self.directory, md5(repr(key)).hexdigest())
+
+    def get(self, key):
+        """Return the result stored for key, or None."""
+        if self.force:
+            self.misses += 1
+            return None
+        try:
+            f = open(self._filename(key), 'rb')
+            try:
+                stored_key, value = cPickle.load(f)
+            finally:
+                f.close()
+        except (IOError, EOFError, ValueError, cPickle.UnpicklingError):
+            self.misses += 1
+            return None
+        # Guard against md5 collisions
+        if stored_key != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store value for key."""
+        filename = self._filename(key)
+        tmp = filename + '.tmp'
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            f = open(tmp, 'wb')
+            try:
+                cPickle.dump((key, value), f, 2)
+            finally:
+                f.close()
+            if sys.platform == 'win32' and os.path.exists(filename):
+                os.remove(filename)
+            os.rename(tmp, filename)
+        except (IOError, OSError):
+            # Not being able to store a result is not fatal: the check will
+            # be run again next time
+            pass
+
+_STORES = {}
+
+def get_check_store(env):
+    """Return the check results store for the given environment."""
+    directory = pjoin(str(env.fs.Top), get_scons_configres_dir(),
+                      get_check_cache_dirname())
+    force = env.has_key('force_checks') and env['force_checks']
+    try:
+        store = _STORES[directory]
+    except KeyError:
+        store = CheckResultStore(directory)
+        _STORES[directory] = store
+    store.force = force
+    return store
+
+def _compiler_identity(env):
+    ident = []
+    for v in _TYPES_VARS:
+        if env.has_key(v):
+            ident.append((v, env[v]))
+        else:
+            ident.append((v, None))
+    for v in ['CC', 'F77', 'LINK']:
+        cmd = env.subst('$%s' % v).split()
+        if cmd:
+            ident.append((v, compiler_fingerprint(cmd[0])))
+        else:
+            ident.append((v, None))
+    return tuple(ident)
+
+def check_key(env, name, *extra):
+    """Return the key of the check name run within env.
+
+    extra may contain any object with a stable repr, like test sources or
+    performance libraries configuration."""
+    flags = tuple([(v, env.subst('$%s' % v)) for v in _FLAGS_VARS])
+    return (name, _compiler_identity(env), flags) + extra
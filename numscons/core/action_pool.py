@@ -0,0 +1,143 @@
+"""This module runs the python actions of numscons builders in worker
+processes.
+
+scons runs the actions of parallel jobs (-j) in threads: this is fine for
+command actions, which spend their time waiting for a subprocess, but the
+python function actions (template expansion, cython, substitution in files)
+hold the GIL, and do not run in parallel. Here, such an action is described
+by a picklable descriptor (module, function, args), and run in a pool of
+worker processes (see numscons.core.workers) when more than one job is given
+to scons, unless the python_action_pool option is false, or in the calling
+thread otherwise.
+
+Those actions run in the worker processes themselves, not in processes forked
+for each call (contrary to f2py, see numscons.tools.f2py): a worker runs the
+actions one after the other, as the scons process does without the pool, and
+keeps the memos of the previous actions (e.g. the files included by the
+templates, see numscons.numdist.includes).
+
+The time spent in the build tasks is reported per kind of task (python actions
+run in the pool, python actions run in scons threads, commands), to tell how
+much of the jobs each kind used (action_stats option). The tasks are timed by
+numscons.core.task_recorder."""
+import sys
+import atexit
+import threading
+
+# Modules imported once by every worker
+_PRELOADED = ['numscons.core.template_generators']
+
+_POOL = []
+_POOL_LOCK = threading.Lock()
+
+KINDS = ['pool', 'thread', 'command']
+_KIND_NAMES = {'pool': 'python actions (process pool)',
+               'thread': 'python actions (scons threads)',
+               'command': 'commands'}
+
+_REPORT_REGISTERED = []
+
+def get_action_pool():
+    """Return the pool of workers for python actions, with one worker per
+    scons job at most."""
+    _POOL_LOCK.acquire()
+    try:
+        if not _POOL:
+            from numscons.core.workers import WorkerPool
+            from numscons.core.sconf_batch import get_num_jobs
+            _POOL.append(WorkerPool(get_num_jobs(), _PRELOADED, fork = False))
+        return _POOL[0]
+    finally:
+        _POOL_LOCK.release()
+
+def use_action_pool(env):
+    """Return True if the python actions of env are run in worker
+    processes: with several jobs, unless the python_action_pool option is
+    false."""
+    from numscons.core.sconf_batch import get_num_jobs
+    if env.has_key('python_action_pool') and not env['python_action_pool']:
+        return False
+    return get_num_jobs() > 1
+
+def run_python_action(env, module, function, args, remote_callback = None,
+                      pool = None):
+    """Run module.function(*args), in a worker process if use_action_pool(env)
+    is true, or if pool is true (pool = False runs it here).
+
+    module, function and args must be picklable, and args must only refer to
+    files by their path. remote_callback, if given, is called with the result
+    of a call run in a worker, e.g. to account for side effects on module
+    globals, which stay in the worker.
+
+    Returns (status, result): status is 0 on success; a failure in a worker
+    (traceback) is printed and gives a non zero status, so that scons reports
+    the action as failed. Exceptions of local calls are not caught."""
+    from numscons.core.task_recorder import set_python_kind
+    if pool is None:
+        pool = use_action_pool(env)
+    if pool:
+        from numscons.core.workers import WorkerError
+        try:
+            st, output, result = get_action_pool().call(module, function,
+                                                        args)
+        except WorkerError:
+            # Run it here instead
+            pass
+        else:
+            set_python_kind('pool')
+            if output:
+                sys.stdout.write(output)
+            if st == 0 and remote_callback:
+                remote_callback(result)
+            return st, result
+
+    set_python_kind('thread')
+    mod = __import__(module, {}, {}, [function])
+    return 0, getattr(mod, function)(*args)
+
+#-------------
+# Statistics
+#-------------
+def get_action_stats(records):
+    """Return (wall time, {kind: (number of tasks, busy time)}) for the given
+    task records (see numscons.core.task_recorder)."""
+    if not records:
+        return 0., {}
+    wall = max([r.end for r in records]) - min([r.start for r in records])
+    stats = {}
+    for r in records:
+        kind = r.python or 'command'
+        n, busy = stats.get(kind, (0, 0.))
+        stats[kind] = (n + 1, busy + r.end - r.start)
+    return wall, stats
+
+def report_action_stats(records, njobs):
+    """Return a summary of the time spent in the tasks per kind: the
+    utilization of a kind is its busy time divided by the time available to
+    njobs jobs between the first and the last task."""
+    wall, stats = get_action_stats(records)
+    lines = ["Tasks: %d jobs, %.1f s" % (njobs, wall)]
+    for k in KINDS:
+        n, busy = stats.get(k, (0, 0.))
+        if wall > 0:
+            used = 100. * busy / (wall * njobs)
+        else:
+            used = 0.
+        lines.append("    %-32s %5d tasks, %8.1f s busy, %5.1f %% of the "\
+                     "jobs" % (_KIND_NAMES[k] + ':', n, busy, used))
+    return "\n".join(lines)
+
+def _print_action_stats(recorder):
+    from numscons.core.sconf_batch import get_num_jobs
+    print report_action_stats(recorder.records, get_num_jobs())
+
+def set_action_stats(env):
+    """Print the time spent in every kind of task at exit, if the
+    action_stats option is true."""
+    if not (env.has_key('action_stats') and env['action_stats']):
+        return
+
+    if not _REPORT_REGISTERED:
+        from numscons.core.task_recorder import get_task_recorder
+        atexit.register(_print_action_stats, get_task_recorder())
+        _REPORT_REGISTERED.append(1)
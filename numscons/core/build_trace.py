@@ -0,0 +1,197 @@
+# This module cannot be imported directly, because it needs scons module.
+"""This module reports the wall time spent in every build action.
+
+When enabled (build_trace option, see enable_build_trace), every task executed
+by scons is recorded (see numscons.core.task_recorder) with its start and end
+times and the scons job (thread) which ran it. At the end of the build, the
+trace of the tasks is written in the Chrome trace event format (to be loaded
+in chrome://tracing), and a summary per kind of action, with the longest tasks
+and the use of the jobs, is printed.
+
+The trace gives the kind of the action of every task (CC, F77, F2PY, TEMPLATE,
+PYEXTLINK...) and how it was built:
+    - 'built': the action was run
+    - 'cachedir': the targets were retrieved from the scons CacheDir
+    - or a status set by the action in the cache_status attribute of the
+      target node, e.g. 'f2py-cache' when f2py generated files were found in
+      the f2py cache, 'template-cache' when every block of a template was
+      found in the template cache."""
+import atexit
+
+import SCons.Action
+import SCons.Util
+
+# Kind of the python function actions of numscons
+_FUNCTION_KINDS = {
+    'pyf2c': 'F2PY',
+    'generate_from_c_template': 'TEMPLATE',
+    'generate_from_f_template': 'TEMPLATE',
+    'generate_from_c_template_batch': 'TEMPLATE',
+    'generate_from_f_template_batch': 'TEMPLATE',
+    'cython_action': 'CYTHON',
+    'subst_in_file': 'SUBST'}
+
+class BuildTrace:
+    """Trace of the tasks of a build: records is a list of (targets names,
+    kind, status, worker, start, end), start the time the build started."""
+    def __init__(self, records, start):
+        self.records = records
+        self.start = start
+
+    def chrome_trace(self):
+        """Return the records as a Chrome trace event file content."""
+        events = []
+        for targets, kind, status, worker, start, end in self.records:
+            events.append('{"name": %s, "cat": %s, "ph": "X", "pid": 1, '\
+                          '"tid": %d, "ts": %d, "dur": %d, '\
+                          '"args": {"targets": [%s], "status": %s}}' % \
+                          (_json_str(targets[0]), _json_str(kind), worker,
+                           int((start - self.start) * 1e6),
+                           int((end - start) * 1e6),
+                           ', '.join([_json_str(t) for t in targets]),
+                           _json_str(status)))
+        return '{"displayTimeUnit": "ms", "traceEvents": [\n%s\n]}\n' % \
+               ',\n'.join(events)
+
+    def summary(self, nlongest = 10):
+        """Return a text summary of the records."""
+        if not self.records:
+            return "Build trace: no task executed"
+        kinds = {}
+        for targets, kind, status, worker, start, end in self.records:
+            try:
+                st = kinds[kind]
+            except KeyError:
+                st = kinds[kind] = [0, 0., 0., 0]
+            d = end - start
+            st[0] += 1
+            st[1] += d
+            st[2] = max(st[2], d)
+            if status != 'built':
+                st[3] += 1
+
+        first = min([r[4] for r in self.records])
+        last = max([r[5] for r in self.records])
+        wall = last - first
+        busy = sum([r[5] - r[4] for r in self.records])
+        nworkers = len(dict([(r[3], None) for r in self.records]))
+
+        lines = ["Build trace: %d tasks in %.2f s, %d jobs used" \
+                 % (len(self.records), wall, nworkers)]
+        if wall > 0:
+            lines.append("    average parallelism %.2f, jobs busy %.1f %%" \
+                         % (busy / wall, 100. * busy / (wall * nworkers)))
+        lines.append("    %-12s %6s %10s %8s %8s %8s" % ('kind', 'tasks',
+                     'total (s)', '%', 'max (s)', 'cached'))
+        items = [(v[1], k, v) for k, v in kinds.items()]
+        items.sort()
+        items.reverse()
+        for total, k, v in items:
+            if busy > 0:
+                ratio = 100. * total / busy
+            else:
+                ratio = 0.
+            lines.append("    %-12s %6d %10.2f %8.1f %8.2f %8d" \
+                         % (k, v[0], total, ratio, v[2], v[3]))
+
+        lines.append("    longest tasks:")
+        longest = [(r[5] - r[4], r) for r in self.records]
+        longest.sort()
+        longest.reverse()
+        for d, r in longest[:nlongest]:
+            lines.append("    %8.2f s %-10s %s" % (d, r[1], r[0][0]))
+        return "\n".join(lines)
+
+def _json_str(s):
+    # JSON string literal for the str s
+    chunks = ['"']
+    for c in s:
+        if c in '"\\':
+            chunks.append('\\' + c)
+        elif ord(c) < 0x20 or ord(c) > 0x7e:
+            chunks.append('\\u%04x' % ord(c))
+        else:
+            chunks.append(c)
+    chunks.append('"')
+    return ''.join(chunks)
+
+def action_kind(action, executor):
+    """Return the kind of the scons action run by executor: the name of the
+    construction variable of a command (CC for $CCCOM), or the kind of a
+    numscons python action."""
+    if isinstance(action, SCons.Action.ListAction):
+        # The command if any (e.g. the link of [SharedCheck, $SHLINKCOM])
+        kinds = [action_kind(a, executor) for a in action.list]
+        for a, k in zip(action.list, kinds):
+            if not isinstance(a, SCons.Action.FunctionAction):
+                return k
+        return kinds[0]
+    elif isinstance(action, SCons.Action.LazyAction):
+        return _var_kind(action.var)
+    elif isinstance(action, SCons.Action.CommandGeneratorAction):
+        # e.g. the actions of the object builders, which depend on the
+        # source suffix
+        action = action._generate(executor.get_all_targets(),
+                                  executor.get_all_sources(),
+                                  executor.get_build_env(), 0)
+        return action_kind(action, executor)
+    elif isinstance(action, SCons.Action.CommandAction):
+        cmd = action.cmd_list
+        if SCons.Util.is_String(cmd) and cmd.startswith('$') and \
+           not ' ' in cmd:
+            return _var_kind(cmd[1:].strip('{}'))
+        return 'COMMAND'
+    elif isinstance(action, SCons.Action.FunctionAction):
+        try:
+            name = action.execfunction.__name__
+        except AttributeError:
+            name = action.execfunction.__class__.__name__
+        return _FUNCTION_KINDS.get(name, name.upper())
+    return action.__class__.__name__.upper()
+
+def _var_kind(var):
+    if var.endswith('COM'):
+        return var[:-3]
+    return var
+
+def _task_kind(targets):
+    try:
+        executor = targets[0].get_executor()
+        return action_kind(executor.get_action_list()[0], executor)
+    except Exception:
+        return 'UNKNOWN'
+
+def _task_status(targets):
+    for t in targets:
+        status = getattr(t.attributes, 'cache_status', None)
+        if status:
+            return status
+    return 'built'
+
+def get_build_trace(recorder):
+    """Return the BuildTrace of the tasks recorded by recorder."""
+    records = [([str(t) for t in r.targets], _task_kind(r.targets),
+                _task_status(r.targets), r.worker, r.start, r.end)
+               for r in recorder.records]
+    return BuildTrace(records, recorder.start)
+
+_TRACE = []
+
+def enable_build_trace(filename):
+    """Record the build tasks, written as a Chrome trace in filename (an
+    absolute path) at exit, and print their summary."""
+    if _TRACE:
+        return
+    from numscons.core.task_recorder import get_task_recorder
+    _TRACE.append(filename)
+    atexit.register(_write_trace, get_task_recorder(), filename)
+
+def _write_trace(recorder, filename):
+    trace = get_build_trace(recorder)
+    f = open(filename, 'w')
+    try:
+        f.write(trace.chrome_trace())
+    finally:
+        f.close()
+    print trace.summary()
+    print "Build trace written in %s" % filename
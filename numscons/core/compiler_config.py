@@ -2,11 +2,11 @@
 .ini like files"""
 import sys
 
-from ConfigParser import ConfigParser
 from os.path import join as pjoin, dirname as pdirname
 
 from numscons.core.utils import DefaultDict
 from numscons.core.misc import _CONFDIR
+from numscons.core.config_cache import read_config
 
 _OPTIONS = ['optim', 'warn', 'debug_sym', 'debug', 'thread', 'extra',
             'link_optim']
@@ -51,7 +51,6 @@ def get_config(name, language):
     if name == 'intelc':
         name = 'icc'
     # XXX name should be a list
-    config = ConfigParser()
     if language == 'C':
         files = get_config_files("compiler.cfg")
     elif language == 'F77':
@@ -61,7 +60,7 @@ def get_config(name, language):
     else:
         raise NoCompilerConfig("language %s not recognized !" % language)
 
-    st = config.read(files)
+    config, st = read_config(files)
     if len(st) < 1:
         raise IOError("config file %s not found" % files)
     if not config.has_section(name):
@@ -3,15 +3,22 @@ line."""
 import re
 import sys
 import os
+import cPickle
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
 
 from numscons.core.utils import popen_wrapper
 from numscons.core.errors import UnknownCompiler
 
 # How to detect a new compiler:
-#   - implements a function is_*, which takes the (full) path of the compiler,
-#   and returns a tuple (st, version), where st is a boolean set to True is the
-#   given compiler is of the expected type, and version a string.
-#   - the function is_ can use the function _parse
+#   - implements a function parse_*, which takes the output of the compiler
+#   run with some verbose flags, and returns a tuple (st, version), where st is
+#   a boolean set to True is the output is the one of the expected type, and
+#   version a string. The function parse_* can use the function _parse
+#   - add a candidate using this parser in the *_CANDIDATES list of the
+#   languages supported by the compiler.
 
 GNUCC = [re.compile('gcc version ([0-9-.]+)')]
 ICC = [re.compile(r'Intel.*?C Compiler.*?Version ([0-9-.]+)')]
@@ -45,16 +52,200 @@ def parse_sunfortran(string):
 def parse_gnu(string):
     return _parse(GNUCC, string)
 
+# The output of every probe (compiler + verbose arguments) is cached, so that
+# the same compiler is not run again for every environment of every package.
+# Entries are keyed on the command line, and are only valid as long as the
+# compiler binary (resolved path, mtime and size) and the environment used to
+# run the probe do not change.
+class ProbeCache:
+    """Cache of compiler probe outputs, optionally kept on disk.
+
+    Each entry maps (path, cmdargs) to (fingerprint, (st, out)), where
+    fingerprint identifies the compiler binary and the probe environment at
+    the time the probe was run."""
+    def __init__(self, filename = None):
+        self.filename = None
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        # Probes may be run concurrently (see identify_compilers): the lock
+        # protects the entries and counters, but not the compiler runs
+        self._lock = threading.RLock()
+        if filename:
+            self.set_filename(filename)
+
+    def set_filename(self, filename):
+        """Set the file used to keep the cache on disk, and merge its content
+        into the cache."""
+        if filename == self.filename:
+            return
+        self.filename = filename
+        self._merge()
+
+    def _merge(self):
+        # Add the entries of the file which are not in memory
+        for k, v in self._load().items():
+            if not self._entries.has_key(k):
+                self._entries[k] = v
+
+    def _load(self):
+        try:
+            f = open(self.filename, 'rb')
+            try:
+                entries = cPickle.load(f)
+            finally:
+                f.close()
+        except (IOError, EOFError, ValueError, cPickle.UnpicklingError):
+            return {}
+        if not isinstance(entries, dict):
+            return {}
+        return entries
+
+    def _save(self):
+        # Other processes sharing the file (e.g. the runs forked by
+        # numscons.server) may have saved their own entries since we loaded
+        # it: keep them
+        self._merge()
+        d = os.path.dirname(self.filename)
+        tmp = self.filename + '.tmp'
+        try:
+            if d and not os.path.exists(d):
+                os.makedirs(d)
+            f = open(tmp, 'wb')
+            try:
+                cPickle.dump(self._entries, f, 2)
+            finally:
+                f.close()
+            if sys.platform == 'win32' and os.path.exists(self.filename):
+                os.remove(self.filename)
+            os.rename(tmp, self.filename)
+        except (IOError, OSError):
+            # Failing to write the cache is not fatal: we will just probe the
+            # compiler again next time.
+            pass
+
+    def probe(self, path, cmdargs):
+        """Return (st, out) for the compiler path run with cmdargs, running
+        it only if no valid cached output is available.
+
+        May raise OSError if the compiler cannot be executed."""
+        env = _probe_env()
+        key = (path, tuple(cmdargs))
+        fingerprint = compiler_fingerprint(path, env)
+        if fingerprint is not None:
+            self._lock.acquire()
+            try:
+                try:
+                    cached_fp, res = self._entries[key]
+                    if cached_fp == fingerprint:
+                        self.hits += 1
+                        return res
+                    self.invalidated += 1
+                except KeyError:
+                    pass
+            finally:
+                self._lock.release()
+
+        self._lock.acquire()
+        try:
+            self.misses += 1
+        finally:
+            self._lock.release()
+        res = popen_wrapper([path] + list(cmdargs), merge=True, shell=False,
+                            env=env)
+        if fingerprint is not None:
+            self._lock.acquire()
+            try:
+                self._entries[key] = (fingerprint, res)
+                if self.filename:
+                    self._save()
+            finally:
+                self._lock.release()
+        return res
+
+    def clear(self):
+        """Remove every entry from the cache (and from the disk)."""
+        self._lock.acquire()
+        try:
+            self._entries = {}
+            if self.filename and os.path.exists(self.filename):
+                os.remove(self.filename)
+        finally:
+            self._lock.release()
+
+    def report(self):
+        """Return a string summarizing the cache usage."""
+        return "Compiler probe cache: %d hit(s), %d miss(es), " \
+               "%d invalidated" % (self.hits, self.misses, self.invalidated)
+
+_PROBE_CACHE = ProbeCache()
+
+def init_probe_cache(filename):
+    """Make the compiler probe cache persistent in the given file."""
+    _PROBE_CACHE.set_filename(filename)
+
+def get_probe_cache():
+    """Return the ProbeCache instance used for compiler detection."""
+    return _PROBE_CACHE
+
+def _probe_env():
+    # The environment used to run the probes: we force the C locale so that
+    # parsers see english messages.
+    env = {'LC_ALL': 'C'}
+    try:
+        env['PATH'] = os.environ['PATH']
+    except KeyError:
+        pass
+    return env
+
+def find_executable(path, search_path = None):
+    """Return the absolute path of the executable path, looking into
+    search_path (os.pathsep separated string) if path has no directory
+    component.
+
+    Returns None if no executable could be found."""
+    if sys.platform == 'win32' and not os.path.splitext(path)[1]:
+        candidates = [path, path + '.exe']
+    else:
+        candidates = [path]
+
+    if os.path.dirname(path):
+        dirs = ['']
+    else:
+        if search_path is None:
+            search_path = os.environ.get('PATH', '')
+        dirs = search_path.split(os.pathsep)
+
+    for d in dirs:
+        for c in candidates:
+            f = os.path.join(d, c)
+            if os.path.isfile(f) and os.access(f, os.X_OK):
+                return os.path.abspath(f)
+    return None
+
+def compiler_fingerprint(path, env = None):
+    """Return a tuple which changes whenever the binary of the compiler given
+    in path, or the environment used to run it change.
+
+    Returns None if the compiler cannot be found."""
+    if env is None:
+        env = _probe_env()
+    binary = find_executable(path, env.get('PATH', ''))
+    if binary is None:
+        return None
+    binary = os.path.realpath(binary)
+    try:
+        st = os.stat(binary)
+    except OSError:
+        return None
+    return (binary, st.st_mtime, st.st_size,
+            env.get('PATH', None), env.get('LC_ALL', None))
+
 def _is_compiler(path, cmdargs, parser):
     # cmdargs is a list of arguments to get verbose information
-    cmd = [path] + cmdargs
     try:
-        env={'LC_ALL': 'C'}
-        try:
-            env['PATH'] = os.environ['PATH']
-        except KeyError, e:
-            pass
-        st, cnt = popen_wrapper(cmd, merge=True, shell=False, env=env)
+        st, cnt = _PROBE_CACHE.probe(path, cmdargs)
     except OSError, e:
         return False, None
     ret, ver = parser(cnt)
@@ -63,46 +254,57 @@ def _is_compiler(path, cmdargs, parser):
     else:
         return False, None
 
+# Arguments given to the compilers to get their version.
+GNU_PROBE = ['-v']
+VERSION_PROBE = ['-V']
+# If the Sun compiler is not given a file as an argument, it returns an error
+# code, even when using dry run and version. So we give a non existing file as
+# an argument: this seems to work, at least for Sun Studio 12 (5.9)
+SUNCC_PROBE = ['-V', "-###", "nonexistingfile.fakec"]
+
 def is_suncc(path):
     """Return True if the compiler in path is sun C compiler."""
-    # If the Sun compiler is not given a file as an argument, it returns an
-    # error code, even when using dry run and version. So we give a non
-    # existing file as an argument: this seems to work, at least for Sun Studio
-    # 12 (5.9)
-    return _is_compiler(path, ['-V', "-###", "nonexistingfile.fakec"], 
-                        parse_suncc)
+    return _is_compiler(path, SUNCC_PROBE, parse_suncc)
 
 def is_suncxx(path):
     """Return True if the compiler in path is sun CXX compiler."""
     # Note that the C++ compiler works in a
     # sensible manner when given -V compared to the C compiler...
-    return _is_compiler(path, ['-V'], parse_suncxx)
+    return _is_compiler(path, VERSION_PROBE, parse_suncxx)
 
 def is_sunfortran(path):
     """Return True if the compiler in path is sun fortran compiler."""
-    return _is_compiler(path, ['-V'], parse_sunfortran)
+    return _is_compiler(path, VERSION_PROBE, parse_sunfortran)
 
 def is_icc(path):
     """Return True if the compiler in path is Intel C compiler."""
-    return _is_compiler(path, ['-V'], parse_icc)
+    return _is_compiler(path, VERSION_PROBE, parse_icc)
 
 def is_ifort(path):
     """Return True if the compiler in path is Intel Fortran compiler."""
-    return _is_compiler(path, ['-V'], parse_ifort)
+    return _is_compiler(path, VERSION_PROBE, parse_ifort)
 
 def is_gcc(path):
     """Return True if the compiler in path is GNU compiler."""
-    return _is_compiler(path, ['-v'], parse_gnu)
+    return _is_compiler(path, GNU_PROBE, parse_gnu)
+
+def _gnu_major(version):
+    try:
+        return int(version.split(".")[0])
+    except ValueError:
+        raise UnknownCompiler("Could not parse version %s" % version)
+
+def _is_g77_version(version):
+    return _gnu_major(version) < 4
+
+def _is_gfortran_version(version):
+    return _gnu_major(version) >= 4
 
 def is_g77(path):
     """Return True if the compiler in path is GNU F77 compiler."""
     st, v = is_gcc(path)
     if st:
-        try:
-            major = int(v.split(".")[0])
-            return major < 4, v
-        except ValueError:
-            raise UnknownCompiler("Could not parse version %v" % v)
+        return _is_g77_version(v), v
     else:
         return st, v
 
@@ -110,60 +312,122 @@ def is_gfortran(path):
     """Return True if the compiler in path is GNU F77/F90/F95 compiler."""
     st, v = is_gcc(path)
     if st:
-        try:
-            major = int(v.split(".")[0])
-            return major >= 4, v
-        except ValueError:
-            raise UnknownCompiler("Could not parse version %v" % v)
+        return _is_gfortran_version(v), v
     else:
         return st, v
 
+# Compilers candidates for each language, in the order they are tried. Each
+# candidate is a tuple (type, probe, parser, accept), where probe is the list
+# of arguments to run the compiler with, parser is the function parsing the
+# output of the probe, and accept an optional function which, given the parsed
+# version, returns True if the version matches the type.
+CC_CANDIDATES = [
+        ("gcc", GNU_PROBE, parse_gnu, None),
+        ("suncc", SUNCC_PROBE, parse_suncc, None),
+        ("intelc", VERSION_PROBE, parse_icc, None)]
+
+CXX_CANDIDATES = [
+        ("g++", GNU_PROBE, parse_gnu, None),
+        ("suncc", VERSION_PROBE, parse_suncxx, None),
+        ("intelc", VERSION_PROBE, parse_icc, None)]
+
+F77_CANDIDATES = [
+        ("g77", GNU_PROBE, parse_gnu, _is_g77_version),
+        ("gfortran", GNU_PROBE, parse_gnu, _is_gfortran_version),
+        ("sunf77", VERSION_PROBE, parse_sunfortran, None),
+        ("ifort", VERSION_PROBE, parse_ifort, None)]
+
+def identify_compiler(path, candidates, cache = None):
+    """Return the tuple (type, version) of the compiler in path, type being
+    the first matching candidate.
+
+    Each distinct probe is run at most once, and its output is given to every
+    candidate parser using it. Returns (None, None) if no candidate matches."""
+    if cache is None:
+        cache = _PROBE_CACHE
+
+    outputs = {}
+    for type, probe, parser, accept in candidates:
+        key = tuple(probe)
+        if not outputs.has_key(key):
+            try:
+                outputs[key] = cache.probe(path, probe)
+            except OSError:
+                outputs[key] = None
+        if outputs[key] is None:
+            continue
+
+        st, cnt = outputs[key]
+        if st != 0:
+            continue
+        ret, version = parser(cnt)
+        if ret and (accept is None or accept(version)):
+            return type, version
+
+    return None, None
+
+def identify_compilers(compilers, cache = None):
+    """Identify several compilers concurrently.
+
+    compilers is a list of (path, candidates) tuples: each compiler is probed
+    from its own thread, and the list of (type, version) is returned in the
+    same order. As the probe outputs end up in the cache, this can be used to
+    prefetch the results of later get_*_type calls."""
+    if cache is None:
+        cache = _PROBE_CACHE
+
+    results = [(None, None)] * len(compilers)
+    def run(i, path, candidates):
+        try:
+            results[i] = identify_compiler(path, candidates, cache)
+        except UnknownCompiler:
+            # Errors will be raised again when the compiler is identified
+            # sequentially
+            pass
+
+    threads = []
+    for i in range(len(compilers)):
+        path, candidates = compilers[i]
+        t = threading.Thread(target = run, args = (i, path, candidates))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+
+    return results
+
 # XXX: support default compiler for platforms where it makes sense (unix)
 def get_cc_type(env, path):
     # If not cached, detect type of CC, otherwise just return the cached value
     if not env.has_key("NUMPY_CC_TYPE"):
-        if is_gcc(path)[0]:
-            type = "gcc"
-        elif is_suncc(path)[0]:
-            type = "suncc"
-        elif is_icc(path)[0]:
-            type = "intelc"
-        else:
+        type, version = identify_compiler(path, CC_CANDIDATES)
+        if type is None:
             if sys.platform != "win32":
                 type = "cc"
             else:
                 raise UnknownCompiler("Unknown C compiler %s" % path)
         env["NUMPY_CC_TYPE"] = type
+        env["NUMPY_CC_VERSION"] = version
     return env["NUMPY_CC_TYPE"]
 
 def get_cxx_type(env, path):
     # If not cached, detect type of CXX, otherwise just return the cached value
     if not env.has_key("NUMPY_CXX_TYPE"):
-        if is_gcc(path)[0]:
-            type = "g++"
-        elif is_suncxx(path)[0]:
-            type = "suncc"
-        elif is_icc(path)[0]:
-            type = "intelc"
-        else:
+        type, version = identify_compiler(path, CXX_CANDIDATES)
+        if type is None:
             raise UnknownCompiler("Unknown CXX compiler %s" % path)
         env["NUMPY_CXX_TYPE"] = type
+        env["NUMPY_CXX_VERSION"] = version
     return env["NUMPY_CXX_TYPE"]
 
 def get_f77_type(env, path):
     # If not cached, detect type of F77, otherwise just return the cached value
     if not env.has_key("NUMPY_F77_TYPE"):
-        if is_g77(path)[0]:
-            type =  "g77"
-        elif is_gfortran(path)[0]:
-            type =  "gfortran"
-        elif is_sunfortran(path)[0]:
-            type =  "sunf77"
-        elif is_ifort(path)[0]:
-            type =  "ifort"
-        else:
+        type, version = identify_compiler(path, F77_CANDIDATES)
+        if type is None:
             raise UnknownCompiler("Unknown F77 compiler %s" % path)
         env["NUMPY_F77_TYPE"] = type
+        env["NUMPY_F77_VERSION"] = version
     return env["NUMPY_F77_TYPE"]
 
 if __name__ == "__main__":
@@ -0,0 +1,196 @@
+"""This module implements a cache of parsed configuration (.cfg) files.
+
+Files are parsed at most once per process as long as they do not change (the
+cache is keyed on the path, mtime and size of each file). The configuration
+files shipped with numscons are compiled (marshal) next to them, like .pyc
+files, when numscons is installed (see compile_config_file), and the content
+of other files may be kept in a cache file of the build (see
+init_config_cache), so that unchanged files are not parsed at all."""
+import os
+import sys
+import marshal
+import cPickle
+from ConfigParser import ConfigParser, RawConfigParser
+
+from numscons.core.misc import _CONFDIR
+
+# Bump this when the layout of the compiled form changes
+_COMPILED_VERSION = 1
+_COMPILED_SUFFIX = 'c'
+
+# (path, mtime, size) -> raw content of the file
+_FILES = {}
+# tuple of (path, mtime, size) -> (parser, list of read files)
+_PARSERS = {}
+# Cache file used when read_config is not given one
+_CACHEFILE = [None]
+
+def _signature(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (filename, st.st_mtime, st.st_size)
+
+def _is_shipped(filename):
+    return os.path.abspath(filename).startswith(os.path.abspath(_CONFDIR))
+
+def _parse(filename):
+    # Return the raw content of filename as a list of (section, options)
+    # where options is a list of (option, value), the DEFAULT section being
+    # the first one.
+    parser = RawConfigParser()
+    parser.read([filename])
+    content = [('DEFAULT', parser.defaults().items())]
+    for s in parser.sections():
+        # We cannot use options/items here, as they include the defaults.
+        options = [(k, v) for k, v in parser._sections[s].items()
+                   if k != '__name__']
+        content.append((s, options))
+    return content
+
+def _load_compiled(filename, sig):
+    try:
+        f = open(filename + _COMPILED_SUFFIX, 'rb')
+        try:
+            version, csig, content = marshal.load(f)
+        finally:
+            f.close()
+    except (IOError, EOFError, ValueError, TypeError):
+        return None
+    if version != _COMPILED_VERSION or csig != sig[1:]:
+        return None
+    return content
+
+def compile_config_file(filename):
+    """Write the compiled form of the configuration file filename next to it.
+    This is done when installing numscons (see setup.py): the installation
+    directory is not written to at runtime.
+
+    May raise IOError or OSError."""
+    content = _parse(filename)
+    target = filename + _COMPILED_SUFFIX
+    tmp = target + '.tmp'
+    f = open(tmp, 'wb')
+    try:
+        marshal.dump((_COMPILED_VERSION, _signature(filename)[1:], content),
+                     f)
+    finally:
+        f.close()
+    if os.path.exists(target):
+        os.remove(target)
+    os.rename(tmp, target)
+
+def _load_store(cachefile):
+    try:
+        f = open(cachefile, 'rb')
+        try:
+            version, store = cPickle.load(f)
+        finally:
+            f.close()
+    except (IOError, EOFError, ValueError, TypeError,
+            cPickle.UnpicklingError):
+        return {}
+    if version != _COMPILED_VERSION:
+        return {}
+    return store
+
+def _save_store(cachefile, store):
+    tmp = cachefile + '.tmp'
+    try:
+        d = os.path.dirname(cachefile)
+        if d and not os.path.exists(d):
+            os.makedirs(d)
+        f = open(tmp, 'wb')
+        try:
+            cPickle.dump((_COMPILED_VERSION, store), f, 2)
+        finally:
+            f.close()
+        if sys.platform == 'win32' and os.path.exists(cachefile):
+            os.remove(cachefile)
+        os.rename(tmp, cachefile)
+    except (IOError, OSError):
+        pass
+
+def _read_file(filename, sig, store = None):
+    # store is a dictionary sig -> content, kept in a cache file
+    try:
+        return _FILES[sig]
+    except KeyError:
+        pass
+
+    content = None
+    if _is_shipped(filename):
+        content = _load_compiled(filename, sig)
+    if content is None and store is not None and store.has_key(sig):
+        content = store[sig]
+    if content is None:
+        content = _parse(filename)
+        if store is not None:
+            store[sig] = content
+    _FILES[sig] = content
+    return content
+
+def read_config(files, cachefile = None):
+    """Return (parser, read), where parser is a ConfigParser instance
+    containing the configuration of every existing file in files (later files
+    taking precedence), and read the list of those files.
+
+    If cachefile is given (or set by init_config_cache), the content of the
+    files is also cached in this file, for the next processes. The returned
+    parser is shared: it must not be modified."""
+    sigs = [_signature(f) for f in files]
+    key = tuple(sigs)
+    try:
+        return _PARSERS[key]
+    except KeyError:
+        pass
+
+    if not cachefile:
+        cachefile = _CACHEFILE[0]
+    if cachefile:
+        store = _load_store(cachefile)
+        nentries = len(store)
+    else:
+        store = None
+
+    parser = ConfigParser()
+    read = []
+    for f, sig in zip(files, sigs):
+        if sig is None:
+            continue
+        content = _read_file(f, sig, store)
+        for section, options in content:
+            if section == 'DEFAULT':
+                for k, v in options:
+                    parser.defaults()[k] = v
+                continue
+            if not parser.has_section(section):
+                parser.add_section(section)
+            for k, v in options:
+                parser.set(section, k, v)
+        read.append(f)
+
+    if store is not None and len(store) != nentries:
+        # Keep the entries saved by other processes since we loaded the file
+        for sig, content in _load_store(cachefile).items():
+            if not store.has_key(sig):
+                store[sig] = content
+        # Forget the old content of the files we just read
+        for sig in store.keys():
+            if sig[0] in read and not sig in sigs:
+                del store[sig]
+        _save_store(cachefile, store)
+
+    _PARSERS[key] = (parser, read)
+    return parser, read
+
+def init_config_cache(filename):
+    """Cache the content of the configuration files read without a cache file
+    in the given file."""
+    _CACHEFILE[0] = filename
+
+def clear_config_cache():
+    """Forget every parsed configuration of this process."""
+    _FILES.clear()
+    _PARSERS.clear()
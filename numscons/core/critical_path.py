@@ -0,0 +1,214 @@
+# This module cannot be imported directly, because it needs scons module.
+"""This module implements a critical path aware scheduling of the build.
+
+The scons Taskmaster gives the nodes to build in the order of its DAG walk, so
+that long tasks (e.g. the compilation of a big extension, and the link which
+depends on it) may start late, and the end of a parallel build is serial.
+
+CriticalPathTaskmaster first collects every node ready to be built, and gives
+the one with the longest remaining path first. The remaining path of a node is
+its build duration plus the longest remaining path of its parents: it is the
+minimal time needed to finish the build once the node starts. Durations, and
+remaining paths, come from the previous builds: they are stored in the node
+info of every target in the sconsign file (attributes build_duration and
+critical_path), and updated at the end of every build from the DAG walked by
+this build, so that the remaining paths of a full build are kept after a
+partial rebuild. Nodes without history keep the scons walk order.
+
+At the end of the build, the makespan predicted from the stored durations of
+the executed tasks (the longest of the critical path, and of the total work
+shared between the jobs) is compared to the actual one. The tasks are timed by
+numscons.core.task_recorder."""
+import heapq
+
+import SCons.Node.FS
+import SCons.Taskmaster
+from SCons.Taskmaster import NODE_EXECUTING
+
+# The original class (SCons.Taskmaster.Taskmaster is replaced by
+# enable_critical_path_scheduling)
+_Taskmaster = SCons.Taskmaster.Taskmaster
+
+def _stored(node, name):
+    # Value of the attribute name of the node info stored in the sconsign, or
+    # None
+    if not isinstance(node, SCons.Node.FS.File):
+        return None
+    try:
+        return getattr(node.get_stored_info().ninfo, name, None)
+    except (AttributeError, EnvironmentError):
+        return None
+
+class CriticalPathTaskmaster(_Taskmaster):
+    def __init__(self, *args, **kw):
+        _Taskmaster.__init__(self, *args, **kw)
+        # heap of (-remaining path, sequence number, node, ready_exc)
+        self._ready = []
+        self._seq = 0
+        # Nodes in _ready: a node may be several times in the candidates of
+        # the base class, which only skips the nodes already given to build
+        self._in_ready = {}
+        # Every node given to build, in the order they were given: the
+        # children of a node are always before it
+        self._walked = []
+        from numscons.core.task_recorder import get_task_recorder
+        self._recorder = get_task_recorder()
+        # Tasks recorded before this build
+        self._first_record = len(self._recorder.records)
+
+    def _priority(self, node):
+        path = _stored(node, 'critical_path')
+        if path is None:
+            path = _stored(node, 'build_duration')
+        return path or 0.
+
+    def _find_next_ready_node(self):
+        # Collect every ready node: the base class gives them in walk order
+        while 1:
+            node = _Taskmaster._find_next_ready_node(self)
+            if node is None:
+                break
+            if self._in_ready.has_key(node):
+                continue
+            self._in_ready[node] = 1
+            heapq.heappush(self._ready, (-self._priority(node), self._seq,
+                                         node, self.ready_exc))
+            self._seq += 1
+
+        while self._ready:
+            prio, seq, node, ready_exc = heapq.heappop(self._ready)
+            del self._in_ready[node]
+            # A node sharing a side effect with a node which started since it
+            # was found ready has to wait (see the base class)
+            wait_side_effects = False
+            if not ready_exc:
+                for se in node.get_executor().get_action_side_effects():
+                    if se.get_state() == NODE_EXECUTING:
+                        se.add_to_waiting_s_e(node)
+                        wait_side_effects = True
+            if wait_side_effects:
+                continue
+            self.ready_exc = ready_exc
+            self._walked.append(node)
+            return node
+        self.ready_exc = None
+        return None
+
+    def _records(self):
+        # Records of the tasks executed by this build
+        return self._recorder.records[self._first_record:]
+
+    def stop(self):
+        _Taskmaster.stop(self)
+        # The nodes collected in _ready are not candidates of the base class
+        # anymore: they have to be removed from the pending children as the
+        # candidates are, or cleanup reports them as a dependency cycle
+        self.will_not_build([n for prio, seq, n, exc in self._ready])
+        self._ready = []
+        self._in_ready = {}
+
+    def cleanup(self):
+        _Taskmaster.cleanup(self)
+        paths = self._update_paths()
+        if self._records():
+            print self._report(paths)
+
+    def _update_paths(self):
+        # Compute the remaining paths of every walked node, with the
+        # durations of this build (or the stored ones for the nodes which were
+        # not built), store them with the durations in the node infos, and
+        # return the critical paths (with the stored durations, and with the
+        # actual ones) of the executed tasks.
+        times = {}
+        for r in self._records():
+            for n in r.targets:
+                times[n] = (r.start, r.end)
+
+        walked = {}
+        for n in self._walked:
+            walked[n] = []
+        for n in self._walked:
+            try:
+                children = n.get_executor().get_all_children()
+            except Exception:
+                continue
+            for c in children:
+                try:
+                    walked[c].append(n)
+                except KeyError:
+                    pass
+
+        path = {}
+        predicted = {}
+        actual = {}
+        # Parents are after their children in self._walked
+        rwalked = self._walked[:]
+        rwalked.reverse()
+        for n in rwalked:
+            stored = _stored(n, 'build_duration')
+            try:
+                start, end = times[n]
+            except KeyError:
+                duration = stored or 0.
+                pduration = aduration = 0.
+            else:
+                duration = aduration = end - start
+                pduration = stored or 0.
+            p = pp = pa = 0.
+            for parent in walked[n]:
+                p = max(p, path[parent])
+                pp = max(pp, predicted[parent])
+                pa = max(pa, actual[parent])
+            path[n] = duration + p
+            predicted[n] = pduration + pp
+            actual[n] = aduration + pa
+
+            if isinstance(n, SCons.Node.FS.File) and n.has_builder():
+                ninfo = n.get_ninfo()
+                ninfo.critical_path = path[n]
+                if times.has_key(n):
+                    ninfo.build_duration = duration
+                elif stored is not None:
+                    ninfo.build_duration = stored
+
+        return max([0.] + predicted.values()), max([0.] + actual.values())
+
+    def _report(self, paths):
+        from numscons.core.sconf_batch import get_num_jobs
+        njobs = get_num_jobs()
+
+        records = self._records()
+        work = 0.
+        pwork = 0.
+        nhistory = 0
+        for r in records:
+            work += r.end - r.start
+            stored = _stored(r.targets[0], 'build_duration')
+            if stored is not None:
+                pwork += stored
+                nhistory += 1
+        makespan = max([r.end for r in records]) - \
+                   min([r.start for r in records])
+
+        lines = ["Critical path scheduling (%d jobs): %d tasks, %d with a "\
+                 "recorded duration" % (njobs, len(records), nhistory)]
+        lines.append("    predicted makespan: %8.2f s (critical path %.2f s, "\
+                     "work %.2f s)" % (max(paths[0], pwork / njobs), paths[0],
+                                       pwork))
+        lines.append("    actual makespan:    %8.2f s (critical path %.2f s, "\
+                     "work %.2f s)" % (makespan, paths[1], work))
+        return "\n".join(lines)
+
+def _taskmaster(targets = [], tasker = None, order = None, trace = None):
+    # Only the build itself is scheduled on the critical path: not the
+    # configuration checks, nor scons -c or -q
+    from SCons.Script.Main import BuildTask
+    if tasker is BuildTask:
+        factory = CriticalPathTaskmaster
+    else:
+        factory = _Taskmaster
+    return factory(targets, tasker, order, trace)
+
+def enable_critical_path_scheduling():
+    """Make scons use CriticalPathTaskmaster for the build."""
+    SCons.Taskmaster.Taskmaster = _taskmaster
@@ -0,0 +1,121 @@
+"""This module implements a content-addressed cache of generated files.
+
+An entry of the cache is a set of files, stored under a key computed by the
+caller from everything the files depend on. The cache may be shared by several
+build trees, and used by several processes at the same time: entries are
+written in a temporary directory first, and renamed once complete.
+
+The total size of the cache is bounded: least recently used entries are
+removed when it is exceeded."""
+import os
+import shutil
+import tempfile
+from os.path import join as pjoin
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import new as md5
+
+def cache_key(*args):
+    """Return a key for the given arguments (strings or any object with a
+    stable repr)."""
+    m = md5()
+    for a in args:
+        if not isinstance(a, str):
+            a = repr(a)
+        m.update('%d:' % len(a))
+        m.update(a)
+    return m.hexdigest()
+
+class FileCache:
+    """Cache of generated files in directory, of at most max_size bytes."""
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, key):
+        return pjoin(self.directory, key[:2], key)
+
+    def get(self, key, filenames):
+        """Restore the files of the entry key as filenames (in the same order
+        as they were given to put). Returns True if the files were
+        restored."""
+        entry = self._entry(key)
+        try:
+            for i in range(len(filenames)):
+                shutil.copyfile(pjoin(entry, str(i)), filenames[i])
+            # Mark the entry as recently used
+            os.utime(entry, None)
+        except (IOError, OSError):
+            # Not in the cache, or removed while we were reading it
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def put(self, key, filenames):
+        """Store the files filenames as the entry key."""
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            return
+        tmp = None
+        try:
+            d = os.path.dirname(entry)
+            if not os.path.exists(d):
+                try:
+                    os.makedirs(d)
+                except OSError:
+                    # Created concurrently ?
+                    if not os.path.isdir(d):
+                        raise
+            tmp = tempfile.mkdtemp(prefix = key + '.tmp', dir = d)
+            for i in range(len(filenames)):
+                shutil.copyfile(filenames[i], pjoin(tmp, str(i)))
+            os.rename(tmp, entry)
+            tmp = None
+        except (IOError, OSError):
+            # The entry may have been stored concurrently, or the cache is
+            # not writable: not a problem in both cases
+            pass
+        if tmp:
+            shutil.rmtree(tmp, True)
+        self.evict()
+
+    def _entries(self):
+        # Return a list of (mtime, size, path) for every entry
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for d in os.listdir(self.directory):
+            d = pjoin(self.directory, d)
+            if not os.path.isdir(d):
+                continue
+            for e in os.listdir(d):
+                if e.find('.tmp') != -1:
+                    continue
+                e = pjoin(d, e)
+                try:
+                    size = 0
+                    for f in os.listdir(e):
+                        size += os.path.getsize(pjoin(e, f))
+                    entries.append((os.path.getmtime(e), size, e))
+                except OSError:
+                    # Removed concurrently
+                    pass
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is not
+        bigger than max_size."""
+        entries = self._entries()
+        total = sum([e[1] for e in entries])
+        if total <= self.max_size:
+            return
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path, True)
+            total -= size
@@ -13,7 +13,9 @@ from numscons.core.misc import get_scons_build_dir, \
      get_scons_configres_filename
 from numscons.core.template_generators import generate_from_c_template, \
      generate_from_f_template, generate_from_template_emitter, \
-     generate_from_template_scanner
+     generate_from_template_scanner, generate_from_c_template_batch, \
+     generate_from_f_template_batch, template_batch_key, FromCTemplateBatch, \
+     FromFTemplateBatch
 import numscons.core.trace
 
 from numscons.tools.substinfile import TOOL_SUBST
@@ -52,6 +54,28 @@ def GetNumpyOptions(args):
     opts.Add('pkg_path', "UNDOCUMENTED", '')
     opts.Add(BoolVariable('inplace',
                         "true if building in place numpy, false if not", 0))
+    opts.Add(BoolVariable('template_cache_stats',
+                        "true to print the hit rate of the templates "\
+                        "expansion cache at the end of the build", 0))
+    opts.Add(BoolVariable('multi_package',
+                        "true if every package is built from one scons "\
+                        "invocation (see NumpyPackages)", 0))
+    opts.Add(BoolVariable('python_action_pool',
+                        "true to run the python actions (template expansion, "\
+                        "cython, substitution in files) in worker processes "\
+                        "when building with several jobs", 1))
+    opts.Add(BoolVariable('action_stats',
+                        "true to print the time spent in every kind of "\
+                        "action at the end of the build", 0))
+    opts.Add(BoolVariable('critical_path_scheduling',
+                        "true to build first the targets on the longest "\
+                        "path of the previous builds", 0))
+    opts.Add('build_trace',
+             'file to write the timings of the build actions in, in the '\
+             'chrome trace format (no trace if empty)', '')
+    opts.Add(BoolVariable('journal_sconsign',
+                        "true to store the signatures in an append-only "\
+                        "journal instead of a dblite file", 0))
 
     # Add compiler related info
     opts.Add('cc_opt', 'name of C compiler', '')
@@ -65,6 +89,11 @@ def GetNumpyOptions(args):
 
     opts.Add(BoolVariable('bypass',
                         "true if bypassing compiler detection by distutils", 0))
+    opts.Add(BoolVariable('parallel_probe',
+                        "true if compilers should be probed concurrently", 0))
+    opts.Add(BoolVariable('force_checks',
+                        "true if configuration checks should not use "\
+                        "results cached by other packages", 0))
     opts.Add(BoolVariable('import_env',
                         "true if importing user env into numscons env['ENV'].", 0))
     opts.Add(BoolVariable('debug', "True if debug mode", 0))
@@ -158,6 +187,29 @@ def add_custom_builders(env):
                 emitter = generate_from_template_emitter,
                 source_scanner = tpl_scanner)
 
+    # Same as above, for many templates at once: env.FromCTemplateBatch and
+    # env.FromFTemplateBatch call these once per template, and the out of
+    # date templates of a call are expanded in one action, concurrently in
+    # the python action pool when building with several jobs (see
+    # numscons.core.template_generators.generate_batch)
+    env['BUILDERS']['_FromCTemplateBatch'] = Builder(
+                action = Action(generate_from_c_template_batch,
+                                '$CTEMPLATECOMSTR',
+                                batch_key = template_batch_key,
+                                targets = '$CHANGED_TARGETS'),
+                emitter = generate_from_template_emitter,
+                source_scanner = tpl_scanner)
+
+    env['BUILDERS']['_FromFTemplateBatch'] = Builder(
+                action = Action(generate_from_f_template_batch,
+                                '$FTEMPLATECOMSTR',
+                                batch_key = template_batch_key,
+                                targets = '$CHANGED_TARGETS'),
+                emitter = generate_from_template_emitter,
+                source_scanner = tpl_scanner)
+    env.AddMethod(FromCTemplateBatch)
+    env.AddMethod(FromFTemplateBatch)
+
     createStaticExtLibraryBuilder(env)
     env['BUILDERS']['DistutilsStaticExtLibrary'] = DistutilsStaticExtLibrary
     env['BUILDERS']['DistutilsInstalledStaticExtLibrary'] = \
@@ -8,9 +8,13 @@ from os.path import join as pjoin
 import sys
 
 from numscons.core.misc import built_with_mstools, built_with_mingw, \
-    pyplat2sconsplat, cc_version, iscplusplus, is_python_win64
+    pyplat2sconsplat, cc_version, iscplusplus, is_python_win64, \
+    get_scons_configres_dir, get_compiler_probe_cache_filename, \
+    get_config_cache_filename
 from numscons.core.compiler_detection import get_cc_type, get_f77_type, \
-    get_cxx_type
+    get_cxx_type, init_probe_cache, get_probe_cache, identify_compilers, \
+    CC_CANDIDATES, F77_CANDIDATES, CXX_CANDIDATES
+from numscons.core.config_cache import init_config_cache
 from numscons.core.compiler_config import get_config as get_compiler_config, \
     NoCompilerConfig, CompilerConfig
 from numscons.core.default import tool_list
@@ -38,17 +42,39 @@ def configure_compiler(name, env, lang):
         cfg = CompilerConfig()
     env["NUMPY_CUSTOMIZATION"][lang] = cfg
 
+def _tool_path(env, name):
+    # Return the full path of the tool set by distutils in name_opt and
+    # name_opt_path
+    if len(env['%s_opt_path' % name]) > 0:
+        return pjoin(env['%s_opt_path' % name], env['%s_opt' % name])
+    else:
+        return env['%s_opt' % name]
+
+def prefetch_compilers(env):
+    """Run the detection probes of the C, F77 and CXX compilers given by
+    distutils concurrently.
+
+    This only fills the probe cache: the tools themselves are still
+    initialized sequentially by initialize_cc, initialize_f77 and
+    initialize_cxx."""
+    if is_bypassed(env) or built_with_mstools(env):
+        return
+
+    compilers = []
+    for name, candidates in [('cc', CC_CANDIDATES), ('f77', F77_CANDIDATES),
+                             ('cxx', CXX_CANDIDATES)]:
+        if len(env['%s_opt' % name]) > 0:
+            compilers.append((_tool_path(env, name), candidates))
+    debug('Prefetching compilers probes for %s' % [c[0] for c in compilers])
+    identify_compilers(compilers)
+
 def initialize_cc(env):
     """Initialize C compiler from distutils info."""
     from SCons.Tool import FindTool
 
     def set_cc_from_distutils():
-        if len(env['cc_opt_path']) > 0:
-            debug('Setting cc_opt_path from distutils (%s).' % env['cc_opt_path'])
-            cc = pjoin(env["cc_opt_path"], env["cc_opt"])
-        else:
-            debug('Setting wo cc_opt_path')
-            cc = env["cc_opt"]
+        debug('Setting cc_opt_path from distutils (%s).' % env['cc_opt_path'])
+        cc = _tool_path(env, 'cc')
 
         if built_with_mstools(env):
             info('Detecting ms build.')
@@ -94,10 +120,7 @@ def initialize_f77(env):
     def set_f77_from_distutils():
         if len(env['f77_opt']) > 0:
             debug('Setting F77 from distutils: %s' % env['f77_opt'])
-            if len(env['f77_opt_path']) > 0:
-                f77 = pjoin(env['f77_opt_path'], env['f77_opt'])
-            else:
-                f77 = env['f77_opt']
+            f77 = _tool_path(env, 'f77')
 
             name = get_f77_type(env, f77)
             info('Detecting F77 type: %s' % name)
@@ -130,10 +153,7 @@ def initialize_cxx(env):
     from SCons.Tool import FindTool
     def set_cxx_from_distutils():
         if len(env['cxx_opt']) > 0:
-            if len(env['cxx_opt_path']) > 0:
-                cxx = pjoin(env['cxx_opt_path'], env['cxx_opt'])
-            else:
-                cxx = env['cxx_opt']
+            cxx = _tool_path(env, 'cxx')
 
             if built_with_mstools(env):
                 name = "msvc"
@@ -179,6 +199,19 @@ def initialize_tools(env):
             env["ICC_ABI"] = "amd64"
             env["IFORT_ABI"] = "amd64"
 
+    # Compilers probes are cached in the configres directory, so that they
+    # are shared by every package
+    init_probe_cache(pjoin(str(env.fs.Top), get_scons_configres_dir(),
+                           get_compiler_probe_cache_filename()))
+    # Same for the content of the configuration files
+    init_config_cache(pjoin(str(env.fs.Top), get_scons_configres_dir(),
+                            get_config_cache_filename()))
+
+    # Probing the compilers may be slow: run the probes concurrently if
+    # asked to. The tools are still initialized in a deterministic order below.
+    if env['parallel_probe']:
+        prefetch_compilers(env)
+
     # Initialize CC tool from distutils info
     initialize_cc(env)
 
@@ -188,6 +221,8 @@ def initialize_tools(env):
     # Initialize CXX tool from distutils info
     initialize_cxx(env)
 
+    info(get_probe_cache().report())
+
     # Adding default tools for the one we do not customize: mingw is special
     # according to scons, don't ask me why, but this does not work as expected
     # for this tool.
@@ -0,0 +1,288 @@
+"""This module implements an append-only signature database for scons.
+
+It can be used instead of SCons.dblite as the dbm module of the sconsign file
+(see SConsignFile). dblite pickles the whole database in a new file each time
+it is synced, that is at the end of every build; here, only the entries which
+changed since the last sync are appended to the file (a journal), so that the
+cost of a build which changes few directories does not depend on the size of
+the tree.
+
+The file starts with a magic string, followed by records:
+    crc32 (of key and value), len(key), len(value), key, value
+the first three being 32 bits unsigned integers in network order. When the
+file is read, the records are replayed in order, the last value of a key
+winning. Replay stops at the first truncated record, which is what a build
+interrupted during a sync leaves behind: the records written before it are
+kept, and the next sync rewrites the file without the broken tail.
+
+The file is compacted (rewritten with one record per key, in a new file
+renamed over the old one) when it becomes much bigger than the live entries.
+
+Values are read lazily: when the file is opened, only the record headers and
+the keys are read, to build an index of the last record of every key in the
+(mmaped) file. A value is read, and its checksum verified, when it is
+accessed: a build which only looks at a few directories does not read the
+others. A value whose checksum is wrong is reported as missing, so that scons
+only considers the targets of this directory as out of date.
+
+If the journal does not exist yet, the entries of the dblite file of the same
+base name are imported, so that switching to the journal does not trigger a
+full rebuild."""
+import os
+import sys
+import struct
+import cPickle
+import zlib
+import __builtin__
+
+MAGIC = 'NSJOURNAL1\n'
+journal_suffix = '.journal'
+dblite_suffix = '.dblite'
+tmp_suffix = '.tmp'
+
+_HEADER = '!III'
+_HEADER_SIZE = struct.calcsize(_HEADER)
+
+# The journal is compacted when it is bigger than COMPACT_RATIO times the size
+# of the live records, and than COMPACT_MIN_SIZE
+COMPACT_RATIO = 2
+COMPACT_MIN_SIZE = 64 * 1024
+
+def _crc(key, value):
+    return zlib.crc32(value, zlib.crc32(key)) & 0xffffffffL
+
+def _record(key, value):
+    return struct.pack(_HEADER, _crc(key, value), len(key), len(value)) + \
+           key + value
+
+def _read_file(filename):
+    # Return the content of filename, mmaped if possible
+    f = __builtin__.open(filename, 'rb')
+    try:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return ''
+        try:
+            import mmap
+            return mmap.mmap(f.fileno(), size, access = mmap.ACCESS_READ)
+        except (ImportError, EnvironmentError, ValueError):
+            return f.read()
+    finally:
+        f.close()
+
+def scan(data):
+    """Scan the records of the journal content data, without reading the
+    values. Returns (index, offset): index maps every key to (crc, position of
+    the value, length of the value) for its last record, offset is the end of
+    the last complete record."""
+    index = {}
+    if data[:len(MAGIC)] != MAGIC:
+        return index, 0
+    offset = len(MAGIC)
+    size = len(data)
+    while offset + _HEADER_SIZE <= size:
+        crc, klen, vlen = struct.unpack(_HEADER,
+                                        data[offset:offset + _HEADER_SIZE])
+        start = offset + _HEADER_SIZE
+        end = start + klen + vlen
+        if end > size:
+            break
+        index[data[start:start + klen]] = (crc, start + klen, vlen)
+        offset = end
+    return index, offset
+
+def _as_str(s, what):
+    if isinstance(s, unicode):
+        return s.encode('utf-8')
+    elif not isinstance(s, str):
+        raise TypeError("%s `%s' must be a string but is %s" \
+                        % (what, s, type(s)))
+    return s
+
+class JournalDB:
+    """dbm-like object stored in an append-only journal."""
+    def __init__(self, file_base_name, flag, mode):
+        assert flag in (None, "r", "w", "c", "n")
+        if flag is None:
+            flag = "r"
+        base, ext = os.path.splitext(file_base_name)
+        if ext == journal_suffix:
+            self._file_name = file_base_name
+        else:
+            base = file_base_name
+            self._file_name = file_base_name + journal_suffix
+        self._tmp_name = self._file_name + tmp_suffix
+        self._flag = flag
+        self._mode = mode
+
+        # _dict: key -> value, for the values set since the file was opened,
+        # _index: key -> (crc, position, length) of the values in _data (the
+        # file content) not read yet. A key is either in _dict or in _index.
+        # _pending: keys changed since the last sync
+        self._dict = {}
+        self._index = {}
+        self._data = ''
+        self._pending = {}
+        # _offset: end of the valid records in the file, _live: size of the
+        # records of the current values. _offset is None when the file has to
+        # be rewritten
+        self._offset = None
+        self._live = 0
+
+        if flag == "n":
+            self._compact()
+            return
+
+        try:
+            data = _read_file(self._file_name)
+        except IOError, e:
+            if flag != "c":
+                raise e
+            self._dict = _read_dblite(base + dblite_suffix)
+            self._compact()
+            return
+
+        self._data = data
+        self._index, self._offset = scan(data)
+        if self._offset == 0 or self._offset < len(data):
+            # Not a journal, or broken tail left by an interrupted sync:
+            # rewrite the file at next sync
+            self._offset = None
+        self._live = len(MAGIC)
+        for k, (crc, start, vlen) in self._index.items():
+            self._live += _HEADER_SIZE + len(k) + vlen
+
+    def _read(self, key):
+        # Read the value of key from the file, or raise KeyError
+        crc, start, vlen = self._index[key]
+        value = self._data[start:start + vlen]
+        if _crc(key, value) != crc:
+            del self._index[key]
+            self._live -= _HEADER_SIZE + len(key) + vlen
+            raise KeyError(key)
+        return value
+
+    def _close_data(self):
+        if hasattr(self._data, 'close'):
+            self._data.close()
+        self._data = ''
+
+    def __del__(self):
+        if self._pending:
+            self.sync()
+
+    def _check_writable(self):
+        if self._flag == "r":
+            raise IOError("Read-only database: %s" % self._file_name)
+
+    def _compact(self):
+        # Write all the entries in a new file, renamed over the journal
+        for k in self._index.keys():
+            try:
+                self._dict[k] = self._read(k)
+            except KeyError:
+                pass
+        self._index = {}
+        self._close_data()
+
+        chunks = [MAGIC]
+        for k, v in self._dict.items():
+            chunks.append(_record(k, v))
+        data = ''.join(chunks)
+        f = os.fdopen(os.open(self._tmp_name,
+                              os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                              self._mode), 'wb')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        if sys.platform == 'win32' and os.path.exists(self._file_name):
+            # Windows doesn't allow renaming if the file exists
+            os.unlink(self._file_name)
+        os.rename(self._tmp_name, self._file_name)
+        self._offset = self._live = len(data)
+        self._pending = {}
+
+    def sync(self):
+        self._check_writable()
+        if self._offset is None or \
+           (self._offset > COMPACT_RATIO * self._live and \
+            self._offset > COMPACT_MIN_SIZE):
+            self._compact()
+            return
+        if not self._pending:
+            return
+
+        chunks = []
+        for k in self._pending.keys():
+            chunks.append(_record(k, self._dict[k]))
+        data = ''.join(chunks)
+        f = __builtin__.open(self._file_name, 'ab')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        self._offset += len(data)
+        self._pending = {}
+
+    def __getitem__(self, key):
+        key = _as_str(key, 'key')
+        try:
+            return self._dict[key]
+        except KeyError:
+            return self._read(key)
+
+    def __setitem__(self, key, value):
+        self._check_writable()
+        key = _as_str(key, 'key')
+        value = _as_str(value, 'value')
+        try:
+            old = self[key]
+        except KeyError:
+            old = None
+        else:
+            if old == value:
+                # scons writes the entries of every visited directory, even
+                # when they did not change: nothing to append
+                return
+            self._live -= _HEADER_SIZE + len(key) + len(old)
+        if self._index.has_key(key):
+            del self._index[key]
+        self._dict[key] = value
+        self._live += _HEADER_SIZE + len(key) + len(value)
+        self._pending[key] = 1
+
+    def keys(self):
+        return self._dict.keys() + self._index.keys()
+
+    def has_key(self, key):
+        key = _as_str(key, 'key')
+        return self._dict.has_key(key) or self._index.has_key(key)
+
+    def __contains__(self, key):
+        return self.has_key(key)
+
+    def iterkeys(self):
+        return iter(self.keys())
+
+    __iter__ = iterkeys
+
+    def __len__(self):
+        return len(self._dict) + len(self._index)
+
+def _read_dblite(filename):
+    # Return the entries of the dblite file filename, or an empty dict
+    try:
+        f = __builtin__.open(filename, 'rb')
+        try:
+            entries = cPickle.load(f)
+        finally:
+            f.close()
+    except (IOError, EOFError, ValueError, TypeError, cPickle.UnpicklingError):
+        return {}
+    if not isinstance(entries, dict):
+        return {}
+    return entries
+
+def open(file, flag = None, mode = 0666):
+    return JournalDB(file, flag, mode)
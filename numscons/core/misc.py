@@ -37,6 +37,41 @@ def get_scons_configres_filename():
     The path is relative to the top setup.py"""
     return '__configres.py'
 
+def get_compiler_probe_cache_filename():
+    """Return the name of the file where compiler probes outputs are cached.
+
+    The file is put in the configres directory, so that it is shared by every
+    package."""
+    return 'compiler_probes.cache'
+
+def get_config_cache_filename():
+    """Return the name of the file where the content of the configuration
+    files of numscons is cached.
+
+    The file is put in the configres directory, so that it is shared by every
+    package."""
+    return 'config.cache'
+
+def get_site_config_cache_filename():
+    """Return the name of the file where the content of site.cfg files is
+    cached."""
+    return 'siteconfig.cache'
+
+def get_check_cache_dirname():
+    """Return the name of the directory where configuration checks results
+    are cached.
+
+    The directory is put in the configres directory, so that it is shared by
+    every package."""
+    return 'checks'
+
+def get_template_cache_dirname():
+    """Return the name of the directory where the expansions of .src
+    templates are cached.
+
+    The directory is put in the configres directory."""
+    return 'templates'
+
 # Those built_* are not good: we should have a better way to get the real type
 # of compiler instead of being based on names (to support things like colorgcc,
 # gcc-4.2, etc...). Fortunately, we mostly need this on MS platform only.
@@ -64,10 +64,22 @@ class NumpyEnvironment(Environment):
                 n += 1
             return pjoin(os.sep.join([os.pardir for i in range(n)]), builddir)
 
-        sconsign = pjoin(get_build_relative_src(self['src_dir'],
-                                                self['build_dir']),
-                         'sconsign.dblite')
-        self.SConsignFile(sconsign)
+        if self['multi_package']:
+            # There is only one sconsign file per scons invocation: use one
+            # for all the packages, relatively to the top directory (the
+            # SConstruct directory is the package one, see NumpyPackages)
+            sconsign = pjoin(self.fs.Top.abspath, self['build_prefix'],
+                             'sconsign')
+        else:
+            sconsign = pjoin(get_build_relative_src(self['src_dir'],
+                                                    self['build_dir']),
+                             'sconsign')
+        if self['journal_sconsign']:
+            # The journal imports the existing sconsign.dblite, if any
+            from numscons.core import journaldb
+            self.SConsignFile(sconsign, journaldb)
+        else:
+            self.SConsignFile(sconsign + '.dblite')
 
     def _customize_scons_env(self):
         """Customize scons environment from user environment."""
@@ -113,6 +125,9 @@ class NumpyEnvironment(Environment):
             return get_last_error_from_config(errlines)
 
         config.GetLastError = new.instancemethod(GetLastError, config)
+
+        from numscons.core.sconf_batch import TryBatch
+        config.TryBatch = new.instancemethod(TryBatch, config)
         return config
 
     def Tool(self, toolname, path = None):
@@ -0,0 +1,292 @@
+# This module cannot be imported directly, because it needs scons module.
+"""This module implements batches of configuration probes.
+
+SConf builds every TryCompile/TryLink probe on its own, one after the other,
+even when scons is run with -j. TryBatch builds a set of independent probes
+with as many jobs as given to scons, and returns their results in the order of
+the probes.
+
+SConfBuildTask is not meant to run in several threads: it captures the output
+of a probe by replacing sys.stdout, and by setting PSTDOUT in the environment
+shared by the probes. Here, every probe is built in its own override
+environment, whose SPAWN and PRINT_CMD_LINE_FUNC write in a file of the
+probe: the output of a probe is kept in its build info, and written in the
+configuration log in one piece once the probe is built."""
+import os
+import sys
+import tempfile
+import threading
+
+import SCons.Errors
+import SCons.Job
+import SCons.Node
+import SCons.SConf
+import SCons.SConsign
+import SCons.Taskmaster
+import SCons.Util
+
+# Serializes the writes in the log and the sconsign of the probes
+_LOCK = threading.Lock()
+
+def get_num_jobs():
+    """Return the number of jobs scons has been asked to use."""
+    from SCons.Script.Main import GetOption
+    try:
+        return max(int(GetOption('num_jobs')), 1)
+    except (AttributeError, TypeError, ValueError):
+        return 1
+
+def TryBatch(sconf, probes, builder = 'Program', first = True):
+    """Build every probe with the given builder (name of an environment
+    builder, e.g. 'Program' or 'Object').
+
+    probes is a list of (text, extension, overrides) tuples, overrides being a
+    dictionary of construction variables which replace the ones of the
+    configure environment for this probe only.
+
+    Returns a list of results in the same order as probes: 1 on success, 0 on
+    failure, None if the probe was not built. When first is True, only the
+    first successful probe matters: probes are then built in order, by groups
+    of as many probes as jobs, until one succeeds. sconf.lastTarget is set to
+    the target of the first successful probe."""
+    num_jobs = get_num_jobs()
+    if len(probes) < 2 or num_jobs < 2:
+        return _try_sequential(sconf, probes, builder, first)
+    else:
+        return _try_parallel(sconf, probes, builder, num_jobs, first)
+
+def _try_sequential(sconf, probes, builder, first):
+    env = sconf.env
+    results = [None] * len(probes)
+    last = None
+    for i in range(len(probes)):
+        text, ext, overrides = probes[i]
+        saved = {}
+        for k in overrides.keys():
+            saved[k] = env.has_key(k) and env[k] or []
+        try:
+            env.Replace(**overrides)
+            results[i] = sconf.TryBuild(getattr(env, builder), text, ext)
+        finally:
+            env.Replace(**saved)
+        if results[i]:
+            if last is None:
+                last = sconf.lastTarget
+            if first:
+                break
+    sconf.lastTarget = last
+    return results
+
+def _try_parallel(sconf, probes, builder, num_jobs, first = False):
+    try:
+        sconf.pspawn = sconf.env['PSPAWN']
+    except KeyError:
+        raise SCons.Errors.UserError('Missing PSPAWN construction variable.')
+
+    if first:
+        groups = [probes[i:i + num_jobs]
+                  for i in range(0, len(probes), num_jobs)]
+    else:
+        groups = [probes]
+
+    results = []
+    sconf.lastTarget = None
+    for group in groups:
+        probes_nodes = [_probe_nodes(sconf, builder, text, ext, overrides)
+                        for text, ext, overrides in group]
+        allnodes = []
+        for source, nodes in probes_nodes:
+            allnodes.extend(source)
+            allnodes.extend(nodes)
+        _build_nodes(sconf, allnodes, num_jobs)
+
+        for source, nodes in probes_nodes:
+            res = 1
+            for n in list(source) + nodes:
+                state = n.get_state()
+                if (state != SCons.Node.executed and
+                    state != SCons.Node.up_to_date):
+                    res = 0
+            if res and sconf.lastTarget is None:
+                sconf.lastTarget = nodes[0]
+            results.append(res)
+        if first and sconf.lastTarget is not None:
+            break
+    return results + [None] * (len(probes) - len(results))
+
+def _probe_nodes(sconf, builder, text, ext, overrides):
+    # Return the source and the target nodes of the probe, built in an
+    # override environment of their own
+    env = sconf.env
+    stream = _ProbeOutput()
+    def spawn(sh, escape, cmd, args, spawnenv):
+        return sconf.pspawn(sh, escape, cmd, args, spawnenv, stream, stream)
+    def print_cmd_line(s, target, source, env):
+        stream.write(s + "\n")
+    penv = env.Override({'SPAWN': spawn, 'PRINT_CMD_LINE_FUNC': print_cmd_line,
+                         'PSTDOUT': stream, 'PSTDERR': stream})
+
+    bld = env['BUILDERS'][builder]
+    pref = env.subst(bld.prefix)
+    suff = env.subst(bld.suffix)
+    f = "conftest_" + str(SCons.SConf._ac_build_counter)
+    SCons.SConf._ac_build_counter += 1
+
+    source = env['BUILDERS']['SConfSourceBuilder'](penv,
+                target = sconf.confdir.File(f + ext), source = env.Value(text))
+    nodes = bld(penv, target = sconf.confdir.File(pref + f + suff),
+                source = source, **overrides)
+    if not SCons.Util.is_List(nodes):
+        nodes = [nodes]
+    return source, nodes
+
+class _ProbeOutput:
+    # Output of the tasks of a probe. The commands write in it directly, as
+    # PSPAWN needs a real file
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def write(self, s):
+        self._file.write(s)
+        self._file.flush()
+
+    def flush(self):
+        self._file.flush()
+
+    def reset(self):
+        self._file.seek(0)
+        self._file.truncate()
+
+    def getvalue(self):
+        self._file.seek(0)
+        s = self._file.read()
+        self._file.seek(0, 2)
+        return s
+
+class _SConfBatchTask(SCons.SConf.SConfBuildTask):
+    # SConfBuildTask which can run in several threads: see the module
+    # docstring
+    def display(self, message):
+        _log(SCons.SConf.sconf_global.logstream,
+             "scons: Configure: " + message + "\n")
+
+    def fail_stop(self):
+        # A failed probe must not prevent the other probes of the batch from
+        # being built
+        self.fail_continue()
+
+    def execute(self):
+        # Same as SConfBuildTask.execute, except for the capture of the output
+        target = self.targets[0]
+        if not target.has_builder():
+            return
+
+        is_up_to_date, cached_error, cachable = self.collect_node_states()
+
+        cache_mode = SCons.SConf.cache_mode
+        if cache_mode == SCons.SConf.CACHE and not cachable:
+            raise SCons.SConf.ConfigureCacheError(target)
+        elif cache_mode == SCons.SConf.FORCE:
+            is_up_to_date = 0
+
+        if cached_error and is_up_to_date:
+            self.display("Building \"%s\" failed in a previous run and all "
+                         "its sources are up to date." % str(target))
+            self.display_cached_string(target.get_stored_info().binfo)
+            raise SCons.Errors.BuildError # will be 'caught' in self.failed
+        elif is_up_to_date:
+            self.display("\"%s\" is up to date." % str(target))
+            self.display_cached_string(target.get_stored_info().binfo)
+        elif SCons.SConf.dryrun:
+            raise SCons.SConf.ConfigureDryRunError(target)
+        else:
+            env = target.get_build_env()
+            stream = env['PSTDOUT']
+            # The previous task of the probe (its source) used it too
+            stream.reset()
+            if cache_mode == SCons.SConf.FORCE:
+                def force_build(dependency, target, prev_ni,
+                                env_decider=env.decide_source):
+                    env_decider(dependency, target, prev_ni)
+                    return True
+                env.Decider(force_build)
+            self.tm.built.append(target)
+            try:
+                try:
+                    target.build()
+                except KeyboardInterrupt:
+                    raise
+                except SystemExit:
+                    exc_value = sys.exc_info()[1]
+                    raise SCons.Errors.ExplicitExit(target, exc_value.code)
+                except Exception, e:
+                    self._store_result(1, stream.getvalue())
+                    raise e
+                else:
+                    self._store_result(0, stream.getvalue())
+            finally:
+                _log(SCons.SConf.sconf_global.logstream, stream.getvalue())
+
+    def _store_result(self, result, output):
+        # See SConfBuildTask.execute: the build info is stored as a
+        # SConfBuildInfo
+        _LOCK.acquire()
+        try:
+            for t in self.targets:
+                binfo = t.get_binfo()
+                binfo.__class__ = SCons.SConf.SConfBuildInfo
+                binfo.set_build_result(result, output)
+                sconsign_entry = SCons.SConsign.SConsignEntry()
+                sconsign_entry.binfo = binfo
+                sconsign = t.dir.sconsign()
+                sconsign.set_entry(t.name, sconsign_entry)
+                sconsign.merge()
+        finally:
+            _LOCK.release()
+
+def _log(logstream, s):
+    if logstream is not None and s:
+        _LOCK.acquire()
+        try:
+            logstream.write(s)
+        finally:
+            _LOCK.release()
+
+def _build_nodes(sconf, nodes, num_jobs):
+    # This is SConfBase.BuildNodes, with num_jobs jobs instead of one. The
+    # output of the probes does not go through sys.stdout, which is only
+    # replaced for the messages of scons itself
+    SConfFS = SCons.SConf.SConfFS
+    if sconf.logstream is not None:
+        oldStdout = sys.stdout
+        sys.stdout = sconf.logstream
+        oldStderr = sys.stderr
+        sys.stderr = sconf.logstream
+
+    old_fs_dir = SConfFS.getcwd()
+    old_os_dir = os.getcwd()
+    SConfFS.chdir(SConfFS.Top, change_os_dir=1)
+
+    for n in nodes:
+        n.store_info = n.do_not_store_info
+
+    try:
+        save_max_drift = SConfFS.get_max_drift()
+        SConfFS.set_max_drift(0)
+        tm = SCons.Taskmaster.Taskmaster(nodes, _SConfBatchTask)
+        # Targets of the probes which were actually built
+        tm.built = []
+        jobs = SCons.Job.Jobs(num_jobs, tm)
+        jobs.run()
+        if tm.built:
+            sconf.cached = 0
+    finally:
+        SConfFS.set_max_drift(save_max_drift)
+        os.chdir(old_os_dir)
+        SConfFS.chdir(old_fs_dir, change_os_dir=0)
+        if sconf.logstream is not None:
+            sys.stdout = oldStdout
+            sys.stderr = oldStderr
@@ -4,9 +4,13 @@
 """This module has helper functions to get basic information from site.cfg-like
 files."""
 import os
-import ConfigParser
+import sys
+import imp
 
 from numscons.core.utils import DefaultDict
+from numscons.core.misc import get_scons_configres_dir, \
+    get_site_config_cache_filename
+from numscons.core.config_cache import read_config
 
 # List of options that LibraryOptions can keep. If later additional variables
 # should be added (e.g. cpp flags, etc...), they should be added here.
@@ -29,22 +33,71 @@ class LibraryOptions(DefaultDict):
         msg = [r'%s : %s' % (k, i) for k, i in self.items() if len(i) > 0]
         return '\n'.join(msg)
 
-def _get_standard_file(fname):
+def _numpy_distutils_dir():
+    # Return the directory of numpy.distutils, without importing numpy if
+    # possible (importing numpy.distutils is slow).
+    try:
+        return os.path.dirname(sys.modules['numpy.distutils.system_info'].__file__)
+    except KeyError:
+        pass
+
+    try:
+        f, path, desc = imp.find_module('numpy')
+        if f:
+            f.close()
+    except ImportError:
+        return None
+
+    d = os.path.join(path, 'distutils')
+    if os.path.isdir(d):
+        return d
+
+    # numpy is not a plain directory (zipped egg, etc...): we have to import
+    # it to know where it lives
     try:
-        from numpy.distutils.system_info import get_standard_file
-        return get_standard_file(fname)
+        from numpy.distutils import system_info
+        return os.path.dirname(system_info.__file__)
     except ImportError:
-        return fname
+        return None
+
+def _get_standard_file(fname):
+    """Return the list of existing files fname, looked for in the same
+    locations as numpy.distutils.system_info.get_standard_file."""
+    filenames = []
+
+    # System-wide file (next to numpy.distutils)
+    d = _numpy_distutils_dir()
+    if d:
+        sysfile = os.path.join(os.path.abspath(d), fname)
+        if os.path.isfile(sysfile):
+            filenames.append(sysfile)
+
+    # Home directory
+    try:
+        home = os.path.expanduser('~')
+    except KeyError:
+        pass
+    else:
+        user_file = os.path.join(home, fname)
+        if os.path.isfile(user_file):
+            filenames.append(user_file)
+
+    # Local file
+    if os.path.isfile(fname):
+        filenames.append(os.path.abspath(fname))
+
+    return filenames
 
-# Think about a cache mechanism, to avoid reparsing the config file everytime.
 def get_config(src_dir = None):
     """ This tries to read .cfg files in several locations, and merge its
     information into a ConfigParser object for the first found file.
 
     Returns the ConfigParser instance. This copies the logic in system_info
-    from numpy.distutils."""
-    cp = ConfigParser.ConfigParser()
+    from numpy.distutils.
 
+    The parsed files are cached for the whole process (and in the configres
+    directory of src_dir if given) as long as they do not change: the
+    returned ConfigParser instance is shared, and must not be modified."""
     files = []
     def extend_srcdir(fname):
         if src_dir:
@@ -57,7 +110,12 @@ def get_config(src_dir = None):
     files.extend(_get_standard_file('site.cfg'))
     extend_srcdir('site.cfg')
 
-    cp.read(files)
+    if src_dir:
+        cachefile = os.path.join(src_dir, get_scons_configres_dir(),
+                                 get_site_config_cache_filename())
+    else:
+        cachefile = None
+    cp = read_config(files, cachefile)[0]
 
     return cp, files
 
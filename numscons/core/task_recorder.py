@@ -0,0 +1,107 @@
+"""This module records the execution of every build task.
+
+It is the only timing hook of the build, shared by the reports which need the
+duration of the tasks: the time spent per kind of action (action_stats option,
+see numscons.core.action_pool), the critical path scheduling (see
+numscons.core.critical_path) and the build trace (see
+numscons.core.build_trace). Once installed by one of them
+(get_task_recorder), every task executed by scons is recorded with its
+targets, the scons job (thread) which ran it, its start and end times, and
+how its python actions were run, if any (see set_python_kind).
+
+The nodes retrieved from the scons CacheDir are also marked with the
+cache_status attribute 'cachedir'; actions may set other statuses, e.g.
+'f2py-cache' when f2py generated files were found in the f2py cache."""
+import time
+import threading
+
+class TaskRecord:
+    """Execution of one task.
+
+    targets are the nodes of the task when it started (a failed task has its
+    targets replaced by the top node), worker the number of the scons job
+    which ran it, python 'pool' or 'thread' if the task ran python actions in
+    the worker processes of the action pool or in the scons thread, None
+    otherwise."""
+    def __init__(self, targets, worker, start):
+        self.targets = targets
+        self.worker = worker
+        self.start = start
+        self.end = None
+        self.python = None
+
+class TaskRecorder:
+    def __init__(self):
+        self.start = time.time()
+        # Records of the finished tasks, in the order they finished
+        self.records = []
+        self._workers = {}
+        self._lock = threading.Lock()
+        self._current = threading.local()
+
+    def begin(self, targets):
+        """Start the record of a task run by the current thread."""
+        self._lock.acquire()
+        try:
+            name = threading.currentThread().getName()
+            try:
+                worker = self._workers[name]
+            except KeyError:
+                worker = self._workers[name] = len(self._workers)
+        finally:
+            self._lock.release()
+        record = TaskRecord(targets[:], worker, time.time())
+        self._current.record = record
+        return record
+
+    def end(self, record):
+        record.end = time.time()
+        self._current.record = None
+        self._lock.acquire()
+        try:
+            self.records.append(record)
+        finally:
+            self._lock.release()
+
+    def current(self):
+        """Return the record of the task run by the current thread, or
+        None."""
+        return getattr(self._current, 'record', None)
+
+_RECORDER = []
+
+def get_task_recorder():
+    """Return the recorder of the build tasks, recording from now on."""
+    if not _RECORDER:
+        _RECORDER.append(TaskRecorder())
+        _install(_RECORDER[0])
+    return _RECORDER[0]
+
+def set_python_kind(kind):
+    """Tell how the python action run by the current task is run ('pool' or
+    'thread')."""
+    if _RECORDER:
+        record = _RECORDER[0].current()
+        if record is not None:
+            record.python = kind
+
+def _install(recorder):
+    import SCons.Node.FS
+    import SCons.Script.Main
+
+    execute = SCons.Script.Main.BuildTask.execute
+    def recorded_execute(self):
+        record = recorder.begin(self.targets)
+        try:
+            execute(self)
+        finally:
+            recorder.end(record)
+    SCons.Script.Main.BuildTask.execute = recorded_execute
+
+    retrieve_from_cache = SCons.Node.FS.File.retrieve_from_cache
+    def marked_retrieve_from_cache(self):
+        retrieved = retrieve_from_cache(self)
+        if retrieved:
+            self.attributes.cache_status = 'cachedir'
+        return retrieved
+    SCons.Node.FS.File.retrieve_from_cache = marked_retrieve_from_cache
@@ -0,0 +1,233 @@
+"""This module implements an incremental expansion of .src templates.
+
+The expansion of every top-level block of a template (repeat loop for C
+templates, subroutine or function for Fortran templates) is kept in a cache
+file, keyed on the content of the block, so that after a small change of the
+template (or of one of its included .src files), only the changed blocks are
+expanded again. The output is the same as the one of process_c_file and
+process_f_file.
+
+For C templates, the #line directives of a block are stored relatively to the
+first line of the block, so that a block which is only moved within the file is
+not expanded again."""
+import os
+import sys
+import cPickle
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import new as md5
+
+from numscons.numdist import conv_template, from_template
+
+# Bump this when the layout of the cache file changes
+_CACHE_VERSION = 1
+
+# Hits and misses of every cache of this process
+_STATS = {'hits': 0, 'misses': 0}
+
+class TemplateCache:
+    """Cache of the expanded blocks of one template, kept in filename.
+
+    Only the blocks used by the last expansion are kept in the file."""
+    def __init__(self, filename):
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self._entries = self._load()
+        self._used = {}
+        self._modified = False
+
+    def _load(self):
+        try:
+            f = open(self.filename, 'rb')
+            try:
+                version, entries = cPickle.load(f)
+            finally:
+                f.close()
+        except (IOError, EOFError, ValueError, TypeError,
+                cPickle.UnpicklingError):
+            return {}
+        if version != _CACHE_VERSION:
+            return {}
+        return entries
+
+    def get(self, key):
+        """Return the expansion stored for key, or None."""
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            _STATS['misses'] += 1
+            return None
+        self.hits += 1
+        _STATS['hits'] += 1
+        self._used[key] = value
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = value
+        self._used[key] = value
+        self._modified = True
+
+    def save(self):
+        """Write the blocks used since the cache was loaded in the cache
+        file."""
+        if not self._modified and len(self._used) == len(self._entries):
+            return
+        tmp = self.filename + '.tmp'
+        try:
+            d = os.path.dirname(self.filename)
+            if d and not os.path.exists(d):
+                os.makedirs(d)
+            f = open(tmp, 'wb')
+            try:
+                cPickle.dump((_CACHE_VERSION, self._used), f, 2)
+            finally:
+                f.close()
+            if sys.platform == 'win32' and os.path.exists(self.filename):
+                os.remove(self.filename)
+            os.rename(tmp, self.filename)
+        except (IOError, OSError):
+            # The blocks will just be expanded again next time
+            pass
+
+def get_cache_stats():
+    """Return (hits, misses) of the template caches used by this process."""
+    return _STATS['hits'], _STATS['misses']
+
+def add_cache_stats(hits, misses):
+    """Account for the hits and misses of a cache used in another process."""
+    _STATS['hits'] += hits
+    _STATS['misses'] += misses
+
+def report_cache_stats():
+    """Return a one line summary of the template caches hit rate."""
+    hits, misses = get_cache_stats()
+    total = hits + misses
+    if total:
+        rate = 100. * hits / total
+    else:
+        rate = 0.
+    return "Templates cache: %d blocks, %d hits, %d misses (%.1f %% hit rate)" \
+           % (total, hits, misses, rate)
+
+def _key(kind, text, *extra):
+    return (kind, md5(text).hexdigest()) + extra
+
+#--------------
+# C templates
+#--------------
+def _expand_c_loop(looptext):
+    # Expand the top-level loop looptext as if it started at line 0. Returns
+    # (code, lines), lines being the list of (index, line) of the #line
+    # directives in code.
+    line, items = conv_template._compile_block(looptext, 0, 0)
+    if len([i for i in items if i[0] == conv_template._LOOP]) != 1:
+        raise ValueError("Unexpected structure for block")
+    code = []
+    lines = []
+    conv_template._render_items(items, conv_template.global_names, line,
+                                code, lines)
+    return code, lines
+
+def _iter_c_str(astr, cache):
+    # Yield the expansion of astr, one top-level block at a time
+    env = conv_template.global_names
+    yield conv_template.header
+    yield "#line 1\n"
+    oldend = 0
+    for sub in conv_template.parse_structure(astr, 0):
+        items = []
+        conv_template._compile_text(astr[oldend:sub[0]], items)
+        code = []
+        conv_template._render_items(items, env, 1, code)
+        yield ''.join(code)
+
+        looptext = astr[sub[0]:sub[3]]
+        key = _key('c', looptext)
+        value = cache.get(key)
+        if value is None:
+            value = _expand_c_loop(looptext)
+            cache.set(key, value)
+        loopcode, lines = value
+
+        code = list(loopcode)
+        base = 1 + astr.count('\n', 0, sub[0])
+        for i, l in lines:
+            code[i] = "#line %d\n" % (base + l)
+        yield ''.join(code)
+        oldend = sub[3]
+
+    items = []
+    conv_template._compile_text(astr[oldend:], items)
+    code = []
+    conv_template._render_items(items, env, 1, code)
+    code.append('\n')
+    yield ''.join(code)
+
+def iter_c_file(source, cache):
+    """Same as numscons.numdist.conv_template.iter_file, using the given
+    cache."""
+    lines = conv_template.resolve_includes(source)
+    astr = ''.join(lines)
+    sourcefile = os.path.normcase(source).replace("\\", "\\\\")
+    yield '#line 1 "%s"\n' % sourcefile
+    try:
+        try:
+            for chunk in _iter_c_str(astr, cache):
+                yield chunk
+        except ValueError:
+            # Use the uncached expansion to get the error message with the
+            # right line numbers
+            conv_template.process_str(astr)
+            raise
+    except ValueError, e:
+        raise ValueError, '"%s", %s' % (sourcefile, e)
+
+def process_c_file(source, cache):
+    """Same as numscons.numdist.process_c_file, using the given cache."""
+    return ''.join(iter_c_file(source, cache))
+
+#--------------------
+# Fortran templates
+#--------------------
+def _iter_f_str(allstr, cache):
+    oldend = 0
+    names = {}
+    names.update(from_template._special_names)
+    for sub in from_template.parse_structure(allstr):
+        yield allstr[oldend:sub[0]]
+        names.update(from_template.find_repl_patterns(allstr[oldend:sub[0]]))
+
+        # The expansion of a block depends on the names defined before it,
+        # and may define new names
+        substr = allstr[sub[0]:sub[1]]
+        items = names.items()
+        items.sort()
+        key = _key('f', substr, md5(repr(items)).hexdigest())
+        value = cache.get(key)
+        if value is None:
+            before = names.copy()
+            expanded = from_template.expand_sub(substr, names)
+            new = {}
+            for k, v in names.items():
+                if not before.has_key(k):
+                    new[k] = v
+            value = (expanded, new)
+            cache.set(key, value)
+        else:
+            names.update(value[1])
+        yield value[0]
+        oldend = sub[1]
+    yield allstr[oldend:]
+
+def iter_f_file(source, cache):
+    """Same as numscons.numdist.from_template.iter_file, using the given
+    cache."""
+    lines = from_template.resolve_includes(source)
+    return _iter_f_str(''.join(lines), cache)
+
+def process_f_file(source, cache):
+    """Same as numscons.numdist.process_f_file, using the given cache."""
+    return ''.join(iter_f_file(source, cache))
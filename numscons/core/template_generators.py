@@ -1,43 +1,168 @@
 """This module implements wrappers around numpy.distutils template functions so
 that they can be used in scons builders. Both C and Fortran .src files
 generators are implemented."""
+import os
 import re
+import sys
+import atexit
+import threading
 from os.path import basename as pbasename, splitext, join as pjoin, \
-                    dirname as pdirname
+                    dirname as pdirname, abspath as pabspath
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import new as md5
 
-from numscons.numdist import process_c_file
-from numscons.numdist import process_f_file
+from numscons.core.misc import get_scons_configres_dir, \
+    get_template_cache_dirname
+from numscons.core.template_cache import TemplateCache, report_cache_stats, \
+    add_cache_stats, iter_c_file, iter_f_file
+
+_REPORT_REGISTERED = []
+
+def _print_cache_stats():
+    print report_cache_stats()
+
+def _get_cachefile(targetfile, env):
+    # One cache file per generated file
+    directory = pjoin(str(env.fs.Top), get_scons_configres_dir(),
+                      get_template_cache_dirname())
+    if env.has_key('template_cache_stats') and env['template_cache_stats'] \
+       and not _REPORT_REGISTERED:
+        atexit.register(_print_cache_stats)
+        _REPORT_REGISTERED.append(1)
+    return pjoin(directory, md5(pabspath(targetfile)).hexdigest())
+
+def _write_chunks(targetfile, chunks):
+    # The output is written as it is generated, so that it is never kept
+    # entirely in memory
+    t = open(targetfile, 'w')
+    try:
+        try:
+            for chunk in chunks:
+                t.write(chunk)
+        finally:
+            t.close()
+    except:
+        # Do not leave a truncated file behind
+        os.remove(targetfile)
+        raise
+
+_ITER_FILE = {'c': iter_c_file, 'f': iter_f_file}
+
+def _generate(args):
+    # Generate one file: args is (kind, targetfile, sourcefile, cachefile),
+    # kind being 'c' or 'f'. Returns the (hits, misses) of the cache.
+    kind, targetfile, sourcefile, cachefile = args
+    cache = TemplateCache(cachefile)
+    _write_chunks(targetfile, _ITER_FILE[kind](sourcefile, cache))
+    cache.save()
+    return cache.hits, cache.misses
+
+def _add_cache_stats(stats):
+    add_cache_stats(*stats)
+
+def _run_generate(kind, targetfile, sourcefile, env, pool = None):
+    # Run _generate in the python action pool if enabled (template expansion
+    # holds the GIL, so it does not run in parallel in scons threads)
+    from numscons.core.action_pool import run_python_action
+    args = (kind, targetfile, sourcefile, _get_cachefile(targetfile, env))
+    return run_python_action(env, 'numscons.core.template_generators',
+                             '_generate', (args,), _add_cache_stats, pool)
 
 def do_generate_from_c_template(targetfile, sourcefile, env):
     """Generate a C source file from template using numpy.distutils
-    process_file."""
-    t = open(targetfile, 'w')
-    writestr = process_c_file(sourcefile)
-    t.write(writestr)
-    t.close()
-    return 0
+    process_file, expanding again only the blocks which changed since the
+    last generation."""
+    return _run_generate('c', targetfile, sourcefile, env)[0]
 
 def do_generate_from_f_template(targetfile, sourcefile, env):
     """Generate a Fortran source file from template using numpy.distutils
-    process_file."""
-    t = open(targetfile, 'w')
-    writestr = process_f_file(sourcefile)
-    t.write(writestr)
-    t.close()
+    process_file, expanding again only the blocks which changed since the
+    last generation."""
+    return _run_generate('f', targetfile, sourcefile, env)[0]
+
+def _generate_nodes(kind, target, source, env, pool = None):
+    for t, s in zip(target, source):
+        st, stats = _run_generate(kind, str(t), str(s), env, pool)
+        if st:
+            return st
+        if stats and stats[0] > 0 and stats[1] == 0:
+            # For the build trace (see numscons.core.build_trace)
+            t.attributes.cache_status = 'template-cache'
     return 0
 
 def generate_from_c_template(target, source, env):
     """This function can be used directly in scons builders."""
-    for t, s in zip(target, source):
-        do_generate_from_c_template(str(t), str(s), env)
-    return 0
+    return _generate_nodes('c', target, source, env)
 
 def generate_from_f_template(target, source, env):
     """This function can be used directly in scons builders."""
-    for t, s in zip(target, source):
-        do_generate_from_f_template(str(t), str(s), env)
+    return _generate_nodes('f', target, source, env)
+
+def generate_batch(kind, target, source, env):
+    """Generate the targets of a batch of templates (see template_batch) which
+    are out of date, each one from its own source. When building with several
+    jobs, the files are generated concurrently, in as many worker processes
+    (see numscons.core.action_pool) as jobs given to scons, whatever the
+    python_action_pool option says. The output does not depend on the number
+    of workers.
+
+    The targets of the batch which are up to date are not generated again.
+    Scons scans the sources of a batch together, though: a target depends on
+    the files included by any template of its batch."""
+    from numscons.core.sconf_batch import get_num_jobs
+
+    todo = [(b.targets[0], b.sources[0])
+            for b in target[0].get_executor().batches
+            if not b.targets[0].is_up_to_date()]
+    njobs = min(get_num_jobs(), len(todo))
+    if njobs < 2:
+        return _generate_nodes(kind, [t for t, s in todo],
+                               [s for t, s in todo], env)
+
+    # One thread per job, each waiting for its worker. These threads do not
+    # run the task themselves (see numscons.core.task_recorder)
+    from numscons.core.task_recorder import set_python_kind
+    set_python_kind('pool')
+    todo.reverse()
+    failures = []
+    def generate_next():
+        while not failures:
+            try:
+                t, s = todo.pop()
+            except IndexError:
+                return
+            try:
+                st = _generate_nodes(kind, [t], [s], env, True)
+            except:
+                failures.append(sys.exc_info())
+            else:
+                if st:
+                    failures.append(st)
+    threads = [threading.Thread(target = generate_next)
+               for i in range(njobs)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    if failures:
+        if isinstance(failures[0], tuple):
+            raise failures[0][0], failures[0][1], failures[0][2]
+        return failures[0]
     return 0
 
+def generate_from_c_template_batch(target, source, env):
+    """Same as generate_from_c_template, for many files at once (see
+    generate_batch)."""
+    return generate_batch('c', target, source, env)
+
+def generate_from_f_template_batch(target, source, env):
+    """Same as generate_from_f_template, for many files at once (see
+    generate_batch)."""
+    return generate_batch('f', target, source, env)
+
 def generate_from_template_emitter(target, source, env):
     """Scons emitter for both C and Fortran generated files from template (.src
     files)."""
@@ -45,8 +170,77 @@ def generate_from_template_emitter(target, source, env):
     t = pjoin(pdirname(str(target[0])), base)
     return ([t], source)
 
+_BATCH_COUNT = [0]
+
+def template_batch_key(action, env, target, source):
+    """Batch key of the batch template actions: the templates given to one
+    call of template_batch are put in one batch."""
+    key = env.get('TEMPLATE_BATCH')
+    if key is None:
+        return None
+    return (id(action), key)
+
+def template_batch(env, builder, target, source):
+    """Generate one file for each source, in the directory of target, with the
+    given batch template builder: each file is its own target, so that scons
+    only generates again the ones which are out of date, but the out of date
+    files of the batch are generated in one action (see generate_batch)."""
+    _BATCH_COUNT[0] += 1
+    d = pdirname(str(env.Flatten([target])[0]))
+    targets = []
+    for s in env.Flatten([source]):
+        t = pjoin(d, splitext(pbasename(str(s)))[0])
+        targets.extend(getattr(env, builder)(t, s,
+                                             TEMPLATE_BATCH = _BATCH_COUNT[0]))
+    return targets
+
+def FromCTemplateBatch(env, target, source):
+    """Same as the FromCTemplate builder, for many templates at once (see
+    template_batch)."""
+    return template_batch(env, '_FromCTemplateBatch', target, source)
+
+def FromFTemplateBatch(env, target, source):
+    """Same as the FromFTemplate builder, for many templates at once (see
+    template_batch)."""
+    return template_batch(env, '_FromFTemplateBatch', target, source)
+
 _INCLUDE_RE = re.compile(r"include\s*['\"](\S+)['\"]", re.M)
 
+# csig -> names of the files included by a template
+_INCLUDES = {}
+
+def _find_includes(node):
+    csig = node.get_csig()
+    try:
+        return _INCLUDES[csig]
+    except KeyError:
+        names = _INCLUDE_RE.findall(node.get_contents())
+        _INCLUDES[csig] = names
+        return names
+
+def _scan_src_includes(node, deps, seen):
+    # Add the .src files included by node to deps, recursively, as they are
+    # inlined when the template is expanded.
+    for name in _find_includes(node):
+        if not name.endswith('.src'):
+            continue
+        if os.path.isabs(name):
+            inc = node.fs.File(name)
+        else:
+            inc = node.dir.File(name)
+        if seen.has_key(inc) or not (inc.rexists() or inc.is_derived()):
+            continue
+        seen[inc] = None
+        deps.append(inc)
+        # A generated include which is not built yet is scanned once it is
+        if inc.rexists():
+            _scan_src_includes(inc, deps, seen)
+
 def generate_from_template_scanner(node, env, path, arg = None):
-    cnt = node.get_contents()
-    return _INCLUDE_RE.findall(cnt)
+    """Scanner for .src files: returns the files included by the template,
+    and every .src file included by them. The includes of a given content
+    are only looked for once."""
+    deps = [name for name in _find_includes(node)
+            if not name.endswith('.src')]
+    _scan_src_includes(node, deps, {node: None})
+    return deps
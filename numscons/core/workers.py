@@ -0,0 +1,289 @@
+"""This module implements a pool of persistent python worker processes.
+
+Some actions run python code which cannot be run in the scons process itself,
+because it is not thread-safe (e.g. f2py, which keeps its state in module
+globals), and which is expensive to start (python interpreter, numpy import).
+Instead of starting a new interpreter for each call, the calls are sent to
+worker processes, which are started once, on first use, and import the needed
+modules once.
+
+By default, each call is run in a process forked from the worker, when fork
+is available, so that calls cannot see the state left by previous calls, as
+with a new interpreter. Pools created with fork = False run the calls in the
+worker itself, for code which may run repeatedly in one process: the state
+kept in module globals by a call (e.g. memos) is then reused by the next
+calls of the same worker. The output written on sys.stdout by the call is
+captured and returned to the caller.
+
+Messages between the pool and a worker are pickled objects, each preceded by
+its length, written on the standard input and output of the worker:
+    - pool -> worker: ('init', sys.path, modules, fork), ('call', module,
+      function, args, cwd)
+    - worker -> pool: ('ready',), ('error', message), ('done', status, output,
+      result)
+
+Usage of the pool:
+    pool = WorkerPool(4, ['numpy.f2py.f2py2e'])
+    status, output, result = pool.call('numpy.f2py.f2py2e', 'run_main',
+                                       (['foo.pyf'],))
+
+This module only depends on the python standard library, as it is also the
+worker program."""
+import os
+import sys
+import struct
+import cPickle
+from cStringIO import StringIO
+
+_HEADER = '!I'
+_HEADER_SIZE = struct.calcsize(_HEADER)
+
+class WorkerError(Exception):
+    """Raised when a worker could not be started, or died."""
+    pass
+
+#-------------------
+# Messages framing
+#-------------------
+def _write_msg(f, obj):
+    data = cPickle.dumps(obj, 2)
+    f.write(struct.pack(_HEADER, len(data)) + data)
+    f.flush()
+
+def _read_exactly(f, n):
+    data = f.read(n)
+    if len(data) != n:
+        raise EOFError("Connection closed")
+    return data
+
+def _read_msg(f):
+    n, = struct.unpack(_HEADER, _read_exactly(f, _HEADER_SIZE))
+    return cPickle.loads(_read_exactly(f, n))
+
+#---------
+# Worker
+#---------
+def _status(e):
+    # Exit status corresponding to the SystemExit exception e
+    if e.code is None:
+        return 0
+    elif isinstance(e.code, int):
+        return e.code
+    else:
+        print e.code
+        return 1
+
+def _call(module, function, args, cwd):
+    # Call function from module with args in the directory cwd. Returns
+    # (status, output, result), result being None if not picklable.
+    saved_cwd = os.getcwd()
+    saved_stdout = sys.stdout
+    sys.stdout = output = StringIO()
+    result = None
+    try:
+        try:
+            if cwd:
+                os.chdir(cwd)
+            mod = __import__(module, {}, {}, [function])
+            result = getattr(mod, function)(*args)
+            status = 0
+        except SystemExit, e:
+            status = _status(e)
+        except:
+            import traceback
+            traceback.print_exc(file = output)
+            status = 1
+    finally:
+        sys.stdout = saved_stdout
+        os.chdir(saved_cwd)
+
+    try:
+        cPickle.dumps(result, 2)
+    except Exception:
+        result = None
+    return status, output.getvalue(), result
+
+def _forked_call(module, function, args, cwd):
+    # Same as _call, in a forked process.
+    rfd, wfd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(rfd)
+            f = os.fdopen(wfd, 'wb')
+            f.write(cPickle.dumps(_call(module, function, args, cwd), 2))
+            f.close()
+        finally:
+            os._exit(0)
+
+    os.close(wfd)
+    f = os.fdopen(rfd, 'rb')
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    os.waitpid(pid, 0)
+    try:
+        return cPickle.loads(data)
+    except Exception:
+        return 1, "Worker process for %s.%s died\n" % (module, function), None
+
+def worker_main():
+    """Main loop of a worker: serves the requests read on the standard
+    input, until the standard input is closed."""
+    # The standard output is used for the messages: anything else written on
+    # it (e.g. by C code) goes to the standard error instead
+    infile = os.fdopen(os.dup(0), 'rb')
+    outfile = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+
+    call = _call
+
+    while True:
+        try:
+            msg = _read_msg(infile)
+        except EOFError:
+            break
+
+        if msg[0] == 'init':
+            sys.path[:] = msg[1]
+            if msg[3] and hasattr(os, 'fork'):
+                call = _forked_call
+            try:
+                for m in msg[2]:
+                    __import__(m)
+            except Exception, e:
+                _write_msg(outfile, ('error', "%s: %s" % (e.__class__.__name__,
+                                                         e)))
+                break
+            _write_msg(outfile, ('ready',))
+        elif msg[0] == 'call':
+            status, output, result = call(*msg[1:])
+            _write_msg(outfile, ('done', status, output, result))
+        else:
+            break
+
+#-------
+# Pool
+#-------
+class _Worker:
+    def __init__(self, modules, fork):
+        import subprocess
+        try:
+            # close_fds: a worker started concurrently must not keep the
+            # pipes of another one open
+            self.process = subprocess.Popen([sys.executable, '-u',
+                                             _worker_script()],
+                                            stdin = subprocess.PIPE,
+                                            stdout = subprocess.PIPE,
+                                            close_fds = sys.platform != 'win32')
+        except OSError, e:
+            raise WorkerError("Could not start worker: %s" % e)
+        self.request(('init', sys.path, modules, fork), 'ready')
+
+    def request(self, msg, expected):
+        try:
+            _write_msg(self.process.stdin, msg)
+            answer = _read_msg(self.process.stdout)
+        except (EOFError, IOError, OSError), e:
+            self.close()
+            raise WorkerError("Worker died (%s)" % e)
+        if answer[0] != expected:
+            self.close()
+            raise WorkerError("Worker error: %s" % answer[1])
+        return answer
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+        self.process.wait()
+
+def _worker_script():
+    filename = __file__
+    if filename[-4:] in ['.pyc', '.pyo']:
+        filename = filename[:-1]
+    return filename
+
+class WorkerPool:
+    """Pool of at most size workers, each having imported modules
+    beforehand. Workers are started when needed, and calls are thread-safe:
+    a worker only runs one call at a time. If fork is true, every call runs
+    in a new process forked from the worker, otherwise in the worker
+    itself."""
+    def __init__(self, size, modules = None, fork = True):
+        import threading
+        self.size = max(size, 1)
+        if modules is None:
+            modules = []
+        self.modules = modules
+        self.fork = fork
+        self._idle = []
+        self._nworkers = 0
+        self._cond = threading.Condition()
+
+    def _acquire(self):
+        self._cond.acquire()
+        try:
+            while not self._idle and self._nworkers >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._nworkers += 1
+        finally:
+            self._cond.release()
+
+        try:
+            return _Worker(self.modules, self.fork)
+        except WorkerError:
+            self._release(None)
+            raise
+
+    def _release(self, worker):
+        self._cond.acquire()
+        try:
+            if worker is None:
+                self._nworkers -= 1
+            else:
+                self._idle.append(worker)
+            self._cond.notify()
+        finally:
+            self._cond.release()
+
+    def call(self, module, function, args = (), cwd = None):
+        """Call module.function(*args) in a worker, in the directory cwd (the
+        current directory by default).
+
+        Returns (status, output, result): status is 0 on success, the exit
+        code if the call raised SystemExit, 1 for other exceptions. output is
+        what the call wrote on sys.stdout, result is the returned value.
+        Raises WorkerError if no worker could run the call."""
+        if cwd is None:
+            cwd = os.getcwd()
+        worker = self._acquire()
+        try:
+            answer = worker.request(('call', module, function, args, cwd),
+                                    'done')
+        except WorkerError:
+            self._release(None)
+            raise
+        self._release(worker)
+        return answer[1:]
+
+    def close(self):
+        """Stop the idle workers."""
+        self._cond.acquire()
+        try:
+            for w in self._idle:
+                w.close()
+                self._nworkers -= 1
+            self._idle = []
+        finally:
+            self._cond.release()
+
+if __name__ == '__main__':
+    # sys.path[0] is the directory of this file, whose modules must not shadow
+    # the standard ones (e.g. trace). The path of the pool is set at init.
+    del sys.path[0]
+    worker_main()
@@ -70,12 +70,15 @@ Example:
 
 """
 
-__all__ = ['process_str', 'process_file']
+__all__ = ['process_str', 'process_file', 'compile_str', 'render',
+           'iter_str', 'iter_file']
 
 import os
 import sys
 import re
 
+from numscons.numdist.includes import read_lines
+
 # names for replacement that are already global.
 global_names = {}
 
@@ -226,23 +229,135 @@ def parse_string(astr, env, level, line) :
     code.append('\n')
     return ''.join(code)
 
-def process_str(astr):
-    code = [header]
-    code.extend(parse_string(astr, global_names, 0, 1))
+# Compiled templates
+#
+# parse_string looks for the loops and substitutes the names again for every
+# repetition of every loop. compile_str does this work once, and returns a
+# tree which can be rendered with different names. A block is a tuple
+# (line, items), where each item is one of:
+#   (_LITERAL, text)
+#   (_NAME, name)
+#   (_LOOP, (line, envlist, block)), envlist being the list of dictionaries
+#   returned by parse_loop_header, or the message of the error raised by it.
+# Errors are only raised at rendering, in the same order as parse_string.
+_LITERAL = 0
+_NAME = 1
+_LOOP = 2
+
+def _compile_text(astr, items):
+    # replace_re.split returns the literal text and the names alternatively
+    parts = replace_re.split(astr)
+    for i in range(len(parts)):
+        if i % 2:
+            items.append((_NAME, parts[i]))
+        elif parts[i]:
+            items.append((_LITERAL, parts[i]))
+
+def _compile_block(astr, level, line):
+    items = []
+    struct = parse_structure(astr, level)
+    oldend = 0
+    for sub in struct:
+        _compile_text(astr[oldend:sub[0]], items)
+        head = astr[sub[0]:sub[1]]
+        text = astr[sub[1]:sub[2]]
+        oldend = sub[3]
+        newline = line + sub[4]
+        try:
+            envlist = parse_loop_header(head)
+        except ValueError, e:
+            envlist = "line %d: %s" % (newline, e)
+        items.append((_LOOP, (newline, envlist,
+                              _compile_block(text, level + 1, newline))))
+    _compile_text(astr[oldend:], items)
+    return (line, items)
+
+def compile_str(astr):
+    """Compile the template astr into a tree which can be given to render."""
+    return _compile_block(astr, 0, 1)
+
+def _render(block, env, code, lines = None):
+    # If lines is a list, the index in code of every #line directive is
+    # appended to it, with the corresponding line number.
+    line, items = block
+    if lines is not None:
+        lines.append((len(code), line))
+    code.append("#line %d\n" % line)
+    _render_items(items, env, line, code, lines)
+    code.append('\n')
+
+def _render_items(items, env, line, code, lines = None):
+    for kind, value in items:
+        if kind == _LITERAL:
+            code.append(value)
+        elif kind == _NAME:
+            try:
+                code.append(env[value])
+            except KeyError, e:
+                raise ValueError, 'line %d: %s' % (line, e)
+        else:
+            envlist = value[1]
+            if isinstance(envlist, str):
+                raise ValueError, envlist
+            for loopenv in envlist:
+                newenv = loopenv.copy()
+                newenv.update(env)
+                _render(value[2], newenv, code, lines)
+
+def render(tree, env = None):
+    """Render a template compiled by compile_str, with the global names env.
+    Gives the same result as parse_string on the original template."""
+    if env is None:
+        env = global_names
+    code = []
+    _render(tree, env, code)
     return ''.join(code)
 
+def iter_render(tree, env = None):
+    """Same as render, but yields the output in chunks instead of returning
+    it, so that the memory used does not depend on the size of the output.
+
+    Each chunk is the expansion of one repetition of a top-level loop (or of
+    the text around them)."""
+    if env is None:
+        env = global_names
+    line, items = tree
+    yield "#line %d\n" % line
+    for kind, value in items:
+        if kind == _LOOP:
+            envlist = value[1]
+            if isinstance(envlist, str):
+                raise ValueError, envlist
+            for loopenv in envlist:
+                newenv = loopenv.copy()
+                newenv.update(env)
+                code = []
+                _render(value[2], newenv, code)
+                yield ''.join(code)
+        else:
+            code = []
+            _render_items([(kind, value)], env, line, code)
+            yield code[0]
+    yield '\n'
+
+def process_str(astr):
+    return header + render(compile_str(astr), global_names)
+
+def iter_str(astr):
+    """Same as process_str, but yields the output in chunks."""
+    yield header
+    for chunk in iter_render(compile_str(astr), global_names):
+        yield chunk
+
 
 include_src_re = re.compile(r"(\n|\A)#include\s*['\"]"
                             r"(?P<name>[\w\d./\\]+[.]src)['\"]", re.I)
 
 def resolve_includes(source):
     d = os.path.dirname(source)
-    fid = open(source)
     lines = []
-    for line in fid.readlines():
-        m = include_src_re.match(line)
-        if m:
-            fn = m.group('name')
+    for line, fn in read_lines(source, include_src_re):
+        if fn:
             if not os.path.isabs(fn):
                 fn = os.path.join(d,fn)
             if os.path.isfile(fn):
@@ -252,17 +367,21 @@ def resolve_includes(source):
                 lines.append(line)
         else:
             lines.append(line)
-    fid.close()
     return lines
 
 def process_file(source):
+    return ''.join(iter_file(source))
+
+def iter_file(source):
+    """Same as process_file, but yields the output in chunks."""
     lines = resolve_includes(source)
     sourcefile = os.path.normcase(source).replace("\\","\\\\")
+    yield '#line 1 "%s"\n' % sourcefile
     try:
-        code = process_str(''.join(lines))
+        for chunk in iter_str(''.join(lines)):
+            yield chunk
     except ValueError, e:
         raise ValueError, '"%s", %s' % (sourcefile, e)
-    return '#line 1 "%s"\n%s' % (sourcefile, code)
 
 
 def unique_key(adict):
@@ -46,22 +46,85 @@ process_file(filename)
 
 """
 
-__all__ = ['process_str','process_file']
+__all__ = ['process_str','process_file','iter_str','iter_file']
 
 import os
 import sys
 import re
 
+from numscons.numdist.includes import read_lines
+
 routine_start_re = re.compile(r'(\n|\A)((     (\$|\*))|)\s*(subroutine|function)\b',re.I)
 routine_end_re = re.compile(r'\n\s*end\s*(subroutine|function)\b.*(\n|\Z)',re.I)
 function_start_re = re.compile(r'\n     (\$|\*)\s*function\b',re.I)
 
+# Start (first alternative) and end of routines, in one pattern, so that the
+# routines are found in a single pass over the string. The end of a routine is
+# matched up to, but not including, the newline which ends it, because this
+# newline may start the next routine. Those are matched against the lower case
+# string, which is much faster than a case insensitive match.
+routine_re = re.compile(r'\n(?:(?P<start>(?:     [$*])?\s*(?:subroutine|function)\b)'
+                        r'|\s*end\s*(?:subroutine|function)\b.*)')
+first_routine_start_re = re.compile(r'(?:     [$*])?\s*(subroutine|function)\b')
+
 def parse_structure(astr):
     """ Return a list of tuples for each function or subroutine each
     tuple is the start and end of a subroutine or function to be
     expanded.
     """
+    spanlist = []
+    ind = 0
+    lstr = astr.lower()
+    # The start of a routine may also be at the beginning of the string,
+    # without newline
+    m = routine_re.match(lstr)
+    if m is None or not m.group('start'):
+        m = first_routine_start_re.match(lstr)
+    if m:
+        tokens = routine_re.finditer(lstr, m.end())
+    else:
+        tokens = routine_re.finditer(lstr)
+    while 1:
+        # m is the start of the next routine, if any
+        while m is None:
+            try:
+                m = tokens.next()
+            except StopIteration:
+                return spanlist
+            if not m.group('start'):
+                # An end outside a routine may span several lines (e.g.
+                # 'end\n      subroutine'): a routine may start within it
+                if lstr.find('\n', m.start() + 1, m.end()) != -1:
+                    tokens = routine_re.finditer(lstr, m.start() + 1)
+                m = None
+        start = m.start()
+        if function_start_re.match(lstr,start,m.end()):
+            while 1:
+                i = lstr.rfind('\n',ind,start)
+                if i==-1:
+                    break
+                start = i
+                if lstr[i:i+7]!='\n     $':
+                    break
+        start += 1
 
+        # Look for the end of the routine
+        end = len(lstr)
+        for m in tokens:
+            if not m.group('start'):
+                end = m.end()
+                if end == len(lstr):
+                    # Last line, without newline
+                    end -= 1
+                break
+        ind = end
+        spanlist.append((start,end))
+        m = None
+
+def _parse_structure_search(astr):
+    """ Same as parse_structure, with one regular expression search for
+    each start and end of routine. This is the original implementation,
+    kept as reference."""
     spanlist = []
     ind = 0
     while 1:
@@ -102,6 +165,8 @@ def conv(astr):
     b = astr.split(',')
     l = [x.strip() for x in b]
     for i in range(len(l)):
+        if not l[i].startswith('\\'):
+            continue
         m = item_re.match(l[i])
         if m:
             j = int(m.group('index'))
@@ -124,31 +189,115 @@ def unique_key(adict):
 
 template_name_re = re.compile(r'\A\s*(\w[\w\d]*)\s*\Z')
 def expand_sub(substr,names):
+    return ''.join(iter_expand_sub(substr,names))
+
+def tokenize_markers(substr):
+    """ Split substr at its '<..>' markers, in a single pass.
+
+    Return (texts, markers): texts are the len(markers) + 1 strings between
+    the markers, markers is a list of (name, list) for named markers
+    (<name=list>) and of (None, content) for the other ones (<list> or
+    <name>). Return None if the markers cannot be told apart from the
+    text (e.g. a '<' inside a marker): those are left to the regular
+    expressions of _iter_expand_sub_regex."""
+    texts = []
+    markers = []
+    ind = 0
+    for m in list_re.finditer(substr):
+        start = m.start()
+        # A named marker must be matched as a whole by the list pattern,
+        # and no named marker may start in the text
+        if _named_in_text(substr, ind, start):
+            return None
+        content = m.group(1)
+        if content.find('<') != -1:
+            return None
+        n = named_re.match(substr, start)
+        if n:
+            if n.end() != m.end():
+                return None
+            markers.append(n.groups())
+        else:
+            markers.append((None, content))
+        texts.append(substr[ind:start])
+        ind = m.end()
+    if _named_in_text(substr, ind, len(substr)):
+        return None
+    texts.append(substr[ind:])
+    return texts, markers
+
+def _named_in_text(substr, start, end):
+    # True if a named marker starts in substr[start:end]
+    i = substr.find('<', start, end)
+    while i != -1:
+        if named_re.match(substr, i):
+            return True
+        i = substr.find('<', i + 1, end)
+    return False
+
+def iter_expand_sub(substr,names):
+    """ Same as expand_sub, but yields the expansion of every replicate
+    of the block instead of returning all of them.
+
+    The block is split at its markers once (see tokenize_markers), and
+    every replicate is the concatenation of the text and of the
+    replacement of each marker."""
     substr = substr.replace('\>','@rightarrow@')
     substr = substr.replace('\<','@leftarrow@')
-    lnames = find_repl_patterns(substr)
-    substr = named_re.sub(r"<\1>",substr)  # get rid of definition templates
-
-    def listrepl(mobj):
-        thelist = conv(mobj.group(1).replace('\,','@comma@'))
-        if template_name_re.match(thelist):
-            return "<%s>" % (thelist)
-        name = None
-        for key in lnames.keys():    # see if list is already in dictionary
-            if lnames[key] == thelist:
-                name = key
-        if name is None:      # this list is not in the dictionary yet
-            name = unique_key(lnames)
-            lnames[name] = thelist
-        return "<%s>" % name
-
-    substr = list_re.sub(listrepl, substr) # convert all lists to named templates
-                                           # newnames are constructed as needed
+    tokens = tokenize_markers(substr)
+    if tokens is None:
+        for newstr in _iter_expand_sub_regex(substr, names):
+            yield newstr
+        return
+    texts, markers = tokens
+
+    # Named lists, as find_repl_patterns
+    lnames = {}
+    for name, thelist in markers:
+        if name is not None:
+            lnames[name] = conv(thelist.replace('\,','@comma@'))
+
+    # Template name of every marker, as listrepl in _iter_expand_sub_regex
+    templates = []
+    for name, content in markers:
+        if name is None:
+            thelist = conv(content.replace('\,','@comma@'))
+            if template_name_re.match(thelist):
+                name = thelist
+            else:
+                for key in lnames.keys():
+                    if lnames[key] == thelist:
+                        name = key
+                if name is None:
+                    name = unique_key(lnames)
+                    lnames[name] = thelist
+        templates.append(name)
+
+    numsubs, rules = _get_rules(templates, lnames, names)
+    if not rules:
+        yield substr
+        return
 
+    for k in range(numsubs):
+        parts = [texts[0]]
+        for name, text in zip(templates, texts[1:]):
+            try:
+                parts.append(rules[name][k])
+            except KeyError:
+                parts.append(name)
+            parts.append(text)
+        newstr = ''.join(parts) + '\n\n'
+        newstr = newstr.replace('@rightarrow@','>')
+        newstr = newstr.replace('@leftarrow@','<')
+        yield newstr
+
+def _get_rules(templates, lnames, names):
+    # Return the number of replicates, and the replacements of each
+    # template name, in order of appearance
     numsubs = None
     base_rule = None
     rules = {}
-    for r in template_re.findall(substr):
+    for r in templates:
         if r not in rules:
             thelist = lnames.get(r,names.get(r,None))
             if thelist is None:
@@ -169,24 +318,55 @@ def expand_sub(substr,names):
                       " for <%s=%s>. Ignoring." % (base_rule,
                                                   ','.join(rules[base_rule]),
                                                   r,thelist)
+    return numsubs, rules
+
+def _iter_expand_sub_regex(substr,names):
+    """ Same as iter_expand_sub, with regular expression substitutions
+    over the whole block, for each replicate. This is the original
+    implementation, kept as reference."""
+    substr = substr.replace('\>','@rightarrow@')
+    substr = substr.replace('\<','@leftarrow@')
+    lnames = find_repl_patterns(substr)
+    substr = named_re.sub(r"<\1>",substr)  # get rid of definition templates
+
+    def listrepl(mobj):
+        thelist = conv(mobj.group(1).replace('\,','@comma@'))
+        if template_name_re.match(thelist):
+            return "<%s>" % (thelist)
+        name = None
+        for key in lnames.keys():    # see if list is already in dictionary
+            if lnames[key] == thelist:
+                name = key
+        if name is None:      # this list is not in the dictionary yet
+            name = unique_key(lnames)
+            lnames[name] = thelist
+        return "<%s>" % name
+
+    substr = list_re.sub(listrepl, substr) # convert all lists to named templates
+                                           # newnames are constructed as needed
+
+    numsubs, rules = _get_rules(template_re.findall(substr), lnames, names)
     if not rules:
-        return substr
+        yield substr
+        return
 
     def namerepl(mobj):
         name = mobj.group(1)
         return rules.get(name,(k+1)*[name])[k]
 
-    newstr = ''
     for k in range(numsubs):
-        newstr += template_re.sub(namerepl, substr) + '\n\n'
-
-    newstr = newstr.replace('@rightarrow@','>')
-    newstr = newstr.replace('@leftarrow@','<')
-    return newstr
+        newstr = template_re.sub(namerepl, substr) + '\n\n'
+        newstr = newstr.replace('@rightarrow@','>')
+        newstr = newstr.replace('@leftarrow@','<')
+        yield newstr
 
 def process_str(allstr):
+    return ''.join(iter_str(allstr))
+
+def iter_str(allstr):
+    """ Same as process_str, but yields the output in chunks."""
     newstr = allstr
-    writestr = '' #_head # using _head will break free-format files
+    #_head # using _head will break free-format files
 
     struct = parse_structure(newstr)
 
@@ -194,24 +374,20 @@ def process_str(allstr):
     names = {}
     names.update(_special_names)
     for sub in struct:
-        writestr += newstr[oldend:sub[0]]
+        yield newstr[oldend:sub[0]]
         names.update(find_repl_patterns(newstr[oldend:sub[0]]))
-        writestr += expand_sub(newstr[sub[0]:sub[1]],names)
+        for chunk in iter_expand_sub(newstr[sub[0]:sub[1]],names):
+            yield chunk
         oldend =  sub[1]
-    writestr += newstr[oldend:]
-
-    return writestr
+    yield newstr[oldend:]
 
 include_src_re = re.compile(r"(\n|\A)\s*include\s*['\"](?P<name>[\w\d./\\]+[.]src)['\"]",re.I)
 
 def resolve_includes(source):
     d = os.path.dirname(source)
-    fid = open(source)
     lines = []
-    for line in fid.readlines():
-        m = include_src_re.match(line)
-        if m:
-            fn = m.group('name')
+    for line, fn in read_lines(source, include_src_re):
+        if fn:
             if not os.path.isabs(fn):
                 fn = os.path.join(d,fn)
             if os.path.isfile(fn):
@@ -221,13 +397,17 @@ def resolve_includes(source):
                 lines.append(line)
         else:
             lines.append(line)
-    fid.close()
     return lines
 
 def process_file(source):
     lines = resolve_includes(source)
     return process_str(''.join(lines))
 
+def iter_file(source):
+    """ Same as process_file, but yields the output in chunks."""
+    lines = resolve_includes(source)
+    return iter_str(''.join(lines))
+
 _special_names = find_repl_patterns('''
 <_c=s,d,c,z>
 <_t=real,double precision,complex,double complex>
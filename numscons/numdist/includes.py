@@ -0,0 +1,42 @@
+"""Reading of .src templates, shared by conv_template and from_template.
+
+Templates often include the same .src files: every file is only read and
+searched for includes once per process, as long as it does not change."""
+import os
+
+# (filename, pattern, mtime, size) -> list of (line, included file or None)
+_FILES = {}
+
+def read_lines(filename, include_re):
+    """Return the lines of filename, as a list of (line, name) where name is
+    the name of the file included by this line according to include_re (the
+    'name' group of the regular expression), or None."""
+    try:
+        st = os.stat(filename)
+        key = (filename, include_re.pattern, st.st_mtime, st.st_size)
+    except OSError:
+        # open will raise the usual IOError
+        key = None
+    try:
+        return _FILES[key]
+    except KeyError:
+        pass
+
+    fid = open(filename)
+    try:
+        lines = []
+        for line in fid.readlines():
+            m = include_re.match(line)
+            if m:
+                lines.append((line, m.group('name')))
+            else:
+                lines.append((line, None))
+    finally:
+        fid.close()
+    if key is not None:
+        _FILES[key] = lines
+    return lines
+
+def clear_cache():
+    """Forget every file read by read_lines."""
+    _FILES.clear()
@@ -0,0 +1,300 @@
+"""This module implements a numscons build server.
+
+Without server, scons is launched as a new process for every package
+registering a SConscript, and each process pays for the interpreter startup,
+the import of scons and numscons, the initialization of the tools and the
+compiler detection.
+
+The server is a long-lived process which imports everything once, and keeps
+the parsed configuration files and the compiler probes cache in memory. Every
+scons run requested by a client (e.g. the distutils scons command) is
+executed in a process forked from the server, so that each package still gets
+its own, isolated scons state, as with a new scons process.
+
+The server listens on a local (unix) socket. Messages are pickled objects,
+each preceded by its length:
+    - client -> server: ('run', argv, cwd, environ) or ('stop',)
+    - server -> client: ('output', data)*, then ('exit', status)
+
+Usage:
+    python -m numscons.server serve ADDRESS
+    python -m numscons.server run ADDRESS [scons arguments]
+    python -m numscons.server stop ADDRESS"""
+import os
+import sys
+import errno
+import socket
+import struct
+import cPickle
+
+from numscons.core.misc import get_scons_path, get_scons_configres_dir, \
+    get_compiler_probe_cache_filename, get_config_cache_filename
+from numscons.core.errors import NumsconsError
+
+_HEADER = '!I'
+_HEADER_SIZE = struct.calcsize(_HEADER)
+
+#-------------------
+# Messages framing
+#-------------------
+def _send(sock, obj):
+    data = cPickle.dumps(obj, 2)
+    sock.sendall(struct.pack(_HEADER, len(data)) + data)
+
+def _recv_exactly(sock, n):
+    chunks = []
+    while n > 0:
+        data = sock.recv(n)
+        if not data:
+            raise EOFError("Connection closed")
+        chunks.append(data)
+        n -= len(data)
+    return ''.join(chunks)
+
+def _recv(sock):
+    n, = struct.unpack(_HEADER, _recv_exactly(sock, _HEADER_SIZE))
+    return cPickle.loads(_recv_exactly(sock, n))
+
+#---------
+# Server
+#---------
+def _scons_local_dir():
+    # The versioned directory of our local scons (scons-local-X.Y.Z)
+    for d in os.listdir(get_scons_path()):
+        if d.startswith('scons-local-'):
+            return os.path.join(get_scons_path(), d)
+    raise NumsconsError("No local scons found in %s" % get_scons_path())
+
+def prewarm(top = None):
+    """Import and initialize everything which can be shared by the scons
+    runs: scons and numscons modules, tools modules, configuration files and
+    the compiler probes cache of the project in top (if given)."""
+    local = _scons_local_dir()
+    if not local in sys.path:
+        sys.path.insert(0, local)
+
+    import SCons.Script
+    import SCons.Tool
+    import numscons
+    import numscons.core.numpyenv
+    import numscons.core.initialization
+    import numscons.checkers.fortran
+    import numscons.core.sconf_batch
+
+    # Tools modules
+    from numscons.core.default import tool_list
+    from numscons.core.misc import pyplat2sconsplat
+    for tools in tool_list(pyplat2sconsplat()):
+        for t in tools:
+            try:
+                SCons.Tool.Tool(t)
+            except Exception:
+                # Tool not available on this platform: not a problem
+                pass
+
+    # Configuration files
+    from numscons.checkers.config import get_config_files
+    from numscons.core.config_cache import read_config, init_config_cache
+    if top:
+        init_config_cache(os.path.join(top, get_scons_configres_dir(),
+                                       get_config_cache_filename()))
+    read_config(get_config_files(None))
+    from numscons.core.compiler_config import get_config_files as \
+        get_compiler_config_files
+    for f in ['compiler.cfg', 'fcompiler.cfg', 'cxxcompiler.cfg']:
+        read_config(get_compiler_config_files(f))
+
+    # Compilers probes
+    if top:
+        from numscons.core.compiler_detection import init_probe_cache
+        init_probe_cache(os.path.join(top, get_scons_configres_dir(),
+                                      get_compiler_probe_cache_filename()))
+
+def _run_scons(argv, cwd, environ):
+    # Run scons in the current (forked) process, and never return.
+    status = 2
+    try:
+        try:
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(environ)
+            sys.argv = ['scons'] + list(argv)
+            import SCons.Script
+            SCons.Script.main()
+            status = 0
+        except SystemExit, e:
+            if e.code is None:
+                status = 0
+            elif isinstance(e.code, int):
+                status = e.code
+            else:
+                print >> sys.stderr, e.code
+                status = 1
+        except:
+            import traceback
+            traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(status)
+
+def _handle(conn, request):
+    # Handle one run request, in a process forked from the server.
+    argv, cwd, environ = request[1:]
+
+    rfd, wfd = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        os.close(rfd)
+        conn.close()
+        os.dup2(wfd, 1)
+        os.dup2(wfd, 2)
+        os.close(wfd)
+        _run_scons(argv, cwd, environ)
+
+    os.close(wfd)
+    while True:
+        try:
+            data = os.read(rfd, 8192)
+        except OSError, e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+        if not data:
+            break
+        _send(conn, ('output', data))
+    os.close(rfd)
+
+    st = os.waitpid(pid, 0)[1]
+    if os.WIFEXITED(st):
+        status = os.WEXITSTATUS(st)
+    else:
+        status = 1
+    _send(conn, ('exit', status))
+
+def _reap_children(children):
+    for pid in children[:]:
+        try:
+            done, st = os.waitpid(pid, os.WNOHANG)
+        except OSError:
+            done = pid
+        if done:
+            children.remove(pid)
+
+def serve(address, top = None):
+    """Serve scons runs on the unix socket address until asked to stop."""
+    if not hasattr(socket, 'AF_UNIX') or not hasattr(os, 'fork'):
+        raise NumsconsError("numscons server is not supported on this "\
+                            "platform")
+
+    prewarm(top)
+
+    if os.path.exists(address):
+        os.remove(address)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(address)
+    server.listen(5)
+
+    children = []
+    try:
+        while True:
+            _reap_children(children)
+            conn = server.accept()[0]
+            try:
+                request = _recv(conn)
+            except (EOFError, socket.error):
+                conn.close()
+                continue
+
+            if request[0] == 'stop':
+                _send(conn, ('exit', 0))
+                conn.close()
+                break
+            elif request[0] != 'run':
+                conn.close()
+                continue
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                server.close()
+                try:
+                    try:
+                        _handle(conn, request)
+                    except (EOFError, socket.error):
+                        pass
+                finally:
+                    conn.close()
+                    os._exit(0)
+            conn.close()
+            children.append(pid)
+    finally:
+        server.close()
+        if os.path.exists(address):
+            os.remove(address)
+
+#---------
+# Client
+#---------
+def run_scons(address, argv, cwd = None, environ = None, out = None):
+    """Run scons with the arguments argv on the server listening on address.
+
+    The output of scons is written to out (sys.stdout by default). Returns
+    the exit status of scons."""
+    if cwd is None:
+        cwd = os.getcwd()
+    if environ is None:
+        environ = dict(os.environ)
+    if out is None:
+        out = sys.stdout
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+        _send(sock, ('run', list(argv), cwd, environ))
+        while True:
+            msg = _recv(sock)
+            if msg[0] == 'output':
+                out.write(msg[1])
+                out.flush()
+            elif msg[0] == 'exit':
+                return msg[1]
+    finally:
+        sock.close()
+
+def stop_server(address):
+    """Ask the server listening on address to stop."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+        _send(sock, ('stop',))
+        _recv(sock)
+    finally:
+        sock.close()
+
+def main(argv):
+    usage = __doc__[__doc__.index('Usage:'):]
+    if len(argv) < 2:
+        print usage
+        return 2
+
+    cmd, address = argv[0], argv[1]
+    if cmd == 'serve':
+        serve(address, os.getcwd())
+        return 0
+    elif cmd == 'run':
+        return run_scons(address, argv[2:])
+    elif cmd == 'stop':
+        stop_server(address)
+        return 0
+    else:
+        print usage
+        return 2
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
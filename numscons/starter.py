@@ -7,10 +7,16 @@ from numscons.core.initialization import \
         initialize_tools
 from numscons.core.customization import \
         customize_tools, is_importing_environment
+from numscons.core.action_pool import \
+        set_action_stats
 from numscons.checkers.common import \
         init_configuration
 
-__all__ = ['GetNumpyEnvironment', 'GetInitEnvironment']
+__all__ = ['GetNumpyEnvironment', 'GetInitEnvironment', 'NumpyPackages']
+
+# Stack of the arguments of the packages being read in multi-package mode (see
+# NumpyPackages)
+_PACKAGE_ARGS = []
 
 def GetNumpyEnvironment(args):
     """Returns a correctly initialized scons environment.
@@ -27,11 +33,44 @@ def GetNumpyEnvironment(args):
 def GetInitEnvironment(args):
     return _init_environment(args)
 
+def NumpyPackages(packages, args):
+    """Read the SConstruct of several packages within one scons invocation,
+    so that every package is part of the same dependency graph.
+
+    Call this from a top SConstruct with args = ARGUMENTS. packages is a list
+    of (sconstruct, pkg_args) tuples, where pkg_args is a dictionary of the
+    arguments specific to the package (pkg_name, src_dir, etc...), which
+    take precedence over args when the package calls GetNumpyEnvironment."""
+    from SCons.Script import SConscript
+    from SCons.Node.FS import get_default_fs
+
+    fs = get_default_fs()
+    for sconstruct, pkg_args in packages:
+        pargs = dict(args)
+        pargs.update(pkg_args)
+        pargs['multi_package'] = 1
+        _PACKAGE_ARGS.append(pargs)
+        # Packages SConstruct are written to be read from the top directory,
+        # as done when scons is called with -f for each package: scons reads
+        # a SConscript in its directory relatively to the SConstruct one,
+        # which is the directory of the package SConstruct with -f.
+        sconstruct_dir = fs.SConstruct_dir
+        fs.set_SConstruct_dir(fs.Top.File(sconstruct).dir)
+        try:
+            SConscript(sconstruct)
+        finally:
+            fs.set_SConstruct_dir(sconstruct_dir)
+            _PACKAGE_ARGS.pop()
+
 def _init_environment(args):
     from numscons.core.numpyenv import NumpyEnvironment
     from SCons.Defaults import DefaultEnvironment
     from SCons.Script import Help
 
+    if _PACKAGE_ARGS:
+        args = dict(args)
+        args.update(_PACKAGE_ARGS[-1])
+
     opts = GetNumpyOptions(args)
     env = NumpyEnvironment(options = opts)
 
@@ -70,6 +109,18 @@ def _get_numpy_env(args):
     # Adding custom builders
     add_custom_builders(env)
 
+    set_action_stats(env)
+
+    if env['critical_path_scheduling']:
+        from numscons.core.critical_path import \
+            enable_critical_path_scheduling
+        enable_critical_path_scheduling()
+
+    if env['build_trace']:
+        from numscons.core.build_trace import enable_build_trace
+        enable_build_trace(os.path.join(env.fs.Top.abspath,
+                                        env['build_trace']))
+
     # Initialized numscons checkers internal variables
     env['__NUMSCONS'] = {}
     init_configuration(env)
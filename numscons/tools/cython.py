@@ -4,8 +4,11 @@ from SCons.Builder import Builder
 from SCons.Action import Action
 
 def cython_action(target, source, env):
-    from Cython.Compiler.Main import compile as cython_compile
-    res = cython_compile(str(source[0]))
+    # Cython holds the GIL: run it in the python action pool if enabled
+    from numscons.core.action_pool import run_python_action
+    st, res = run_python_action(env, 'Cython.Compiler.Main', 'compile',
+                                (str(source[0]),))
+    return st
 
 cythonAction = Action(cython_action, "$CYTHONCOMSTR")
 
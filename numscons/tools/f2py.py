@@ -14,6 +14,7 @@ from os.path import join as pjoin, dirname as pdirname, \
 import re
 import sys
 import subprocess
+import threading
 
 import SCons.Action
 import SCons.Scanner
@@ -47,6 +48,48 @@ def get_f2py_modulename_from_txt(source):
             break
     return name
 
+def get_f2py_modulename_from_file(filename):
+    """This returns the name of the module from the pyf file filename.
+
+    Contrary to get_f2py_modulename_from_txt, the file is only read up to the
+    module header."""
+    f = open(filename)
+    try:
+        for line in f:
+            m = F2PY_MODNAME_MATCH(line)
+            if m and not F2PY_UMODNAME_MATCH(line): # skip *__user__* names
+                return m.group('name')
+    finally:
+        f.close()
+    return None
+
+def _get_modulename(node):
+    if not node.rexists():
+        return None
+    return get_f2py_modulename_from_file(node.rfile().get_abspath())
+
+def _get_modulename_cached(node):
+    # Module name of the source (not generated) node, cached in the node info
+    # stored in the sconsign, as (csig, name): the csig is needed by scons to
+    # check the dependencies anyway, so the file is not read again on no-op
+    # builds.
+    if node.is_derived() or not node.rexists():
+        # The csig of a generated file is not known before it is built (and
+        # it is memoized): its module name is never cached.
+        return _get_modulename(node)
+    csig = node.get_csig()
+    try:
+        cached = node.get_stored_info().ninfo.f2py_modname
+    except AttributeError:
+        cached = None
+    if cached and cached[0] == csig:
+        name = cached[1]
+    else:
+        name = _get_modulename(node)
+    if name:
+        node.get_ninfo().f2py_modname = (csig, name)
+    return name
+
 def get_f2py_modulename_from_node(source):
     """This function returns the module name of the pyf file.
 
@@ -54,18 +97,16 @@ def get_f2py_modulename_from_node(source):
     generated from another scons builder."""
     # See email on scons-users from 6th April 2008 (Dmitry Mikhin).
     name = None
-    node = source.rfile()
-    if node.exists() or not node.is_derived():
-        name = get_f2py_modulename_from_txt(node.get_contents())
+    if source.rexists() or not source.is_derived():
+        name = _get_modulename_cached(source)
     else:
         try:
             # XXX: I don't understand this part
-            snode = source.sources[0].rfile()
+            snode = source.sources[0]
             if snode.is_derived():
-                snode = snode.sources[0].rfile()
-            cnt = snode.get_contents()
-            name = get_f2py_modulename_from_txt(cnt)
-        except AttributeError:
+                snode = snode.sources[0]
+            name = _get_modulename_cached(snode)
+        except (AttributeError, IndexError):
             pass
     if name is None:
         raise ValueError("f2py file %s not found ?" % str(source))
@@ -84,18 +125,71 @@ def F2pyEmitter(target, source, env):
         cgename = (CGEN_TEMPLATE % basename) + env['CFILESUFFIX']
         ntarget.append(default_fs.Entry(pjoin(build_dir, cgename)))
 
-        fobj = pjoin(build_dir, mangle_fortranobject(basename, FOBJECT_FILE))
-        ntarget.append(default_fs.Entry(fobj))
+        if not use_shared_fortranobject(env):
+            fobj = pjoin(build_dir, mangle_fortranobject(basename,
+                                                         FOBJECT_FILE))
+            ntarget.append(default_fs.Entry(fobj))
 
         f2pywrap = pjoin(build_dir, FWRAP_TEMPLATE % basename)
         ntarget.append(default_fs.Entry(f2pywrap))
     else:
         ntarget = target
-        fobj = pjoin(build_dir, mangle_fortranobject(str(target[0]),
-                     FOBJECT_FILE))
-        ntarget.append(default_fs.Entry(fobj))
+        if not use_shared_fortranobject(env):
+            fobj = pjoin(build_dir, mangle_fortranobject(str(target[0]),
+                         FOBJECT_FILE))
+            ntarget.append(default_fs.Entry(fobj))
+    # Mark the generated module, so that the extension linking it can find out
+    # it needs the fortranobject (see F2pyLinkEmitter)
+    ntarget[0].attributes.f2py_module = 1
+    # The python extension builder is only changed once a module is emitted
+    # with the shared fortranobject
+    if use_shared_fortranobject(env) and \
+       env['BUILDERS'].has_key('PythonExtension'):
+        add_link_emitter(env['BUILDERS']['PythonExtension'])
     return (ntarget, source)
 
+def use_shared_fortranobject(env):
+    return env.has_key('F2PY_SHARED_FORTRANOBJECT') and \
+           env['F2PY_SHARED_FORTRANOBJECT']
+
+# Shared fortranobject nodes, keyed on the compilation command line
+_SHARED_FOBJECTS = {}
+
+def get_shared_fortranobject(env):
+    """Return the object node of fortranobject.c compiled for env.
+
+    fortranobject.c does not depend on the module, so it is compiled once for
+    all the extensions built with the same compilation flags, in
+    $F2PY_SHARED_BUILDDIR."""
+    try:
+        from hashlib import md5
+    except ImportError:
+        from md5 import new as md5
+
+    source = pjoin(env['F2PYINCLUDEDIR'], FOBJECT_FILE)
+    builddir = env.subst('$F2PY_SHARED_BUILDDIR')
+    # The command line without target and source: the flags
+    cmd = env.subst('$PYEXTCCCOM')
+    key = md5('\0'.join([source, builddir, cmd])).hexdigest()
+    try:
+        return _SHARED_FOBJECTS[key]
+    except KeyError:
+        target = pjoin(builddir, 'fortranobject-%s' % key[:8])
+        obj = env.PythonObject(target, env.File(source))[0]
+        _SHARED_FOBJECTS[key] = obj
+        return obj
+
+def F2pyLinkEmitter(target, source, env):
+    """Emitter for the python extension builder: adds the shared
+    fortranobject to the sources of extensions containing f2py modules."""
+    if not use_shared_fortranobject(env):
+        return (target, source)
+    for s in source:
+        for c in s.sources:
+            if getattr(c.attributes, 'f2py_module', 0):
+                return (target, source + [get_shared_fortranobject(env)])
+    return (target, source)
+
 def mangle_fortranobject(targetname, filename):
     basename = pbasename(targetname).split('module')[0]
     return '%s_%s' % (basename, filename)
@@ -119,7 +213,87 @@ def f2py_cmd_exec(cmd):
         print i.rstrip('\n')
     return p.wait()
 
+_F2PY_POOL = []
+_F2PY_POOL_LOCK = threading.Lock()
+
+def get_f2py_pool():
+    """Return the pool of f2py workers, with one worker per scons job at
+    most."""
+    _F2PY_POOL_LOCK.acquire()
+    try:
+        if not _F2PY_POOL:
+            from numscons.core.workers import WorkerPool
+            from numscons.core.sconf_batch import get_num_jobs
+            _F2PY_POOL.append(WorkerPool(get_num_jobs(),
+                                         ['numpy.f2py.f2py2e']))
+        return _F2PY_POOL[0]
+    finally:
+        _F2PY_POOL_LOCK.release()
+
+def f2py_exec(cmd, env):
+    """Executes a f2py command, in a f2py worker process if F2PY_WORKERS is
+    true in env.
+
+    Each command is still run in its own process, forked from a worker which
+    has already imported numpy.f2py, so this is as safe as f2py_cmd_exec.
+    Falls back to f2py_cmd_exec if no worker can be used."""
+    if env.has_key('F2PY_WORKERS') and env['F2PY_WORKERS']:
+        from numscons.core.workers import WorkerError
+        try:
+            st, output, res = get_f2py_pool().call('numpy.f2py.f2py2e',
+                                                   'run_main', (list(cmd),))
+        except WorkerError:
+            return f2py_cmd_exec(cmd)
+        for i in output.splitlines():
+            print i
+        return st
+    else:
+        return f2py_cmd_exec(cmd)
+
+def get_f2py_cache(env):
+    """Return the cache of f2py generated files, or None if F2PY_CACHE_DIR
+    is not set."""
+    if not (env.has_key('F2PY_CACHE_DIR') and env['F2PY_CACHE_DIR']):
+        return None
+    from numscons.core.file_cache import FileCache
+    return FileCache(env.subst('$F2PY_CACHE_DIR'), int(env['F2PY_CACHE_SIZE']))
+
+def f2py_cache_key(target, source, env):
+    """Return the key of the f2py generated files in the cache: the
+    generated files depend on the sources content (including the files they
+    include), the f2py options and the f2py version only."""
+    import numpy
+    from numscons.core.file_cache import cache_key
+    implicit = target[0].implicit or []
+    return cache_key(numpy.__version__, list(env['F2PYOPTIONS']),
+                     [pbasename(str(t)) for t in target],
+                     [s.get_contents() for s in source],
+                     [(pbasename(str(n)), n.get_csig()) for n in implicit])
+
 def pyf2c(target, source, env):
+    # We need filenames from source/target for path handling
+    target_file_names = [str(i) for i in target]
+
+    cache = get_f2py_cache(env)
+    if cache:
+        key = f2py_cache_key(target, source, env)
+        if cache.get(key, target_file_names):
+            # For the build trace (see numscons.core.build_trace)
+            target[0].attributes.cache_status = 'f2py-cache'
+            return 0
+
+    st = _pyf2c(target, source, env)
+
+    if cache and st == 0:
+        for t in target_file_names:
+            if not os.path.exists(t):
+                break
+        else:
+            cache.put(key, target_file_names)
+    return 0
+
+def _pyf2c(target, source, env):
+    # Run f2py, and return its exit status
     import numpy.f2py
     import shutil
 
@@ -138,12 +312,14 @@ def pyf2c(target, source, env):
     if build_dir == '':
         build_dir = '.'
 
-    try:
-        cpi = mangle_fortranobject(target_file_names[0], FOBJECT_FILE)
-        shutil.copy(source_c, pjoin(build_dir, cpi))
-    except IOError, e:
-        msg = "Error while copying fortran source files (error was %s)" % str(e)
-        raise IOError(msg)
+    if not use_shared_fortranobject(env):
+        try:
+            cpi = mangle_fortranobject(target_file_names[0], FOBJECT_FILE)
+            shutil.copy(source_c, pjoin(build_dir, cpi))
+        except IOError, e:
+            msg = "Error while copying fortran source files (error was %s)" \
+                  % str(e)
+            raise IOError(msg)
 
     basename = os.path.basename(str(target[0]).split('module')[0])
 
@@ -157,7 +333,7 @@ def pyf2c(target, source, env):
 
         cmd = env['F2PYOPTIONS'] + \
               [source_file_names[0], '--build-dir', build_dir]
-        st = f2py_cmd_exec(cmd)
+        st = f2py_exec(cmd, env)
 
         if not os.path.exists(wrapper):
             f = open(wrapper, 'w')
@@ -167,9 +343,9 @@ def pyf2c(target, source, env):
               ['--build-dir', build_dir]
         # fortran files, we need to give the module name
         cmd.extend(['--lower', '-m', basename])
-        st = f2py_cmd_exec(cmd)
+        st = f2py_exec(cmd, env)
 
-    return 0
+    return st
 
 
 def generate(env):
@@ -187,6 +363,19 @@ def generate(env):
     env['F2PYOPTIONS']      = SCons.Util.CLVar('--quiet')
     env['F2PYBUILDDIR']     = ''
     env['F2PYINCLUDEDIR']   = pjoin(d, 'src')
+    # Run f2py in persistent worker processes (see f2py_exec)
+    env['F2PY_WORKERS']     = True
+    # Cache of the generated files, which may be shared between build trees
+    # (see pyf2c): disabled if empty
+    env['F2PY_CACHE_DIR']   = os.environ.get('NUMSCONS_F2PY_CACHE', '')
+    env['F2PY_CACHE_SIZE']  = 100 * 1024 * 1024
+    # Compile fortranobject.c once, and link it in every f2py extension,
+    # instead of compiling a copy for each extension
+    env['F2PY_SHARED_FORTRANOBJECT'] = False
+    if env.has_key('build_prefix'):
+        env['F2PY_SHARED_BUILDDIR'] = pjoin('$build_prefix', 'f2py')
+    else:
+        env['F2PY_SHARED_BUILDDIR'] = 'f2py'
 
     if not (env.has_key("F2PY_NOT_ADD_INCLUDEDIR") and env["F2PY_NOT_ADD_INCLUDEDIR"]):
         env.Prepend(CPPPATH = env["F2PYINCLUDEDIR"])
@@ -202,6 +391,21 @@ def generate(env):
     env['BUILDERS']['F2py'] = SCons.Builder.Builder(action = f2pyac,
             emitter = [F2pyEmitter])
 
+def add_link_emitter(pyext):
+    """Add F2pyLinkEmitter to the emitters of the python extension builder
+    pyext, if it is not there already."""
+    emitter = pyext.emitter
+    if isinstance(emitter, SCons.Builder.ListEmitter):
+        # Identity test: EmitterProxy cannot be compared to functions
+        if [e for e in emitter if e is F2pyLinkEmitter]:
+            return
+        emitter = emitter.data
+    elif emitter:
+        emitter = [emitter]
+    else:
+        emitter = []
+    pyext.emitter = SCons.Builder.ListEmitter(emitter + [F2pyLinkEmitter])
+
 def exists(env):
     try:
         import numpy.f2py
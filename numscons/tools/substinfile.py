@@ -1,6 +1,29 @@
 # Last Change: Fri Oct 26 04:00 PM 2007 J
 import re
 
+def do_subst_in_file(targetfile, sourcefile, dict):
+    """Replace all instances of the keys of dict with their values.
+    For example, if dict is {'%VERSION%': '1.2345', '%BASE%': 'MyProg'},
+    then all instances of %VERSION% in the file will be replaced with 1.2345 etc.
+    """
+    import SCons.Errors
+
+    try:
+        f = open(sourcefile, 'rb')
+        contents = f.read()
+        f.close()
+    except:
+        raise SCons.Errors.UserError, "Can't read source file %s"%sourcefile
+    for (k,v) in dict.items():
+        contents = re.sub(k, v.replace("\\", "\\\\"), contents)
+    try:
+        f = open(targetfile, 'wb')
+        f.write(contents)
+        f.close()
+    except:
+        raise SCons.Errors.UserError, "Can't write target file %s"%targetfile
+    return 0 # success
+
 def TOOL_SUBST(env):
     """Adds SubstInFile builder, which substitutes the keys->values of SUBST_DICT
     from the source to the target.
@@ -16,27 +39,6 @@ def TOOL_SUBST(env):
     from SCons.Script import Depends
 
     env.Append(TOOLS = 'SUBST')
-    def do_subst_in_file(targetfile, sourcefile, dict):
-        """Replace all instances of the keys of dict with their values.
-        For example, if dict is {'%VERSION%': '1.2345', '%BASE%': 'MyProg'},
-        then all instances of %VERSION% in the file will be replaced with 1.2345 etc.
-        """
-        try:
-            f = open(sourcefile, 'rb')
-            contents = f.read()
-            f.close()
-        except:
-            raise SCons.Errors.UserError, "Can't read source file %s"%sourcefile
-        for (k,v) in dict.items():
-            contents = re.sub(k, v.replace("\\", "\\\\"), contents)
-        try:
-            f = open(targetfile, 'wb')
-            f.write(contents)
-            f.close()
-        except:
-            raise SCons.Errors.UserError, "Can't write target file %s"%targetfile
-        return 0 # success
-
     def subst_in_file(target, source, env):
         if not env.has_key('SUBST_DICT'):
             raise SCons.Errors.UserError, "SubstInFile requires SUBST_DICT to be set."
@@ -48,8 +50,12 @@ def TOOL_SUBST(env):
                 d[k]=env.subst(v)
             else:
                 raise SCons.Errors.UserError, "SubstInFile: key %s: %s must be a string or callable"%(k, repr(v))
+        # Run in the python action pool if enabled
+        from numscons.core.action_pool import run_python_action
         for (t,s) in zip(target, source):
-            return do_subst_in_file(str(t), str(s), d)
+            return run_python_action(env, 'numscons.tools.substinfile',
+                                     'do_subst_in_file',
+                                     (str(t), str(s), d))[0]
 
     def subst_in_file_string(target, source, env):
         """This is what gets printed on the console."""
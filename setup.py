@@ -35,6 +35,14 @@ class install_data(old_install_data):
     def run(self):
         old_install_data.run(self)
 
+        # Compile the configuration files, as numscons does not write into
+        # its installation directory
+        from numscons.core.config_cache import compile_config_file
+        for f in self.get_outputs():
+            if f.endswith('.cfg') and not self.dry_run:
+                compile_config_file(f)
+                self.outfiles.append(f + 'c')
+
 class install(old_install):
     """This install command extends the data_files list of data files using the
     data_dir argument."""
@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+# test module for symbols module
+import os
+import shutil
+import tempfile
+import unittest
+
+from numscons.core.compiler_detection import find_executable
+from numscons.core.utils import popen_wrapper
+from numscons.checkers.fortran.symbols import parse_nm, find_mangling, \
+    elf_symbols, nm_symbols
+
+# Output of nm on a object compiled by gfortran
+gfortran_nm_output = """
+0000000000000007 T foo_bar_
+0000000000000000 T foobar_
+                 U _gfortran_st_write
+"""
+
+# Output of nm on a object compiled by g77 on Mac OS X
+g77_darwin_nm_output = """
+00000000 T _foo_bar__
+0000000c T _foobar_
+"""
+
+VARIANTS = [('_', '', 'lower'), ('_', '', 'upper'), ('_', '_', 'lower'),
+            ('_', '_', 'upper'), ('', '', 'lower'), ('', '', 'upper'),
+            ('', '_', 'lower'), ('', '_', 'upper')]
+
+class test_Mangling(unittest.TestCase):
+    def test_parse_nm(self):
+        assert parse_nm(gfortran_nm_output) == ['foo_bar_', 'foobar_']
+
+    def test_gfortran(self):
+        symbols = parse_nm(gfortran_nm_output)
+        assert find_mangling(symbols, VARIANTS) == ('_', '', 'lower')
+
+    def test_g77_darwin(self):
+        symbols = parse_nm(g77_darwin_nm_output)
+        assert find_mangling(symbols, VARIANTS) == ('_', '_', 'lower')
+
+    def test_upper(self):
+        symbols = ['FOOBAR', 'FOO_BAR']
+        assert find_mangling(symbols, VARIANTS) == ('', '', 'upper')
+
+    def test_not_found(self):
+        assert find_mangling(['foobar_'], VARIANTS) is None
+
+class test_ObjectSymbols(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_elf(self):
+        cc = find_executable('cc')
+        if cc is None:
+            return
+        src = os.path.join(self.tmpdir, 'foo.c')
+        obj = os.path.join(self.tmpdir, 'foo.o')
+        f = open(src, 'w')
+        f.write("void foobar_(void) {}\nvoid foo_bar__(void) {}\n")
+        f.close()
+        st, out = popen_wrapper([cc, '-c', src, '-o', obj], shell = False)
+        if st:
+            return
+        symbols = elf_symbols(obj)
+        if symbols is None:
+            # Not an ELF platform
+            return
+        assert 'foobar_' in symbols and 'foo_bar__' in symbols
+        nm = nm_symbols(obj)
+        if nm is not None:
+            nm.sort()
+            symbols.sort()
+            assert nm == symbols
+
+    def test_not_object(self):
+        src = os.path.join(self.tmpdir, 'foo.c')
+        f = open(src, 'w')
+        f.write("void foobar_(void) {}\n")
+        f.close()
+        assert elf_symbols(src) is None
+
+if __name__ == "__main__":
+    unittest.main()
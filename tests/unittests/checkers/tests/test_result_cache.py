@@ -0,0 +1,40 @@
+#! /usr/bin/env python
+# test module for result_cache module
+import shutil
+import tempfile
+import unittest
+
+from numscons.checkers.result_cache import CheckResultStore
+
+class CheckResultStoreTester(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        key = ('F77Clib', ('gfortran', 'v4.3'), ('LINKFLAGS', ''))
+        store = CheckResultStore(self.tmpdir)
+        assert store.get(key) is None
+        store.set(key, ['-lgfortran'])
+
+        store = CheckResultStore(self.tmpdir)
+        assert store.get(key) == ['-lgfortran']
+        assert store.get(key + ('-O2',)) is None
+        assert store.hits == 1 and store.misses == 1
+
+    def test_force(self):
+        key = ('CBLAS', 'int main() {}')
+        store = CheckResultStore(self.tmpdir)
+        store.set(key, 'Atlas')
+
+        store = CheckResultStore(self.tmpdir, force = True)
+        assert store.get(key) is None
+        store.set(key, 'Mkl')
+
+        store = CheckResultStore(self.tmpdir)
+        assert store.get(key) == 'Mkl'
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+#! /usr/bin/env python
+# test module for action_pool module
+import os
+import sys
+import unittest
+from cStringIO import StringIO
+
+# sconf_batch needs scons
+import tests.unittests.sconstest
+
+import numscons.core.sconf_batch as sconf_batch
+import numscons.core.action_pool as action_pool
+from numscons.core.action_pool import run_python_action, \
+    report_action_stats
+from numscons.core.task_recorder import get_task_recorder, TaskRecord
+from numscons.core.workers import WorkerPool
+
+def _hello(name):
+    print "hello %s" % name
+    return os.getpid()
+
+class RunPythonActionTester(unittest.TestCase):
+    def setUp(self):
+        self.get_num_jobs = sconf_batch.get_num_jobs
+        sconf_batch.get_num_jobs = lambda: 2
+        self.recorder = get_task_recorder()
+        self.record = self.recorder.begin([])
+        self.env = {'python_action_pool': 1}
+        self.results = []
+
+    def tearDown(self):
+        self.recorder.end(self.record)
+        sconf_batch.get_num_jobs = self.get_num_jobs
+        for pool in action_pool._POOL:
+            pool.close()
+        action_pool._POOL[:] = []
+
+    def _run(self, env):
+        saved = sys.stdout
+        sys.stdout = output = StringIO()
+        try:
+            st, pid = run_python_action(env, 'test_action_pool', '_hello',
+                                        ('you',), self.results.append)
+        finally:
+            sys.stdout = saved
+        self.failUnlessEqual(st, 0)
+        self.failUnlessEqual(output.getvalue(), "hello you\n")
+        return pid
+
+    def test_local(self):
+        """With the option off, or with one job, the action runs here."""
+        self.failUnlessEqual(self._run({'python_action_pool': 0}),
+                             os.getpid())
+        sconf_batch.get_num_jobs = lambda: 1
+        self.failUnlessEqual(self._run(self.env), os.getpid())
+        self.failUnlessEqual(self.record.python, 'thread')
+        self.failUnlessEqual(action_pool._POOL, [])
+        # The callback is for the results of remote calls only
+        self.failUnlessEqual(self.results, [])
+
+    def test_pool(self):
+        """The action runs in a worker, its output is written here, and the
+        callback gets the result."""
+        pid = self._run(self.env)
+        self.failIfEqual(pid, os.getpid())
+        self.failUnlessEqual(self.results, [pid])
+        self.failUnlessEqual(self.record.python, 'pool')
+
+    def test_pool_default(self):
+        """The pool is used by default with several jobs, and the actions
+        run in the workers themselves, which are kept warm."""
+        pids = [self._run({}) for i in range(3)]
+        self.failUnlessEqual(self.results, pids)
+        self.failUnlessEqual(len(dict([(p, None) for p in pids])), 1)
+        self.failIfEqual(pids[0], os.getpid())
+
+    def test_worker_error(self):
+        """The action runs here if no worker can run it."""
+        action_pool._POOL.append(WorkerPool(2, ['numscons_no_such_module']))
+        self.failUnlessEqual(self._run(self.env), os.getpid())
+        self.failUnlessEqual(self.results, [])
+        self.failUnlessEqual(self.record.python, 'thread')
+
+    def test_failure(self):
+        """A failure in a worker gives a non zero status."""
+        saved = sys.stdout
+        sys.stdout = output = StringIO()
+        try:
+            st, res = run_python_action(self.env, 'os.path', 'join', (),
+                                        self.results.append)
+        finally:
+            sys.stdout = saved
+        self.failUnlessEqual(st, 1)
+        self.failUnless(output.getvalue().find('TypeError') != -1)
+        self.failUnlessEqual(self.results, [])
+
+class ActionStatsTester(unittest.TestCase):
+    def test_report(self):
+        records = []
+        for python, start, end in [(None, 0., 2.), ('pool', 1., 4.),
+                                   ('thread', 2., 3.), (None, 3., 4.)]:
+            r = TaskRecord([], 0, start)
+            r.end = end
+            r.python = python
+            records.append(r)
+        lines = report_action_stats(records, 2).split("\n")
+        self.failUnlessEqual(lines[0], "Tasks: 2 jobs, 4.0 s")
+        # 3 s of the 8 s available to 2 jobs
+        self.failUnless(lines[1].find("1 tasks,      3.0 s busy,  37.5 %") \
+                        != -1, lines[1])
+        self.failUnless(lines[3].find("2 tasks,      3.0 s busy") != -1,
+                        lines[3])
+
+if __name__ == "__main__":
+    unittest.main()
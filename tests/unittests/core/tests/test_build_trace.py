@@ -0,0 +1,107 @@
+#! /usr/bin/env python
+# test module for build_trace module
+import unittest
+
+from tests.unittests.sconstest import SConsTestCase
+
+import SCons.Action
+
+from numscons.core.build_trace import BuildTrace, action_kind, \
+    get_build_trace, _json_str
+from numscons.core.task_recorder import TaskRecorder, TaskRecord
+
+def pyf2c(target, source, env):
+    pass
+
+def my_action(target, source, env):
+    pass
+
+class ActionKindTester(SConsTestCase):
+    def _kind(self, action):
+        node = self.env.Command('foo.o', 'foo.c', action)[0]
+        executor = node.get_executor()
+        return action_kind(executor.get_action_list()[0], executor)
+
+    def test_command(self):
+        self.failUnlessEqual(self._kind('$CCCOM'), 'CC')
+        self.failUnlessEqual(self._kind('${F77COM}'), 'F77')
+        self.failUnlessEqual(self._kind('cp $SOURCE $TARGET'), 'COMMAND')
+
+    def test_function(self):
+        self.failUnlessEqual(self._kind(pyf2c), 'F2PY')
+        self.failUnlessEqual(self._kind(my_action), 'MY_ACTION')
+
+    def test_lazy(self):
+        action = SCons.Action.Action('$SHCCCOM')
+        self.failUnless(isinstance(action, SCons.Action.LazyAction))
+        self.failUnlessEqual(self._kind(action), 'SHCC')
+
+    def test_list(self):
+        # The command of the list, if any
+        self.failUnlessEqual(self._kind([my_action, '$SHLINKCOM']), 'SHLINK')
+        self.failUnlessEqual(self._kind([pyf2c, my_action]), 'F2PY')
+
+    def test_generator(self):
+        def generator(target, source, env, for_signature):
+            if str(source[0]).endswith('.c'):
+                return '$CCCOM'
+            return '$CXXCOM'
+        action = SCons.Action.Action(generator, generator = 1)
+        self.failUnless(isinstance(action,
+                                   SCons.Action.CommandGeneratorAction))
+        self.failUnlessEqual(self._kind(action), 'CC')
+
+class BuildTraceTester(SConsTestCase):
+    def _trace(self):
+        return BuildTrace([(['a.o'], 'CC', 'built', 0, 10., 11.),
+                           (['b.o', 'b.h'], 'CC', 'cachedir', 1, 10.5, 11.),
+                           (['a.so'], 'SHLINK', 'built', 0, 11., 13.)], 10.)
+
+    def test_json_str(self):
+        self.failUnlessEqual(_json_str('a\\b"c\n\xe9'),
+                             '"a\\\\b\\"c\\u000a\\u00e9"')
+
+    def test_chrome_trace(self):
+        import json
+        trace = json.loads(self._trace().chrome_trace())
+        events = trace['traceEvents']
+        self.failUnlessEqual(len(events), 3)
+        self.failUnlessEqual(events[1], {'name': 'b.o', 'cat': 'CC',
+            'ph': 'X', 'pid': 1, 'tid': 1, 'ts': 500000, 'dur': 500000,
+            'args': {'targets': ['b.o', 'b.h'], 'status': 'cachedir'}})
+
+    def test_summary(self):
+        lines = self._trace().summary(nlongest = 1).split("\n")
+        self.failUnlessEqual(lines[0],
+                             "Build trace: 3 tasks in 3.00 s, 2 jobs used")
+        # 3.5 s busy in 3 s
+        self.failUnless(lines[1].find("parallelism 1.17") != -1, lines[1])
+        self.failUnless(lines[3].split() == ['SHLINK', '1', '2.00', '57.1',
+                                             '2.00', '0'], lines[3])
+        self.failUnless(lines[4].split() == ['CC', '2', '1.50', '42.9',
+                                             '1.00', '1'], lines[4])
+        self.failUnless(lines[-1].split() == ['2.00', 's', 'SHLINK', 'a.so'],
+                        lines[-1])
+        self.failUnlessEqual(BuildTrace([], 0.).summary(),
+                             "Build trace: no task executed")
+
+    def test_recorder(self):
+        """The trace of the recorded tasks."""
+        a = self.env.Command('a.o', 'a.c', '$CCCOM')[0]
+        b = self.env.Command('b.o', 'b.c', pyf2c)[0]
+        b.attributes.cache_status = 'f2py-cache'
+        recorder = TaskRecorder()
+        for node in [a, b]:
+            record = TaskRecord([node], 0, recorder.start + 1.)
+            record.end = record.start + 1.
+            recorder.records.append(record)
+
+        trace = get_build_trace(recorder)
+        self.failUnlessEqual(trace.records,
+                             [(['a.o'], 'CC', 'built', 0, record.start,
+                               record.end),
+                              (['b.o'], 'F2PY', 'f2py-cache', 0, record.start,
+                               record.end)])
+
+if __name__ == "__main__":
+    unittest.main()
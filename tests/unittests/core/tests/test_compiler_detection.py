@@ -3,6 +3,9 @@
 
 # test module for utils module
 import os
+import sys
+import shutil
+import tempfile
 import unittest
 
 from numscons.core.compiler_detection import *
@@ -105,5 +108,125 @@ class OutputParser(unittest.TestCase):
         ret = parse_ifort(IFORT_10)
         assert ret == (True, "10.1")
 
+class ProbeCacheTester(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cc = os.path.join(self.tmpdir, 'fakecc')
+        self.cachefile = os.path.join(self.tmpdir, 'probes.cache')
+        self._write_compiler("4.2.3")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write_compiler(self, version):
+        f = open(self.cc, 'w')
+        f.write("#! /bin/sh\necho 'gcc version %s (fake)'\n" % version)
+        f.close()
+        os.chmod(self.cc, 0755)
+
+    def test_memory(self):
+        cache = ProbeCache()
+        st, out = cache.probe(self.cc, ['-v'])
+        assert parse_gnu(out) == (True, "4.2.3")
+        cache.probe(self.cc, ['-v'])
+        assert cache.hits == 1 and cache.misses == 1
+
+    def test_persistent(self):
+        cache = ProbeCache(self.cachefile)
+        cache.probe(self.cc, ['-v'])
+        assert os.path.exists(self.cachefile)
+
+        cache = ProbeCache(self.cachefile)
+        st, out = cache.probe(self.cc, ['-v'])
+        assert parse_gnu(out) == (True, "4.2.3")
+        assert cache.hits == 1 and cache.misses == 0
+
+    def test_shared(self):
+        """Caches saving to the same file keep each other's entries."""
+        first = ProbeCache(self.cachefile)
+        second = ProbeCache(self.cachefile)
+        first.probe(self.cc, ['-v'])
+        second.probe(self.cc, ['-V'])
+
+        cache = ProbeCache(self.cachefile)
+        cache.probe(self.cc, ['-v'])
+        cache.probe(self.cc, ['-V'])
+        assert cache.hits == 2 and cache.misses == 0
+
+    def test_invalidation(self):
+        cache = ProbeCache(self.cachefile)
+        cache.probe(self.cc, ['-v'])
+        self._write_compiler("4.3.10")
+        st, out = cache.probe(self.cc, ['-v'])
+        assert parse_gnu(out) == (True, "4.3.10")
+        assert cache.invalidated == 1 and cache.misses == 2
+
+    def test_not_found(self):
+        cache = ProbeCache()
+        self.assertRaises(OSError, cache.probe,
+                          os.path.join(self.tmpdir, 'nocc'), ['-v'])
+
+class IdentifyCompilerTester(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fc = os.path.join(self.tmpdir, 'fakefc')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write_compiler(self, output, status=0):
+        f = open(self.fc, 'w')
+        f.write("#! /bin/sh\necho '%s'\nexit %d\n" % (output, status))
+        f.close()
+        os.chmod(self.fc, 0755)
+
+    def test_gfortran(self):
+        self._write_compiler("gcc version 4.3.2 (fake)")
+        cache = ProbeCache()
+        ret = identify_compiler(self.fc, F77_CANDIDATES, cache)
+        assert ret == ("gfortran", "4.3.2")
+        # g77 and gfortran share the same probe
+        assert cache.misses == 1
+
+    def test_g77(self):
+        self._write_compiler("gcc version 3.4.6 (fake)")
+        ret = identify_compiler(self.fc, F77_CANDIDATES, ProbeCache())
+        assert ret == ("g77", "3.4.6")
+
+    def test_ifort(self):
+        self._write_compiler(IFORT_10.strip().splitlines()[0])
+        cache = ProbeCache()
+        ret = identify_compiler(self.fc, F77_CANDIDATES, cache)
+        assert ret == ("ifort", "10.1")
+        assert cache.misses == 2
+
+    def test_unknown(self):
+        self._write_compiler("gcc version 4.3.2 (fake)", 1)
+        cache = ProbeCache()
+        ret = identify_compiler(self.fc, F77_CANDIDATES, cache)
+        assert ret == (None, None)
+        assert cache.misses == 2
+
+    def test_concurrent(self):
+        self._write_compiler("gcc version 4.3.2 (fake)")
+        cache = ProbeCache()
+        ret = identify_compilers([(self.fc, CC_CANDIDATES),
+                                  (self.fc, F77_CANDIDATES),
+                                  (os.path.join(self.tmpdir, 'nocxx'),
+                                   CXX_CANDIDATES)], cache)
+        assert ret == [("gcc", "4.3.2"), ("gfortran", "4.3.2"), (None, None)]
+        assert identify_compiler(self.fc, F77_CANDIDATES, cache) == \
+               ("gfortran", "4.3.2")
+        assert cache.hits >= 1
+
+    def test_not_found(self):
+        ret = identify_compiler(os.path.join(self.tmpdir, 'nofc'),
+                                CC_CANDIDATES, ProbeCache())
+        assert ret == (None, None)
+
+if sys.platform == 'win32':
+    del ProbeCacheTester
+    del IdentifyCompilerTester
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,150 @@
+#! /usr/bin/env python
+# test module for config_cache module
+import os
+import shutil
+import tempfile
+import unittest
+from ConfigParser import ConfigParser
+
+from numscons.core.misc import _CONFDIR
+from numscons.core.config_cache import read_config, clear_config_cache, \
+    compile_config_file, init_config_cache, _read_file, _signature
+import numscons.core.config_cache as config_cache
+
+class ConfigCacheTester(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        clear_config_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        init_config_cache(None)
+        clear_config_cache()
+
+    def _write(self, name, content):
+        filename = os.path.join(self.tmpdir, name)
+        f = open(filename, 'w')
+        f.write(content)
+        f.close()
+        return filename
+
+    def test_shipped(self):
+        """Cached configuration is the same as the one from ConfigParser."""
+        for name in ['perflib.cfg', 'compiler.cfg', 'fcompiler.cfg',
+                     'cxxcompiler.cfg']:
+            files = [os.path.join(_CONFDIR, name)]
+            ref = ConfigParser()
+            ref.read(files)
+            parser, read = read_config(files)
+            assert read == files
+            assert parser.sections() == ref.sections()
+            for s in ref.sections():
+                assert parser.items(s) == ref.items(s)
+
+    def test_precedence(self):
+        a = self._write('a.cfg', "[DEFAULT]\nd = %(x)s/lib\n"
+                                 "[atlas]\nx = /usr\nlibraries = atlas\n")
+        b = self._write('b.cfg', "[atlas]\nlibraries = f77blas,atlas\n")
+        missing = os.path.join(self.tmpdir, 'missing.cfg')
+        parser, read = read_config([a, missing, b])
+        assert read == [a, b]
+        assert parser.get('atlas', 'libraries') == 'f77blas,atlas'
+        assert parser.get('atlas', 'd') == '/usr/lib'
+
+    def test_memoized(self):
+        a = self._write('a.cfg', "[atlas]\nlibraries = atlas\n")
+        parser, read = read_config([a])
+        assert read_config([a])[0] is parser
+
+        # Changing the file invalidates the cache
+        a = self._write('a.cfg', "[atlas]\nlibraries = f77blas,atlas\n")
+        parser, read = read_config([a])
+        assert parser.get('atlas', 'libraries') == 'f77blas,atlas'
+
+    def test_compiled(self):
+        old = config_cache._CONFDIR
+        config_cache._CONFDIR = self.tmpdir
+        try:
+            a = self._write('a.cfg', "[atlas]\nlibraries = atlas\n")
+            content = _read_file(a, _signature(a))
+            # Only compiled when installed
+            assert not os.path.exists(a + 'c')
+            compile_config_file(a)
+
+            clear_config_cache()
+            # The compiled form is used instead of parsing the file
+            def parse(filename):
+                raise AssertionError("%s parsed again" % filename)
+            old_parse = config_cache._parse
+            config_cache._parse = parse
+            try:
+                assert _read_file(a, _signature(a)) == content
+            finally:
+                config_cache._parse = old_parse
+        finally:
+            config_cache._CONFDIR = old
+
+    def test_cachefile(self):
+        a = self._write('site.cfg', "[atlas]\nlibraries = atlas\n")
+        cachefile = os.path.join(self.tmpdir, 'cache', 'site.cache')
+        read_config([a], cachefile)
+        assert os.path.exists(cachefile)
+
+        clear_config_cache()
+        def parse(filename):
+            raise AssertionError("%s parsed again" % filename)
+        old_parse = config_cache._parse
+        config_cache._parse = parse
+        try:
+            parser, read = read_config([a], cachefile)
+            assert parser.get('atlas', 'libraries') == 'atlas'
+        finally:
+            config_cache._parse = old_parse
+
+    def test_init_cache(self):
+        """The configuration files are cached in the file of the build."""
+        old = config_cache._CONFDIR
+        config_cache._CONFDIR = self.tmpdir
+        try:
+            a = self._write('a.cfg', "[atlas]\nlibraries = atlas\n")
+            cachefile = os.path.join(self.tmpdir, 'cache', 'config.cache')
+            init_config_cache(cachefile)
+            read_config([a])
+            assert os.path.exists(cachefile)
+            assert not os.path.exists(a + 'c')
+
+            clear_config_cache()
+            def parse(filename):
+                raise AssertionError("%s parsed again" % filename)
+            old_parse = config_cache._parse
+            config_cache._parse = parse
+            try:
+                parser, read = read_config([a])
+                assert parser.get('atlas', 'libraries') == 'atlas'
+            finally:
+                config_cache._parse = old_parse
+        finally:
+            config_cache._CONFDIR = old
+
+    def test_shared_cachefile(self):
+        """Processes saving to the same cache file keep each other's
+        entries."""
+        a = self._write('a.cfg', "[atlas]\nlibraries = atlas\n")
+        b = self._write('b.cfg', "[mkl]\nlibraries = mkl\n")
+        cachefile = os.path.join(self.tmpdir, 'config.cache')
+        old_parse = config_cache._parse
+        def parse(filename):
+            # Another process saves b while a is parsed
+            config_cache._parse = old_parse
+            read_config([b], cachefile)
+            return old_parse(filename)
+        config_cache._parse = parse
+        try:
+            read_config([a], cachefile)
+        finally:
+            config_cache._parse = old_parse
+        store = config_cache._load_store(cachefile)
+        assert store.has_key(_signature(a)) and store.has_key(_signature(b))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+#! /usr/bin/env python
+# test module for critical_path module
+import sys
+import unittest
+from cStringIO import StringIO
+
+from tests.unittests.sconstest import SConsTestCase
+
+import SCons.Job
+import SCons.Taskmaster
+
+from numscons.core.critical_path import CriticalPathTaskmaster
+from numscons.core.task_recorder import TaskRecorder, TaskRecord
+
+class CriticalPathTester(SConsTestCase):
+    def setUp(self):
+        SConsTestCase.setUp(self)
+        self.built = []
+
+    def _node(self, name, sources = [], fail = False):
+        def action(target, source, env):
+            if fail:
+                return 1
+            self.built.append(str(target[0]))
+            for t in target:
+                f = open(str(t), 'w')
+                f.close()
+        return self.env.Command(name, sources, action)[0].disambiguate()
+
+    def _store(self, node, **kw):
+        # Set attributes of the node info stored in the sconsign
+        entry = node.get_stored_info()
+        for k, v in kw.items():
+            setattr(entry.ninfo, k, v)
+        node.dir.sconsign().set_entry(node.name, entry)
+
+    def _build(self, top):
+        tm = CriticalPathTaskmaster([top], SCons.Taskmaster.AlwaysTask)
+        saved = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            SCons.Job.Jobs(1, tm).run()
+        finally:
+            sys.stdout = saved
+        return tm
+
+    def test_priority(self):
+        """Ready nodes are given by decreasing remaining path, then in walk
+        order."""
+        a, b, c, d = [self._node(n) for n in 'abcd']
+        top = self._node('top', [a, b, c, d])
+        self._store(a, critical_path = 1.)
+        self._store(b, critical_path = 3.)
+        # build_duration is used when the remaining path is not known
+        self._store(d, build_duration = 2.)
+
+        self._build(top)
+        self.failUnlessEqual(self.built, ['b', 'd', 'a', 'c', 'top'])
+
+    def test_failed_shared_child(self):
+        """A failed build does not report the nodes still waiting as a
+        dependency cycle."""
+        x = self._node('x')
+        f = self._node('f', fail = True)
+        a = self._node('a', [x])
+        b = self._node('b', [f, x])
+        top = self._node('top', [b, a])
+        # f first, while x is ready too
+        self._store(f, critical_path = 2.)
+        self._store(x, critical_path = 1.)
+
+        self._build(top)
+        self.failUnlessEqual(self.built, [])
+        self.failUnlessEqual(top.get_state(), SCons.Node.failed)
+
+    def _taskmaster(self, walked, times):
+        tm = CriticalPathTaskmaster([walked[-1]], SCons.Taskmaster.AlwaysTask)
+        tm._walked = walked
+        tm._recorder = TaskRecorder()
+        tm._first_record = 0
+        for node, duration in times:
+            record = TaskRecord([node], 0, 10.)
+            record.end = 10. + duration
+            tm._recorder.records.append(record)
+        return tm
+
+    def test_update_paths(self):
+        """Remaining paths of a full build."""
+        x = self._node('x')
+        y = self._node('y')
+        a = self._node('a', [x])
+        top = self._node('top', [a, y])
+
+        tm = self._taskmaster([x, a, y, top],
+                              [(x, 1.), (a, 2.), (y, .5), (top, 1.)])
+        self.failUnlessEqual(tm._update_paths(), (0., 4.))
+        for n, path, duration in [(top, 1., 1.), (a, 3., 2.), (x, 4., 1.),
+                                  (y, 1.5, .5)]:
+            self.failUnlessEqual(n.get_ninfo().critical_path, path)
+            self.failUnlessEqual(n.get_ninfo().build_duration, duration)
+
+    def test_update_paths_partial(self):
+        """Remaining paths of a partial rebuild: the durations of the nodes
+        which were not built are the stored ones."""
+        x = self._node('x')
+        y = self._node('y')
+        a = self._node('a', [x])
+        top = self._node('top', [a, y])
+        self._store(x, build_duration = 1.)
+        self._store(y, build_duration = .5)
+        self._store(a, build_duration = 1.5)
+        self._store(top, build_duration = 1.)
+
+        tm = self._taskmaster([x, a, y, top], [(a, 2.), (top, 1.)])
+        # Only the executed tasks are on the predicted and actual paths
+        self.failUnlessEqual(tm._update_paths(), (2.5, 3.))
+        self.failUnlessEqual(x.get_ninfo().critical_path, 4.)
+        self.failUnlessEqual(x.get_ninfo().build_duration, 1.)
+        self.failUnlessEqual(a.get_ninfo().build_duration, 2.)
+        self.failUnlessEqual(y.get_ninfo().critical_path, 1.5)
+
+    def test_report(self):
+        """Tasks with the same times are reported separately."""
+        a = self._node('a')
+        b = self._node('b')
+        self._store(a, build_duration = 3.)
+        tm = self._taskmaster([a, b], [(a, 1.), (b, 1.)])
+        report = tm._report((3., 1.))
+        self.failUnless(report.find("2 tasks, 1 with a recorded") != -1,
+                        report)
+        self.failUnless(report.find("work 2.00 s") != -1, report)
+        self.failUnless(report.find("predicted makespan:     3.00 s") != -1,
+                        report)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+# test module for file_cache module
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from numscons.core.file_cache import FileCache, cache_key
+
+class FileCacheTester(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cachedir = os.path.join(self.tmpdir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, content):
+        filename = os.path.join(self.tmpdir, name)
+        f = open(filename, 'w')
+        f.write(content)
+        f.close()
+        return filename
+
+    def _read(self, name):
+        f = open(os.path.join(self.tmpdir, name))
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def test_key(self):
+        self.failUnlessEqual(cache_key('a', ['b']), cache_key('a', ['b']))
+        self.failIfEqual(cache_key('ab', 'c'), cache_key('a', 'bc'))
+
+    def test_get_put(self):
+        cache = FileCache(self.cachedir, 1000)
+        files = [self._write('foomodule.c', 'module'),
+                 self._write('foo-f2pywrappers.f', 'wrapper')]
+        key = cache_key('foo')
+        self.failIf(cache.get(key, files))
+        cache.put(key, files)
+
+        for f in files:
+            os.remove(f)
+        self.failUnless(cache.get(key, files))
+        self.failUnlessEqual(self._read('foomodule.c'), 'module')
+        self.failUnlessEqual(self._read('foo-f2pywrappers.f'), 'wrapper')
+        self.failUnlessEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_eviction(self):
+        # Room for two entries of 40 bytes
+        cache = FileCache(self.cachedir, 100)
+        files = [self._write('a', 'x' * 40)]
+        for k in ['1', '2']:
+            cache.put(cache_key(k), files)
+        # Make sure 1 is more recently used than 2
+        entry2 = cache._entry(cache_key('2'))
+        os.utime(entry2, (time.time() - 10, time.time() - 10))
+        self.failUnless(cache.get(cache_key('1'), files))
+
+        cache.put(cache_key('3'), files)
+        self.failUnless(cache.get(cache_key('1'), files))
+        self.failUnless(cache.get(cache_key('3'), files))
+        self.failIf(cache.get(cache_key('2'), files))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+# test module for journaldb module
+import os
+import shutil
+import tempfile
+import unittest
+
+import cPickle
+
+from numscons.core import journaldb
+
+class JournalDBTester(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.base = os.path.join(self.tmpdir, 'sconsign')
+        self.filename = self.base + journaldb.journal_suffix
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        db = journaldb.open(self.base, 'c')
+        db['a'] = '1'
+        db[u'b'] = u'2'
+        db.sync()
+        db['a'] = '3'
+        db.sync()
+
+        db = journaldb.open(self.base, 'r')
+        self.failUnlessEqual(len(db), 2)
+        self.failUnlessEqual((db['a'], db['b']), ('3', '2'))
+        self.assertRaises(IOError, db.sync)
+
+    def test_append_only(self):
+        db = journaldb.open(self.base, 'c')
+        db['a'] = 'x' * 100
+        db['b'] = 'y' * 100
+        db.sync()
+        size = os.path.getsize(self.filename)
+
+        # Unchanged values are not written again
+        db = journaldb.open(self.base, 'c')
+        db['a'] = 'x' * 100
+        db.sync()
+        self.failUnlessEqual(os.path.getsize(self.filename), size)
+
+        db['b'] = 'z'
+        db.sync()
+        self.failUnlessEqual(os.path.getsize(self.filename),
+                             size + journaldb._HEADER_SIZE + 2)
+
+    def test_truncated(self):
+        db = journaldb.open(self.base, 'c')
+        db['a'] = '1'
+        db.sync()
+        db['b'] = '2'
+        db.sync()
+
+        # Simulate a build interrupted in the middle of the second sync
+        f = open(self.filename, 'r+b')
+        f.truncate(os.path.getsize(self.filename) - 1)
+        f.close()
+
+        db = journaldb.open(self.base, 'c')
+        self.failUnlessEqual(db.keys(), ['a'])
+        db['c'] = '3'
+        db.sync()
+        db = journaldb.open(self.base, 'r')
+        self.failUnlessEqual(sorted(db.keys()), ['a', 'c'])
+
+    def test_lazy(self):
+        db = journaldb.open(self.base, 'c')
+        db['a'] = '1'
+        db['b'] = '2'
+        db.sync()
+
+        # Corrupt the value of b: only b is lost
+        f = open(self.filename, 'r+b')
+        f.seek(-1, 2)
+        f.write('3')
+        f.close()
+
+        db = journaldb.open(self.base, 'c')
+        self.failUnlessEqual(db._dict, {})
+        self.failUnlessEqual(db['a'], '1')
+        self.assertRaises(KeyError, db.__getitem__, 'b')
+        self.failUnlessEqual(db.keys(), ['a'])
+
+    def test_compaction(self):
+        db = journaldb.open(self.base, 'c')
+        for i in range(100):
+            db['a'] = str(i) * 1000
+            db.sync()
+        self.failUnless(os.path.getsize(self.filename) <
+                        2 * journaldb.COMPACT_MIN_SIZE)
+        db = journaldb.open(self.base, 'r')
+        self.failUnlessEqual(db['a'], '99' * 1000)
+
+    def test_migration(self):
+        f = open(self.base + journaldb.dblite_suffix, 'wb')
+        cPickle.dump({'a': '1'}, f, 1)
+        f.close()
+
+        db = journaldb.open(self.base, 'c')
+        self.failUnlessEqual(db['a'], '1')
+        self.failUnless(os.path.exists(self.filename))
+
+if __name__ == "__main__":
+    unittest.main()
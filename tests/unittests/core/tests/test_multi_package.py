@@ -0,0 +1,94 @@
+#! /usr/bin/env python
+# test module for the multi-package mode (see numscons.NumpyPackages)
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from os.path import join as pjoin, dirname as pdirname
+from subprocess import Popen, PIPE, STDOUT
+
+import numscons
+from numscons.core.misc import get_scons_path
+
+TOP_SCONSTRUCT = """\
+import os
+from numscons import NumpyPackages
+NumpyPackages([('pkga/SConstruct', {'pkg_name': 'pkga', 'src_dir': 'pkga'}),
+               ('pkgb/SConstruct', {'pkg_name': 'pkgb', 'src_dir': 'pkgb'})],
+              ARGUMENTS)
+print "top:", os.getcwd() == Dir('#').abspath, Dir('.').path
+"""
+
+# Package SConstruct, as written for distutils (read from the top directory
+# with scons -f)
+PKG_SCONSTRUCT = """\
+import os
+from numscons import GetInitEnvironment
+env = GetInitEnvironment(ARGUMENTS)
+print "%s:" % env['pkg_name'], os.getcwd() == Dir('#').abspath, \\
+      Dir('.').path, env['build_dir'], env['multi_package']
+env.DistutilsSConscript('SConscript')
+"""
+
+PKG_SCONSCRIPT = """\
+from numscons import GetInitEnvironment
+env = GetInitEnvironment(ARGUMENTS)
+env.Command('out.txt', 'in.txt', Copy('$TARGET', '$SOURCE'))
+"""
+
+class MultiPackageTester(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.write('SConstruct', TOP_SCONSTRUCT)
+        for pkg in ['pkga', 'pkgb']:
+            os.mkdir(pjoin(self.tmpdir, pkg))
+            self.write(pjoin(pkg, 'SConstruct'), PKG_SCONSTRUCT)
+            self.write(pjoin(pkg, 'SConscript'), PKG_SCONSCRIPT)
+            self.write(pjoin(pkg, 'in.txt'), pkg)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        f = open(pjoin(self.tmpdir, name), 'w')
+        try:
+            f.write(content)
+        finally:
+            f.close()
+
+    def scons(self):
+        env = dict(os.environ)
+        path = [pdirname(pdirname(numscons.__file__))]
+        if env.has_key('PYTHONPATH'):
+            path.append(env['PYTHONPATH'])
+        env['PYTHONPATH'] = os.pathsep.join(path)
+        cmd = [sys.executable, pjoin(get_scons_path(), 'scons.py'), '-Q',
+               'build_prefix=build', 'pkg_name=top']
+        p = Popen(cmd, cwd = self.tmpdir, env = env, stdout = PIPE,
+                  stderr = STDOUT)
+        output = p.communicate()[0]
+        self.failUnlessEqual(p.returncode, 0, output)
+        return output.splitlines()
+
+    def test_build(self):
+        """Packages are read from the top directory, with their arguments
+        taking precedence over the command line ones, and built in one graph
+        with one sconsign file."""
+        output = self.scons()
+        self.failUnless("pkga: True . build/pkga True" in output, output)
+        self.failUnless("pkgb: True . build/pkgb True" in output, output)
+        self.failUnless("top: True ." in output, output)
+        self.failUnlessEqual(open(pjoin(self.tmpdir, 'build', 'pkga',
+                                        'out.txt')).read(), 'pkga')
+        self.failUnlessEqual(open(pjoin(self.tmpdir, 'build', 'pkgb',
+                                        'out.txt')).read(), 'pkgb')
+        self.failUnless(os.path.exists(pjoin(self.tmpdir, 'build',
+                                             'sconsign.dblite')))
+
+        # Everything is up to date from the single sconsign file
+        output = self.scons()
+        self.failUnless("scons: `.' is up to date." in output, output)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+#! /usr/bin/env python
+# test module for sconf_batch module
+import os
+import unittest
+
+from tests.unittests.sconstest import SConsTestCase
+
+import SCons.Builder
+import SCons.SConf
+
+from numscons.core.sconf_batch import TryBatch, _try_parallel
+
+# A probe succeeds if its text contains ok; its output is its text
+PROBE_ACTION = 'sleep 0.1 && cat $SOURCE && grep -q ok $SOURCE && '\
+               'cp $SOURCE $TARGET'
+
+class SConfBatchTester(SConsTestCase):
+    def setUp(self):
+        SConsTestCase.setUp(self)
+        SCons.SConf.SConfFS = None
+        self.env['BUILDERS']['Probe'] = SCons.Builder.Builder(
+                action = PROBE_ACTION, suffix = '.out')
+        self.sconf = SCons.SConf.SConf(self.env, conf_dir = 'conf',
+                                       log_file = 'config.log')
+        # Probes have no overrides: they all build in the same environment
+        self.probes = [('bad 0\n', '.txt', {}), ('ok 1\n', '.txt', {}),
+                       ('bad 2\n', '.txt', {}), ('ok 3\n', '.txt', {})]
+
+    def tearDown(self):
+        self.sconf.Finish()
+        SCons.SConf.SConfFS = None
+        SConsTestCase.tearDown(self)
+
+    def _log(self):
+        self.sconf.logstream.flush()
+        return open('config.log').read()
+
+    def test_sequential(self):
+        """One job: probes are built in order until the first success."""
+        res = TryBatch(self.sconf, self.probes, 'Probe')
+        self.failUnlessEqual(res, [0, 1, None, None])
+        self.failUnlessEqual(open(str(self.sconf.lastTarget)).read(),
+                             'ok 1\n')
+
+    def test_parallel(self):
+        """Concurrent probes: the output of every probe is kept in its own
+        build info, and in one piece in the log."""
+        res = _try_parallel(self.sconf, self.probes, 'Probe', 4)
+        self.failUnlessEqual(res, [0, 1, 0, 1])
+        self.failUnlessEqual(open(str(self.sconf.lastTarget)).read(),
+                             'ok 1\n')
+
+        log = self._log()
+        for i in range(len(self.probes)):
+            target = self.fs.File(os.path.join('conf', 'conftest_%d.out' % i))
+            binfo = target.dir.sconsign().get_entry(target.name).binfo
+            self.failUnless(isinstance(binfo, SCons.SConf.SConfBuildInfo))
+            self.failUnlessEqual(binfo.result, 1 - res[i])
+            # The command line and the output of this probe only
+            out = binfo.string
+            self.failUnlessEqual(out.count('\n'), 2, out)
+            self.failUnless(out.endswith(self.probes[i][0]), out)
+            self.failUnless(log.find(out) != -1)
+
+    def test_parallel_first(self):
+        """With first, probes are built by groups of as many probes as jobs,
+        until one succeeds."""
+        res = _try_parallel(self.sconf, self.probes, 'Probe', 2, first = True)
+        self.failUnlessEqual(res, [0, 1, None, None])
+        log = self._log()
+        self.failUnlessEqual(log.find('bad 2'), -1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#! /usr/bin/env python
+# test module for server module
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from os.path import join as pjoin, dirname as pdirname
+from cStringIO import StringIO
+from subprocess import Popen
+
+import numscons
+from numscons.server import run_scons, stop_server
+
+SCONSTRUCT = """\
+Command('out.txt', 'in.txt', Copy('$TARGET', '$SOURCE'))
+Command('fail.txt', 'in.txt', 'exit 3')
+if ARGUMENTS.get('raise', 0):
+    raise ValueError('bad SConstruct')
+"""
+
+class ServerTester(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.address = pjoin(self.tmpdir, 'socket')
+        self.write('SConstruct', SCONSTRUCT)
+        self.write('in.txt', 'hello')
+
+        env = dict(os.environ)
+        path = [pdirname(pdirname(numscons.__file__))]
+        if env.has_key('PYTHONPATH'):
+            path.append(env['PYTHONPATH'])
+        env['PYTHONPATH'] = os.pathsep.join(path)
+        self.server = Popen([sys.executable, '-m', 'numscons.server', 'serve',
+                             self.address], cwd = self.tmpdir, env = env)
+        t = time.time()
+        while not os.path.exists(self.address):
+            if self.server.poll() is not None or time.time() - t > 30:
+                self.fail("The server did not start")
+            time.sleep(0.05)
+
+    def tearDown(self):
+        if self.server.poll() is None:
+            stop_server(self.address)
+            self.server.wait()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        f = open(pjoin(self.tmpdir, name), 'w')
+        try:
+            f.write(content)
+        finally:
+            f.close()
+
+    def run_scons(self, argv):
+        out = StringIO()
+        st = run_scons(self.address, argv, cwd = self.tmpdir, out = out)
+        return st, out.getvalue()
+
+    def test_run(self):
+        """A build run by the server, then the server stopped."""
+        st, output = self.run_scons(['-Q', 'out.txt'])
+        self.failUnlessEqual(st, 0, output)
+        self.failUnless(output.find('Copy("out.txt", "in.txt")') != -1,
+                        output)
+        self.failUnlessEqual(open(pjoin(self.tmpdir, 'out.txt')).read(),
+                             'hello')
+
+        # Each run is a new scons state
+        st, output = self.run_scons(['-Q', 'out.txt'])
+        self.failUnlessEqual(st, 0, output)
+        self.failUnless(output.find("`out.txt' is up to date.") != -1,
+                        output)
+
+        stop_server(self.address)
+        self.failUnlessEqual(self.server.wait(), 0)
+        self.failIf(os.path.exists(self.address))
+
+    def test_errors(self):
+        """The status and the error messages of failed runs are given to the
+        client, and the server keeps serving."""
+        st, output = self.run_scons(['-Q', 'fail.txt'])
+        self.failUnlessEqual(st, 2, output)
+        self.failUnless(output.find('Error 3') != -1, output)
+
+        st, output = self.run_scons(['-Q', 'raise=1'])
+        self.failUnlessEqual(st, 2, output)
+        self.failUnless(output.find('ValueError: bad SConstruct') != -1,
+                        output)
+
+        st, output = self.run_scons(['-Q', '--no-such-option'])
+        self.failUnlessEqual(st, 2, output)
+        self.failUnless(output.find('no such option') != -1, output)
+
+        st, output = self.run_scons(['-Q', 'out.txt'])
+        self.failUnlessEqual(st, 0, output)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#! /usr/bin/env python
+# test module for template_cache module
+import os
+import shutil
+import tempfile
+import unittest
+
+from numscons.numdist import process_c_file as ref_c_file, \
+    process_f_file as ref_f_file
+from numscons.core.template_cache import TemplateCache, process_c_file, \
+    process_f_file
+
+C_BLOCK = """\
+/**begin repeat
+ * #type = int, float#
+ * #name = %s#
+ */
+/**begin repeat1
+ * #op = add, sub#
+ */
+@type@ @name@_@op@(@type@ x, @type@ y);
+/**end repeat1**/
+/**end repeat**/
+"""
+
+F_BLOCK = """\
+      subroutine <prefix>%s(x)
+      <ftype> x
+      end subroutine <prefix>%s
+"""
+
+class TemplateCacheTester(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cachefile = os.path.join(self.tmpdir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, content):
+        filename = os.path.join(self.tmpdir, name)
+        f = open(filename, 'w')
+        f.write(content)
+        f.close()
+        return filename
+
+    def _expand(self, process, ref, filename):
+        cache = TemplateCache(self.cachefile)
+        res = process(filename, cache)
+        cache.save()
+        self.failUnlessEqual(res, ref(filename))
+        return cache
+
+    def test_c(self):
+        blocks = [C_BLOCK % n for n in ['i, f', 'a, b', 'c, d']]
+        src = self._write('foo.c.src', "int a;\n" + "\n".join(blocks))
+
+        cache = self._expand(process_c_file, ref_c_file, src)
+        self.failUnlessEqual((cache.hits, cache.misses), (0, 3))
+
+        # Only the modified block is expanded again
+        blocks[1] = C_BLOCK % 'g, h'
+        src = self._write('foo.c.src', "int a;\n" + "\n".join(blocks))
+        cache = self._expand(process_c_file, ref_c_file, src)
+        self.failUnlessEqual((cache.hits, cache.misses), (2, 1))
+
+        # Blocks which are moved are not expanded again
+        src = self._write('foo.c.src',
+                          "int a;\nint b;\n\n" + "\n".join(blocks))
+        cache = self._expand(process_c_file, ref_c_file, src)
+        self.failUnlessEqual((cache.hits, cache.misses), (3, 0))
+
+    def test_c_errors(self):
+        src = self._write('foo.c.src', C_BLOCK % 'i, f' + "@foo@\n")
+        try:
+            ref_c_file(src)
+            self.fail("process_c_file should have failed")
+        except ValueError, e:
+            msg = str(e)
+        try:
+            process_c_file(src, TemplateCache(self.cachefile))
+            self.fail("process_c_file should have failed")
+        except ValueError, e:
+            self.failUnlessEqual(str(e), msg)
+
+    def test_f(self):
+        blocks = [F_BLOCK % (n, n) for n in ['foo', 'bar', 'baz']]
+        src = self._write('foo.f.src', "\n".join(blocks))
+
+        cache = self._expand(process_f_file, ref_f_file, src)
+        self.failUnlessEqual((cache.hits, cache.misses), (0, 3))
+
+        blocks[2] = F_BLOCK % ('fubar', 'fubar')
+        src = self._write('foo.f.src', "\n".join(blocks))
+        cache = self._expand(process_f_file, ref_f_file, src)
+        self.failUnlessEqual((cache.hits, cache.misses), (2, 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+#! /usr/bin/env python
+# test module for template_generators module
+import os
+import sys
+import unittest
+from cStringIO import StringIO
+
+from tests.unittests.sconstest import SConsTestCase
+
+import SCons.Environment
+import SCons.Node
+import SCons.Node.FS
+import SCons.SConsign
+
+import numscons.core.sconf_batch as sconf_batch
+import numscons.core.action_pool as action_pool
+from numscons.core.helpers import add_custom_builders
+from numscons.core.template_generators import generate_from_template_scanner
+from numscons.numdist import process_c_file, process_f_file
+
+C_TEMPLATE = """\
+/**begin repeat
+ * #type = int, float#
+ */
+@type@ %s_@type@(@type@ x);
+/**end repeat**/
+"""
+
+F_TEMPLATE = """\
+      subroutine <prefix>%s(x)
+      <ftype> x
+      end subroutine <prefix>%s
+"""
+
+class TemplateBatchTester(SConsTestCase):
+    def setUp(self):
+        SConsTestCase.setUp(self)
+        self._env()
+        self.get_num_jobs = sconf_batch.get_num_jobs
+
+    def _env(self):
+        self.env = SCons.Environment.Environment(tools = [])
+        add_custom_builders(self.env)
+        self.env['PRINT_CMD_LINE_FUNC'] = lambda s, target, source, env: None
+
+    def tearDown(self):
+        sconf_batch.get_num_jobs = self.get_num_jobs
+        for pool in action_pool._POOL:
+            pool.close()
+        action_pool._POOL[:] = []
+        SConsTestCase.tearDown(self)
+
+    def _sources(self, template, ext, n):
+        names = ['t%d%s.src' % (i, ext) for i in range(n)]
+        for i in range(n):
+            self.write(names[i], template.replace('%s', 'f%d' % i))
+        return names
+
+    def test_emitter(self):
+        """One target per source, in the directory of the first target."""
+        targets = self.env.FromCTemplateBatch('gen/all', ['a.c.src',
+                                                          'sub/b.c.src'])
+        self.failUnlessEqual([str(t) for t in targets],
+                             [os.path.join('gen', 'a.c'),
+                              os.path.join('gen', 'b.c')])
+
+    def _check(self, sources, targets, process):
+        for s, t in zip(sources, targets):
+            self.failUnlessEqual(t.get_state(), SCons.Node.executed)
+            self.failUnlessEqual(open(str(t)).read(), process(s))
+
+    def test_batch(self):
+        """Every file is generated as by process_file."""
+        csrc = self._sources(C_TEMPLATE, '.c', 3)
+        fsrc = self._sources(F_TEMPLATE, '.f', 3)
+        ctgt = self.env.FromCTemplateBatch('gen/all.c', csrc)
+        ftgt = self.env.FromFTemplateBatch('gen/all.f', fsrc)
+        self.build(ctgt + ftgt)
+        self._check(csrc, ctgt, process_c_file)
+        self._check(fsrc, ftgt, process_f_file)
+        for t in ctgt:
+            self.failIf(hasattr(t.attributes, 'cache_status'))
+
+        # Nothing changed: every block comes from the template cache
+        SCons.Node.FS.default_fs = None
+        self._env()
+        ctgt = self.env.FromCTemplateBatch('gen/all.c', csrc)
+        self.build(ctgt)
+        for t in ctgt:
+            self.failUnlessEqual(t.attributes.cache_status, 'template-cache')
+
+    def test_batch_changed(self):
+        """Only the targets whose template changed are generated again."""
+        csrc = self._sources(C_TEMPLATE, '.c', 3)
+        ctgt = self.env.FromCTemplateBatch('gen/all.c', csrc)
+        self.build(ctgt)
+        SCons.SConsign.write()
+
+        self.write(csrc[0], C_TEMPLATE.replace('%s', 'g0'))
+        self.write(str(ctgt[1]), 'not generated again')
+        SCons.Node.FS.default_fs = None
+        self._env()
+        ctgt = self.env.FromCTemplateBatch('gen/all.c', csrc)
+        self.build(ctgt)
+        self.failUnlessEqual(open(str(ctgt[0])).read(),
+                             process_c_file(csrc[0]))
+        self.failUnlessEqual(open(str(ctgt[1])).read(), 'not generated again')
+
+    def test_batch_pool(self):
+        """Same output when the files are generated by concurrent workers,
+        which are used with several jobs whatever python_action_pool says."""
+        sconf_batch.get_num_jobs = lambda: 2
+        self.env['python_action_pool'] = 0
+        csrc = self._sources(C_TEMPLATE, '.c', 4)
+        ctgt = self.env.FromCTemplateBatch('gen/all.c', csrc)
+        self.build(ctgt)
+        self._check(csrc, ctgt, process_c_file)
+        self.failUnless(len(action_pool._POOL) == 1)
+
+    def test_batch_pool_error(self):
+        """A template which cannot be expanded fails the batch."""
+        sconf_batch.get_num_jobs = lambda: 2
+        csrc = self._sources(C_TEMPLATE, '.c', 3)
+        self.write('bad.c.src', C_TEMPLATE.replace('%s', 'bad') + "@foo@\n")
+        csrc.append('bad.c.src')
+        ctgt = self.env.FromCTemplateBatch('gen/all.c', csrc)
+
+        saved = sys.stdout
+        sys.stdout = output = StringIO()
+        try:
+            self.build(ctgt)
+        finally:
+            sys.stdout = saved
+        self.failUnless(output.getvalue().find('ValueError') != -1)
+        for t in ctgt:
+            self.failUnlessEqual(t.get_state(), SCons.Node.failed)
+
+class TemplateScannerTester(SConsTestCase):
+    def test_includes(self):
+        """The .src includes are scanned recursively, generated ones
+        included."""
+        self.write('a.c.src', 'include "b.c.src"\ninclude "gen.c.src"\n'
+                              'include "missing.c.src"\ninclude "a.h"\n')
+        self.write('b.c.src', 'include "c.c.src"\n')
+        self.write('c.c.src', '')
+        self.env.Command('gen.c.src', 'b.c.src', 'cp $SOURCE $TARGET')
+        deps = generate_from_template_scanner(self.fs.File('a.c.src'),
+                                              self.env, ())
+        self.failUnlessEqual([str(d) for d in deps],
+                             ['a.h', 'b.c.src', 'c.c.src', 'gen.c.src'])
+
+if __name__ == "__main__":
+    unittest.main()
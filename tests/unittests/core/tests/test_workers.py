@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+# test module for workers module
+import os
+import unittest
+
+from numscons.core.workers import WorkerPool, WorkerError
+
+_CALLS = []
+
+def _count():
+    _CALLS.append(1)
+    return os.getpid(), len(_CALLS)
+
+class WorkerPoolTester(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(2, ['os.path'])
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_call(self):
+        status, output, result = self.pool.call('os.path', 'join', ('a', 'b'))
+        self.failUnlessEqual((status, output, result),
+                             (0, '', os.path.join('a', 'b')))
+
+    def test_cwd(self):
+        status, output, result = self.pool.call('os', 'getcwd', (), '/')
+        self.failUnlessEqual(result, '/')
+
+    def test_errors(self):
+        # SystemExit gives the exit status
+        status, output, result = self.pool.call('sys', 'exit', (3,))
+        self.failUnlessEqual(status, 3)
+        # Other exceptions are reported in the output
+        status, output, result = self.pool.call('os.path', 'join', ())
+        self.failUnlessEqual(status, 1)
+        self.failUnless(output.find('TypeError') != -1)
+
+    def test_workers_reused(self):
+        # A worker runs one call at a time, and calls run in forked processes
+        pids = [self.pool.call('os', 'getppid')[2] for i in range(4)]
+        self.failUnlessEqual(self.pool._nworkers, 1)
+        if hasattr(os, 'fork'):
+            self.failUnlessEqual(len(dict([(p, None) for p in pids])), 1)
+
+    def test_no_fork(self):
+        # Calls run in the worker itself, which keeps the module globals
+        pool = WorkerPool(1, ['test_workers'], fork = False)
+        try:
+            results = [pool.call('test_workers', '_count')[2]
+                       for i in range(3)]
+            self.failUnlessEqual([r[1] for r in results], [1, 2, 3])
+            self.failUnlessEqual(len(dict([(r[0], None) for r in results])),
+                                 1)
+            self.failIfEqual(results[0][0], os.getpid())
+        finally:
+            pool.close()
+
+    def test_bad_module(self):
+        pool = WorkerPool(1, ['numscons_no_such_module'])
+        self.assertRaises(WorkerError, pool.call, 'os', 'getcwd')
+        self.failUnlessEqual(pool._nworkers, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+#! /usr/bin/env python
+# test module for numdist.conv_template module
+import os
+import shutil
+import tempfile
+import unittest
+
+from numscons.numdist.conv_template import parse_string, process_str, \
+    header, global_names, compile_str, render, iter_str, resolve_includes
+from numscons.numdist import includes
+
+SIMPLE = """\
+/**begin repeat
+ * #a = 1,2,3#
+ * #b = 1,2,3#
+ */
+
+/**begin repeat1
+ * #c = ted, jim#
+ */
+@a@, @b@, @c@
+/**end repeat1**/
+
+/**end repeat**/
+"""
+
+NESTED = """\
+#include <stdio.h>
+static int a = 0;
+/**begin repeat
+ * #type = int, float, double#
+ * #name = (i, f)*1, d#
+ */
+/**begin repeat1
+ * #op = add, sub#
+ * #c = +, -#
+ */
+@type@ @name@_@op@(@type@ x, @type@ y) { return x @c@ y; }
+/**begin repeat2
+ * #n = 1*2, 3#
+ */
+/* @type@ @op@ @n@ */
+/**end repeat2**/
+/**end repeat1**/
+@type@ @name@_zero = 0;
+/**end repeat**/
+
+/**begin repeat
+ * #k = x, y#
+ */
+int @k@;
+/**end repeat**/
+static int z;
+"""
+
+class ConvTemplateTester(unittest.TestCase):
+    def _check(self, astr):
+        ref = parse_string(astr, global_names, 0, 1)
+        self.failUnlessEqual(render(compile_str(astr)), ref)
+
+    def test_no_loop(self):
+        self._check("int a;\nint b;\n")
+        self._check("")
+
+    def test_simple(self):
+        self._check(SIMPLE)
+        self.failUnless(process_str(SIMPLE).startswith(header))
+
+    def test_nested(self):
+        self._check(NESTED)
+
+    def test_render_env(self):
+        # The tree can be rendered several times, with different names
+        tree = compile_str("@x@ @a@\n")
+        self.failUnlessEqual(render(tree, {'x': '1', 'a': '2'}),
+                             parse_string("@x@ @a@\n", {'x': '1', 'a': '2'},
+                                          0, 1))
+        self.failUnlessEqual(render(tree, {'x': '3', 'a': '4'}),
+                             "#line 1\n3 4\n\n")
+
+    def test_iter(self):
+        # One chunk per repetition of the top-level loops, plus the text
+        # around them
+        chunks = list(iter_str(NESTED))
+        self.failUnlessEqual(''.join(chunks), process_str(NESTED))
+        self.failUnlessEqual(len(chunks), 1 + 1 + 1 + 3 + 1 + 2 + 1 + 1)
+
+    def _errors(self, astr):
+        try:
+            parse_string(astr, global_names, 0, 1)
+            self.fail("parse_string should have failed")
+        except ValueError, e:
+            ref = str(e)
+        try:
+            render(compile_str(astr))
+            self.fail("render should have failed")
+        except ValueError, e:
+            self.failUnlessEqual(str(e), ref)
+
+    def test_errors(self):
+        # Unknown name
+        self._errors("int a;\n@b@\n")
+        self._errors(SIMPLE.replace("@c@", "@d@"))
+        # Mismatch in number of values
+        self._errors(SIMPLE.replace("#b = 1,2,3#", "#b = 1,2#"))
+        # The first error is reported, as with parse_string
+        self._errors(SIMPLE.replace("#b = 1,2,3#", "#b = 1,2#") + "@d@\n")
+        self._errors("@d@\n" + SIMPLE.replace("#b = 1,2,3#", "#b = 1,2#"))
+
+class IncludesTester(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        includes.clear_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        includes.clear_cache()
+
+    def _write(self, name, content):
+        filename = os.path.join(self.tmpdir, name)
+        f = open(filename, 'w')
+        f.write(content)
+        f.close()
+        return filename
+
+    def test_nested(self):
+        self._write('inc2.src', "int c;\n")
+        self._write('inc1.src', '#include "inc2.src"\nint b;\n')
+        a = self._write('a.c.src', '#include "inc1.src"\n#include "foo.h"\n')
+        self.failUnlessEqual(resolve_includes(a),
+                             ["int c;\n", "int b;\n", '#include "foo.h"\n'])
+        # Every file is read once
+        self.failUnlessEqual(len(includes._FILES), 3)
+        resolve_includes(a)
+        self.failUnlessEqual(len(includes._FILES), 3)
+
+        # Modified files are read again
+        self._write('inc2.src', "int c;\nint d;\n")
+        self.failUnlessEqual(resolve_includes(a),
+                             ["int c;\n", "int d;\n", "int b;\n",
+                              '#include "foo.h"\n'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#! /usr/bin/env python
+# test module for numdist.from_template module
+import sys
+import unittest
+from cStringIO import StringIO
+
+from numscons.numdist.from_template import parse_structure, \
+    _parse_structure_search, process_str, iter_expand_sub, \
+    _iter_expand_sub_regex, tokenize_markers, _special_names
+
+TEMPLATE = """\
+python module _flapack
+    interface
+      subroutine <prefix>gesv(n,a)
+      integer n
+      <ftype> a(n,n)
+      END SUBROUTINE <prefix>gesv
+
+      double precision
+     $ function <prefix>norm(n,x)
+      <ftype> x(n)
+      end function <prefix>norm
+    end interface
+end python module _flapack
+"""
+
+class ParseStructureTester(unittest.TestCase):
+    def _check(self, astr):
+        self.failUnlessEqual(parse_structure(astr),
+                             _parse_structure_search(astr))
+
+    def test_simple(self):
+        self._check(TEMPLATE)
+        self.failUnlessEqual(len(parse_structure(TEMPLATE)), 2)
+        self._check("")
+        self._check("      x = 1\n")
+
+    def test_string_boundaries(self):
+        # Routine at the very beginning, end at the very end of the string
+        self._check("subroutine foo\n      end subroutine foo")
+        self._check("\nsubroutine foo\n      end subroutine")
+        self._check("      function foo\n      x = 1")
+
+    def test_end_across_lines(self):
+        # An 'end' followed by a routine on the next line is matched as the
+        # end of a routine
+        self._check("      subroutine a\n      end\n      subroutine b\n"
+                    "      end subroutine b\n")
+        self._check("      end\n      subroutine b\n      end subroutine\n")
+
+    def test_continuation(self):
+        self._check("      double precision\n     $ function foo(x)\n"
+                    "      end function foo\n")
+        self._check("      x\n     $ y\n     $ function foo(x)\n      end\n")
+
+    def test_process(self):
+        res = process_str(TEMPLATE)
+        for p in ['s', 'd', 'c', 'z']:
+            self.failUnless(res.find('%sgesv' % p) != -1)
+            self.failUnless(res.find('%snorm' % p) != -1)
+
+class ExpandSubTester(unittest.TestCase):
+    def _expand(self, func, substr, names):
+        # Expansion and printed output of func
+        saved = sys.stdout
+        sys.stdout = output = StringIO()
+        try:
+            res = list(func(substr, names))
+        finally:
+            sys.stdout = saved
+        return res, output.getvalue()
+
+    def _check(self, substr, names = None):
+        if names is None:
+            names = _special_names
+        names_ref = names.copy()
+        ref = self._expand(_iter_expand_sub_regex, substr, names_ref)
+        names_new = names.copy()
+        self.failUnlessEqual(self._expand(iter_expand_sub, substr, names_new),
+                             ref)
+        self.failUnlessEqual(names_new, names_ref)
+        return ref[0]
+
+    def test_tokenize(self):
+        self.failUnlessEqual(tokenize_markers("a <p=s,d> b < x , y >c"),
+                             (['a ', ' b ', 'c'],
+                              [('p', 's,d'), (None, 'x , y')]))
+        self.failUnlessEqual(tokenize_markers("x .lt. y"), (["x .lt. y"], []))
+        # Left to the regular expressions
+        self.failUnlessEqual(tokenize_markers("<a <b=c>"), None)
+        self.failUnlessEqual(tokenize_markers("<a\n=b> <c>"), None)
+
+    def test_named(self):
+        res = self._check(TEMPLATE)
+        self.failUnlessEqual(len(res), 4)
+        self._check("      subroutine <p=a,b>foo<p>(<t=x,y>)\n"
+                    "      <t> q, <ftype> z\n")
+        self._check("      subroutine <p=a,b>\n      <p=c,d> <p>\n")
+
+    def test_lists(self):
+        # Short lists, back references, escaped commas and brackets, and
+        # lists which are the same as a named one
+        res = self._check("      <s,d,c,z> f(<real, \\0, complex\, x,"
+                          " \\2>) \\< \\>\n      <p=s,d,c,z><s,d,c,z>\n")
+        self.failUnlessEqual(len(res), 4)
+        self._check("      x = <a>\n", {'a': 'u,v'})
+        self._check("      <a,b> < a ,  b >\n")
+
+    def test_mismatch(self):
+        self._check("      <a,b> <c,d,e> <f=g,h,i> <f>\n")
+
+    def test_no_marker(self):
+        self.failUnlessEqual(self._check("      x = 1 \\< 2\n"),
+                             ["      x = 1 @leftarrow@ 2\n"])
+
+    def test_fallback(self):
+        self.failUnlessEqual(tokenize_markers("<a <b=c,d> e>"), None)
+        self._check("      <a <b=c,d> e>\n")
+        self._check("      if (a < b) <c=x,y> <c>\n")
+        self._check("      <a\n=x,y> <a> <u,v>\n")
+
+    def test_unknown(self):
+        self.failUnlessRaises(ValueError, self._check, "      <nope>\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Helpers for the unit tests which need scons: the local scons is put in
+sys.path, and SConsTestCase gives every test a new scons file system and
+environment in a temporary directory."""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from numscons.core.misc import get_scons_path
+
+def _scons_local_dir():
+    for d in os.listdir(get_scons_path()):
+        if d.startswith('scons-local-'):
+            return os.path.join(get_scons_path(), d)
+    raise RuntimeError("No local scons found in %s" % get_scons_path())
+
+if not _scons_local_dir() in sys.path:
+    sys.path.insert(0, _scons_local_dir())
+
+import SCons.Environment
+import SCons.Job
+import SCons.Node
+import SCons.Node.FS
+import SCons.Taskmaster
+
+class SConsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        SCons.Node.FS.default_fs = None
+        self.fs = SCons.Node.FS.get_default_fs()
+        self.env = SCons.Environment.Environment(tools = [])
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        SCons.Node.FS.default_fs = None
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        filename = os.path.join(self.tmpdir, name)
+        f = open(filename, 'w')
+        try:
+            f.write(content)
+        finally:
+            f.close()
+        return filename
+
+    def build(self, targets, num_jobs = 1):
+        """Build the targets (every one of them, even if up to date)."""
+        tm = SCons.Taskmaster.Taskmaster(targets, SCons.Taskmaster.AlwaysTask)
+        SCons.Job.Jobs(num_jobs, tm).run()
@@ -0,0 +1,150 @@
+#! /usr/bin/env python
+# test module for f2py tool
+import unittest
+
+from tests.unittests.sconstest import SConsTestCase
+
+import SCons.Builder
+import SCons.Node.FS
+import SCons.SConsign
+
+import numscons.tools.f2py as f2py
+from numscons.tools.f2py import get_f2py_modulename_from_node, \
+    _get_modulename_cached, pyf2c, F2pyEmitter, F2pyLinkEmitter
+import numscons.tools.pyext
+
+PYF = """\
+python module foo__user__routines
+end python module foo__user__routines
+python module foo
+end python module foo
+"""
+
+class ModuleNameTester(SConsTestCase):
+    def setUp(self):
+        SConsTestCase.setUp(self)
+        self.read = f2py.get_f2py_modulename_from_file
+        self.nread = 0
+        def read(filename):
+            self.nread += 1
+            return self.read(filename)
+        f2py.get_f2py_modulename_from_file = read
+
+    def tearDown(self):
+        f2py.get_f2py_modulename_from_file = self.read
+        SConsTestCase.tearDown(self)
+
+    def test_source(self):
+        """The name of a source file is cached in its stored node info."""
+        self.write('foo.pyf', PYF)
+        node = self.fs.File('foo.pyf')
+        self.failUnlessEqual(get_f2py_modulename_from_node(node), 'foo')
+        self.failUnlessEqual(self.nread, 1)
+        ninfo = node.get_ninfo()
+        self.failUnlessEqual(ninfo.f2py_modname, (node.get_csig(), 'foo'))
+
+        # Next run: the file is not read again
+        entry = node.get_stored_info()
+        entry.ninfo = ninfo
+        node.dir.sconsign().set_entry(node.name, entry)
+        SCons.SConsign.write()
+        SCons.Node.FS.default_fs = None
+        node = SCons.Node.FS.get_default_fs().File('foo.pyf')
+        self.failUnlessEqual(get_f2py_modulename_from_node(node), 'foo')
+        self.failUnlessEqual(self.nread, 1)
+
+        # Unless it changed
+        self.write('foo.pyf', PYF.replace('foo', 'bar'))
+        SCons.Node.FS.default_fs = None
+        node = SCons.Node.FS.get_default_fs().File('foo.pyf')
+        self.failUnlessEqual(get_f2py_modulename_from_node(node), 'bar')
+        self.failUnlessEqual(self.nread, 2)
+
+    def test_generated(self):
+        """The csig of a generated file is not computed before it is built,
+        and its name is never cached."""
+        self.write('foo.pyf.in', PYF)
+        node = self.env.Command('foo.pyf', 'foo.pyf.in',
+                                'cp $SOURCE $TARGET')[0].disambiguate()
+        self.failUnlessEqual(_get_modulename_cached(node), None)
+        # The name of the source is used before the file is generated
+        self.failUnlessEqual(get_f2py_modulename_from_node(node), 'foo')
+        self.failIf(hasattr(node.get_ninfo(), 'csig'))
+
+        self.write('foo.pyf', PYF)
+        self.failUnlessEqual(get_f2py_modulename_from_node(node), 'foo')
+        self.failIf(hasattr(node.get_ninfo(), 'f2py_modname'))
+        self.failIf(hasattr(node.get_ninfo(), 'csig'))
+
+class SharedFortranObjectTester(SConsTestCase):
+    def setUp(self):
+        SConsTestCase.setUp(self)
+        self.default_fs = f2py.default_fs
+        f2py.default_fs = self.fs
+        f2py._SHARED_FOBJECTS.clear()
+
+        env = self.env
+        env['BUILDERS']['F2py'] = SCons.Builder.Builder(action = pyf2c,
+                emitter = [F2pyEmitter])
+        numscons.tools.pyext.generate(env)
+        self.pyext = env['BUILDERS']['PythonExtension']
+        env['CFILESUFFIX'] = '.c'
+        env['PYEXTOBJSUFFIX'] = '.o'
+        env['F2PYINCLUDEDIR'] = 'f2pysrc'
+        env['F2PY_SHARED_BUILDDIR'] = 'f2py'
+        for name in ['foo', 'bar', 'baz']:
+            self.write('%s.pyf' % name, PYF.replace('foo', name))
+
+    def tearDown(self):
+        f2py.default_fs = self.default_fs
+        f2py._SHARED_FOBJECTS.clear()
+        SConsTestCase.tearDown(self)
+
+    def _extension(self, env, name):
+        gen = env.F2py('%s/%smodule.c' % (name, name), '%s.pyf' % name)
+        ext = env.PythonExtension('%s/%s' % (name, name), gen[0])
+        return [str(g) for g in gen], ext[0]
+
+    def _link_emitters(self):
+        emitter = self.pyext.emitter
+        if isinstance(emitter, SCons.Builder.ListEmitter):
+            return [e for e in emitter if e is F2pyLinkEmitter]
+        return []
+
+    def test_shared(self):
+        """Extensions built with the same flags link the same fortranobject
+        node."""
+        self.env['F2PY_SHARED_FORTRANOBJECT'] = True
+        gen, foo = self._extension(self.env, 'foo')
+        self.failUnlessEqual(gen, ['foo/foomodule.c',
+                                   'foo/foo-f2pywrappers.f'])
+        bar = self._extension(self.env, 'bar')[1]
+        self.failUnlessEqual(len(self._link_emitters()), 1)
+
+        fobj = foo.sources[-1]
+        self.failUnless(str(fobj).startswith('f2py/fortranobject-'))
+        self.failUnless(bar.sources[-1] is fobj)
+        self.failUnlessEqual([str(s) for s in fobj.sources],
+                             ['f2pysrc/fortranobject.c'])
+
+        # Other flags, other object
+        env = self.env.Clone(PYEXTCFLAGS = '-O3')
+        baz = self._extension(env, 'baz')[1]
+        self.failIf(baz.sources[-1] is fobj)
+        self.failUnless(str(baz.sources[-1]).startswith('f2py/fortranobject-'))
+
+    def test_not_shared(self):
+        """Without the option, every module has its own fortranobject.c, and
+        the extension builder is not changed."""
+        emitter = self.pyext.emitter
+        gen, foo = self._extension(self.env, 'foo')
+        self.failUnlessEqual(gen, ['foo/foomodule.c',
+                                   'foo/foo_fortranobject.c',
+                                   'foo/foo-f2pywrappers.f'])
+        self.failUnless(self.pyext.emitter is emitter)
+        self.failUnlessEqual([str(s) for s in foo.sources],
+                             ['foo/foomodule.o'])
+        self.failUnlessEqual(f2py._SHARED_FOBJECTS, {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#! /usr/bin/env python
+# test module for substinfile tool
+import unittest
+
+from tests.unittests.sconstest import SConsTestCase
+
+import SCons.Node
+
+import numscons.core.sconf_batch as sconf_batch
+import numscons.core.action_pool as action_pool
+from numscons.tools.substinfile import TOOL_SUBST
+
+class SubstInFileTester(SConsTestCase):
+    def setUp(self):
+        SConsTestCase.setUp(self)
+        TOOL_SUBST(self.env)
+        self.env['PRINT_CMD_LINE_FUNC'] = lambda s, target, source, env: None
+        self.env['VERSION'] = '1.2'
+        self.env['SUBST_DICT'] = {'@VERSION@': '$VERSION'}
+        self.write('version.h.in', '#define VERSION "@VERSION@"\n')
+        self.get_num_jobs = sconf_batch.get_num_jobs
+
+    def tearDown(self):
+        sconf_batch.get_num_jobs = self.get_num_jobs
+        for pool in action_pool._POOL:
+            pool.close()
+        action_pool._POOL[:] = []
+        SConsTestCase.tearDown(self)
+
+    def _check(self):
+        t = self.env.SubstInFile('version.h', 'version.h.in')
+        self.build(t)
+        self.failUnlessEqual(t[0].get_state(), SCons.Node.executed)
+        self.failUnlessEqual(open('version.h').read(),
+                             '#define VERSION "1.2"\n')
+
+    def test_local(self):
+        self._check()
+        self.failUnlessEqual(action_pool._POOL, [])
+
+    def test_pool(self):
+        sconf_batch.get_num_jobs = lambda: 2
+        self._check()
+        self.failUnlessEqual(len(action_pool._POOL), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+# Benchmark of numscons.numdist.conv_template on a template of the size of
+# numpy umath loops.
+#
+# Usage: python bench_conv_template.py [template.c.src]
+import sys
+import time
+
+from numscons.numdist.conv_template import parse_string, global_names, \
+    compile_str, render
+
+TYPES = ['byte', 'ubyte', 'short', 'ushort', 'int', 'uint', 'long', 'ulong',
+         'longlong', 'ulonglong', 'float', 'double', 'longdouble']
+
+OPS = ['add', 'subtract', 'multiply', 'divide', 'less', 'less_equal',
+       'greater', 'greater_equal', 'equal', 'not_equal', 'logical_and',
+       'logical_or']
+
+def generate_template(nblocks = 20):
+    """Return a template with nblocks blocks of two nested loops, looking like
+    the loops of numpy umath module."""
+    loop = """
+/**begin repeat%(level)s
+ * #TYPE = %(TYPE)s#
+ * #type = %(type)s#
+ */
+
+/**begin repeat%(level1)s
+ * #kind = %(kind)s#
+ * #OP = %(OP)s#
+ */
+static void
+@TYPE@_@kind@_%(i)d(char **args, intp *dimensions, intp *steps, void *func)
+{
+    intp is1 = steps[0], is2 = steps[1], os = steps[2], n = dimensions[0];
+    char *i1 = args[0], *i2 = args[1], *op = args[2];
+    intp i;
+
+    for (i = 0; i < n; i++, i1 += is1, i2 += is2, op += os) {
+        const @type@ in1 = *(@type@ *)i1;
+        const @type@ in2 = *(@type@ *)i2;
+        *((@type@ *)op) = in1 @OP@ in2;
+    }
+}
+/**end repeat%(level1)s**/
+
+/**end repeat%(level)s**/
+"""
+    d = {'level': '', 'level1': '1',
+         'TYPE': ', '.join([t.upper() for t in TYPES]),
+         'type': ', '.join(['npy_' + t for t in TYPES]),
+         'kind': ', '.join(OPS),
+         'OP': ', '.join(['+', '-', '*', '/', '<', '<=', '>', '>=', '==',
+                          '!=', '&&', '||'])}
+    blocks = ["#include <Python.h>\n"]
+    for i in range(nblocks):
+        d['i'] = i
+        blocks.append(loop % d)
+    return ''.join(blocks)
+
+def bench(func, n = 3):
+    best = None
+    for i in range(n):
+        t0 = time.time()
+        res = func()
+        t = time.time() - t0
+        if best is None or t < best:
+            best = t
+    return best, res
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        f = open(sys.argv[1])
+        try:
+            astr = f.read()
+        finally:
+            f.close()
+    else:
+        astr = generate_template()
+
+    tp, ref = bench(lambda: parse_string(astr, global_names, 0, 1))
+    tc, tree = bench(lambda: compile_str(astr))
+    tr, res = bench(lambda: render(tree))
+    if res != ref:
+        print "ERROR: compiled template output differs from parse_string"
+        sys.exit(1)
+
+    print "template: %d lines, output: %d lines" % \
+          (astr.count('\n'), ref.count('\n'))
+    print "parse_string:     %.4f s" % tp
+    print "compile + render: %.4f s (compile %.4f s, render %.4f s)" % \
+          (tc + tr, tc, tr)
+    print "speedup:          %.1fx" % (tp / (tc + tr))
@@ -0,0 +1,88 @@
+#! /usr/bin/env python
+# Micro-benchmarks of numscons.numdist.from_template, on generated templates
+# looking like the LAPACK wrappers of scipy, of increasing size.
+#
+# Usage: python bench_from_template.py [template.f.src]
+import sys
+import time
+
+from numscons.numdist import from_template
+from numscons.numdist.from_template import parse_structure, \
+    _parse_structure_search, iter_expand_sub, _iter_expand_sub_regex, \
+    process_str
+
+ROUTINE = """\
+      subroutine <prefix>gesv%(i)d(n,nrhs,a,piv,b,info)
+c     Solve A * X = B, A being a general matrix
+      integer n, nrhs, info
+      integer piv(n)
+      <ftype> a(n,n), b(n,nrhs)
+      <ftype> work(n)
+      <ftypereal> rcond
+      call <prefix>getrf(n,n,a,n,piv,info)
+      if (info .ne. 0) then
+          return
+      end if
+      call <prefix>getrs('N',n,nrhs,a,n,piv,b,n,info)
+      end subroutine <prefix>gesv%(i)d
+
+      double precision
+     $ function <prefix>norm%(i)d(n,x)
+      integer n
+      <ftype> x(n)
+      <prefix>norm%(i)d = 0
+      end
+
+"""
+
+def generate_template(nroutines):
+    """Return a Fortran template with nroutines pairs of routines."""
+    return ''.join([ROUTINE % {'i': i} for i in range(nroutines)])
+
+def bench(func, n = 3):
+    best = None
+    for i in range(n):
+        t0 = time.time()
+        res = func()
+        t = time.time() - t0
+        if best is None or t < best:
+            best = t
+    return best, res
+
+def run(astr, label):
+    told, ref = bench(lambda: _parse_structure_search(astr))
+    tnew, res = bench(lambda: parse_structure(astr))
+    if res != ref:
+        print "ERROR: parse_structure spans differ from the reference"
+        sys.exit(1)
+
+    # Whole expansion, with the original parse_structure and block expansion
+    tprocess_new, out = bench(lambda: process_str(astr), 1)
+    from_template.parse_structure = _parse_structure_search
+    from_template.iter_expand_sub = _iter_expand_sub_regex
+    try:
+        tprocess_old, out_ref = bench(lambda: process_str(astr), 1)
+    finally:
+        from_template.parse_structure = parse_structure
+        from_template.iter_expand_sub = iter_expand_sub
+    if out != out_ref:
+        print "ERROR: process_str output differs from the reference"
+        sys.exit(1)
+
+    print "%-12s %8d %10.4f %10.4f %6.1fx %10.4f %10.4f" % \
+          (label, len(ref), told, tnew, told / max(tnew, 1e-9),
+           tprocess_old, tprocess_new)
+
+if __name__ == '__main__':
+    print "%-12s %8s %10s %10s %7s %10s %10s" % \
+          ("input", "routines", "old (s)", "new (s)", "speedup",
+           "process old", "process new")
+    if len(sys.argv) > 1:
+        f = open(sys.argv[1])
+        try:
+            run(f.read(), sys.argv[1])
+        finally:
+            f.close()
+    else:
+        for n in [10, 100, 1000, 5000]:
+            run(generate_template(n), "%d" % n)